@@ -4,8 +4,10 @@ import streamlit as st
 import os
 
 # Your existing imports are correct
-from ollama_utils.summarize import summarize_sources
-from debate.debate_agent import generate_debate
+from ollama_utils.summarize import stream_summarize_sources
+from ollama_utils.scheduler import INTERACTIVE
+from ollama_utils.client import OllamaError
+from debate.debate_agent import stream_debate, parse_debate_output
 # --- MoodTracker import has been removed ---
 from fetchers.youtube_fetcher import download_subtitles_for_topic
 from fetchers.arxiv_fetcher import fetch_arxiv_papers_by_topic
@@ -45,6 +47,9 @@ st.markdown("## 💬 Ask a Research Question")
 
 query = st.text_input("Ask me anything about your topic...", key="user_input")
 
+# Set when this run already rendered the answer while streaming it.
+answer_streamed = False
+
 if st.button("Get Answer"):
     if query:
         # --- All mood-related logic has been removed from this block ---
@@ -55,8 +60,12 @@ if st.button("Get Answer"):
         docs = search_results.get('documents', [])
         if docs and docs[0]:
             source_chunks = docs[0]
+            st.markdown("### 🧠 Answer")
             with st.spinner("Synthesizing information from multiple sources..."):
-                answer = summarize_sources(source_chunks)
+                # Tokens are rendered as they arrive; write_stream returns the full text.
+                # The user is waiting on this summary, so it runs as interactive work.
+                answer = st.write_stream(stream_summarize_sources(source_chunks, priority=INTERACTIVE))
+            answer_streamed = True
 
             # Store the generated answer in the session state to use it later.
             st.session_state.current_answer = answer
@@ -71,16 +80,27 @@ if st.button("Get Answer"):
 # --- On-Demand Debate Generation (No changes here) ---
 # This logic remains perfectly intact.
 if 'current_answer' in st.session_state:
-    st.markdown("### 🧠 Answer")
-    st.markdown(st.session_state.current_answer)
+    if not answer_streamed:
+        st.markdown("### 🧠 Answer")
+        st.markdown(st.session_state.current_answer)
 
     # Add the button to generate the debate only after an answer is shown
     if st.button("🤖 Generate Debate"):
-        with st.spinner("Generating debate..."):
-            # Use the stored answer from the session state to generate the debate
-            debate = generate_debate(st.session_state.current_answer)
-            # Store the debate result in the session state
-            st.session_state.debate_result = debate
+        # Show the raw debate as it streams in, then replace it with the structured view below.
+        live_debate = st.empty()
+        output = ""
+        try:
+            with st.spinner("Generating debate..."):
+                # Use the stored answer from the session state to generate the debate
+                for piece in stream_debate(st.session_state.current_answer):
+                    output += piece
+                    live_debate.markdown(output)
+            debate = parse_debate_output(output)
+        except OllamaError as e:
+            debate = {"support": "", "counter": "", "reflection": f"❌ Ollama Error: {e}"}
+        live_debate.empty()
+        # Store the debate result in the session state
+        st.session_state.debate_result = debate
 
     # If the debate has been generated and stored, display it
     if 'debate_result' in st.session_state:
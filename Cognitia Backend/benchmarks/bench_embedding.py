@@ -0,0 +1,91 @@
+# benchmarks/bench_embedding.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_pipeline import _git_commit, _percentile
+from benchmarks.fixtures import make_queries
+from semantic_engine.embedder import EmbeddingService, EMBEDDING_MODEL, MAX_QUERY_BATCH
+
+# Query embedding throughput as concurrency grows, with and without the
+# micro-batching queue. Every query is distinct, so the cache never helps.
+# Run from the backend directory (the embedding model must be cached locally):
+#
+#     python benchmarks/bench_embedding.py --concurrency 1,4,16,64 --output embed.json
+
+
+def measure(service, queries, concurrency):
+    """Runs `queries` through `service.encode_query` from `concurrency` threads."""
+    latencies, lock = [], threading.Lock()
+    remaining = iter(queries)
+
+    def client():
+        while True:
+            with lock:
+                query = next(remaining, None)
+            if query is None:
+                return
+            start = time.perf_counter()
+            service.encode_query(query)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {
+        "qps": round(len(queries) / seconds, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding QPS under concurrent queries.")
+    parser.add_argument("--concurrency", default="1,4,16,64", help="Comma-separated client thread counts.")
+    parser.add_argument("--queries", type=int, default=512, help="Queries per run.")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Model name or local path.")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    model = EmbeddingService(model_name=args.model).model()
+    model.encode("warm-up", normalize_embeddings=True)
+
+    results = {}
+    for label, max_batch in (("unbatched", 1), ("batched", MAX_QUERY_BATCH)):
+        results[label] = {}
+        for concurrency in levels:
+            print(f"⏱️  {label}, {concurrency} clients...")
+            service = EmbeddingService(max_query_batch=max_batch, cache_size=0)
+            service._model = model  # Loaded once, shared by every run.
+            queries = [f"{query} #{i}" for i, query in enumerate(make_queries(args.queries))]
+            results[label][str(concurrency)] = measure(service, queries, concurrency)
+
+    report = {
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
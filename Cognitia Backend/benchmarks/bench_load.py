@@ -0,0 +1,170 @@
+# benchmarks/bench_load.py
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import http.client
+from collections import Counter
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_pipeline import _git_commit, _percentile
+from benchmarks.fixtures import make_vtt, make_queries
+from ollama_utils.fake_server import FakeOllamaServer
+
+# Load test of the API server: many clients ask a small set of questions at
+# once, as users do after a shared /prepare. The server runs in-process under
+# uvicorn against a small transcript index and the fake Ollama server, and
+# every request is a fresh session, so identical questions build identical
+# prompts. Reports throughput, tail latency, status codes and how many model
+# calls reached Ollama. Run from the backend directory, once per commit to
+# compare (the embedding model must be in the local model cache):
+#
+#     python benchmarks/bench_load.py --requests 200 --concurrency 32 --output load.json
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def build_index(args):
+    from utils.parser import run_parser, RAW_YT_DIR
+    from semantic_engine.vector_index import build_vector_index
+
+    os.makedirs(RAW_YT_DIR, exist_ok=True)
+    for i in range(args.transcripts):
+        with open(os.path.join(RAW_YT_DIR, f"talk_{i}.en.vtt"), "w", encoding="utf-8") as f:
+            f.write(make_vtt(args.cues, seed=i))
+    run_parser()
+    build_vector_index()
+
+
+def start_server(port):
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+def run_load(port, questions, requests, concurrency, timeout):
+    """Sends `requests` POST /query calls from `concurrency` client threads, cycling through `questions`."""
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        while True:
+            with lock:
+                i = next(remaining, None)
+            if i is None:
+                conn.close()
+                return
+            body = json.dumps({"question": questions[i % len(questions)]})
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/query", body=body, headers={
+                    "Content-Type": "application/json", "X-Session-ID": f"load-{i}"})
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+                status = type(e).__name__
+            with lock:
+                latencies.append(time.perf_counter() - start)
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(requests / seconds, 2),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        "statuses": dict(statuses),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and tail latency of POST /query under concurrent load.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Client threads.")
+    parser.add_argument("--distinct", type=int, default=4, help="Distinct questions the clients share.")
+    parser.add_argument("--transcripts", type=int, default=4)
+    parser.add_argument("--cues", type=int, default=300, help="Cues per synthetic transcript.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Fake LLM seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM generation speed (0 = instant).")
+    parser.add_argument("--llm-cache", action="store_true", help="Leave the completion cache on.")
+    parser.add_argument("--model", help="Embedding model name or local path (default: the backend's).")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Client socket timeout in seconds.")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    with tempfile.TemporaryDirectory(prefix="cognitia-load-") as workdir, \
+            FakeOllamaServer(latency=args.llm_latency, tokens_per_second=args.tokens_per_second) as ollama:
+        # The backend reads its settings from the environment at import time.
+        os.environ["OLLAMA_HOST"] = ollama.url
+        os.environ["TOPICS_DIR"] = os.path.join(workdir, "data", "topics")
+        os.environ["SPECULATIVE_DEBATE"] = "0"  # Only the answers are under test.
+        if not args.llm_cache:
+            os.environ["LLM_CACHE_ENABLED"] = "0"
+        # All data/ paths are relative, so the run happens in a scratch directory.
+        os.chdir(workdir)
+        try:
+            if args.model:
+                from semantic_engine.embedder import get_embedding_service
+                get_embedding_service().model_name = args.model
+            print("📚 Building the index...")
+            build_index(args)
+            port = _free_port()
+            server, thread = start_server(port)
+            questions = make_queries(args.distinct)
+            run_load(port, questions, min(args.concurrency, len(questions)), args.concurrency, args.timeout)  # Warm-up.
+            before_calls = len(ollama.requests)
+            print(f"⏱️  {args.requests} requests from {args.concurrency} clients...")
+            results = run_load(port, questions, args.requests, args.concurrency, args.timeout)
+            results["llm_calls"] = len(ollama.requests) - before_calls
+            server.should_exit = True
+            thread.join()
+        finally:
+            os.chdir(BACKEND_DIR)
+
+    report = {
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# benchmarks/bench_pipeline.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import resource
+import subprocess
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fixtures import make_vtt, make_queries
+from benchmarks.fake_arxiv import FakeArxivServer
+from ollama_utils.fake_server import FakeOllamaServer
+
+# End-to-end benchmark of fetch -> parse -> index -> search -> summarize ->
+# debate, fully offline: papers come from a local arXiv stand-in, transcripts
+# are written straight to disk and the LLM is a fake Ollama server with
+# configurable latency. Run from the backend directory:
+#
+#     python benchmarks/bench_pipeline.py --papers 10 --llm-latency 0.2 --output before.json
+#
+# Compare two reports from different commits to see what a change bought.
+# The embedding model must already be in the local model cache.
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def _stage_report(items, seconds, latencies, peak_bytes):
+    return {
+        "items": items,
+        "seconds": round(seconds, 4),
+        "throughput_per_second": round(items / seconds, 3) if seconds else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        } if latencies else None,
+        "peak_traced_mb": round(peak_bytes / 2**20, 2),
+    }
+
+
+def run_stage(name, fn):
+    """
+    Runs `fn()`, which returns (items, per-item latencies), and reports its
+    wall time and the peak Python heap it allocated.
+    """
+    print(f"⏱️  {name}...")
+    tracemalloc.start()
+    start = time.perf_counter()
+    items, latencies = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _stage_report(items, seconds, latencies, peak)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args, arxiv_url, ollama_url):
+    # The backend reads its endpoints from the environment at import time.
+    os.environ["ARXIV_API_URL"] = f"{arxiv_url}/api/query"
+    os.environ["ARXIV_PDF_URL"] = f"{arxiv_url}/pdf"
+    os.environ["ARXIV_REQUESTS_PER_SECOND"] = "1000"
+    os.environ["OLLAMA_HOST"] = ollama_url
+    os.environ["PARSER_WORKERS"] = str(args.parser_workers)
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+
+    from fetchers.arxiv_fetcher import fetch_arxiv_papers_by_topic
+    from utils.parser import run_parser, RAW_YT_DIR
+    from semantic_engine.vector_index import build_vector_index, semantic_search, get_store
+    from ollama_utils.summarize import summarize_sources
+    from debate.debate_agent import debate_agent
+
+    stages = {}
+
+    def fetch():
+        start, ready = time.perf_counter(), []
+        paths = fetch_arxiv_papers_by_topic("benchmark topic", max_results=args.papers,
+                                            on_paper=lambda path: ready.append(time.perf_counter() - start))
+        os.makedirs(RAW_YT_DIR, exist_ok=True)
+        for i in range(args.transcripts):
+            with open(os.path.join(RAW_YT_DIR, f"talk_{i}.en.vtt"), "w", encoding="utf-8") as f:
+                f.write(make_vtt(args.cues, seed=i))
+        return len(paths), ready  # Latency here is time until each paper is on disk.
+    stages["fetch"] = run_stage("fetch", fetch)
+
+    def parse():
+        reports = run_parser(workers=args.parser_workers)
+        return len(reports), [report["seconds"] for report in reports]
+    stages["parse"] = run_stage("parse", parse)
+
+    def index():
+        build_vector_index()
+        return get_store().count(), []
+    stages["index"] = run_stage("index (chunk + embed + store)", index)
+
+    queries = make_queries(args.queries)
+    contexts = []
+
+    def search():
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            contexts.append(semantic_search(query)["documents"][0])
+            latencies.append(time.perf_counter() - start)
+        return len(queries), latencies
+    stages["search"] = run_stage("search", search)
+
+    if args.rerank:
+        def search_rerank():
+            latencies = []
+            for query in queries:
+                start = time.perf_counter()
+                semantic_search(query, rerank=True)
+                latencies.append(time.perf_counter() - start)
+            return len(queries), latencies
+        stages["search_rerank"] = run_stage("search + cross-encoder rerank", search_rerank)
+
+    def timed_calls(call):
+        latencies = []
+        for i in range(args.llm_calls):
+            start = time.perf_counter()
+            call(queries[i % len(queries)], contexts[i % len(contexts)])
+            latencies.append(time.perf_counter() - start)
+        return args.llm_calls, latencies
+    stages["summarize"] = run_stage("summarize", lambda: timed_calls(lambda query, docs: summarize_sources(docs)))
+    stages["debate"] = run_stage("debate", lambda: timed_calls(
+        lambda query, docs: debate_agent(question=query, context="\n\n".join(docs))))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark for the Cognitia backend.")
+    parser.add_argument("--papers", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=10, help="Pages per synthetic paper.")
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--transcripts", type=int, default=3)
+    parser.add_argument("--cues", type=int, default=400, help="Cues per synthetic transcript.")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--llm-calls", type=int, default=5, help="Summaries and debates to time.")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Fake LLM seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM generation speed (0 = instant).")
+    parser.add_argument("--parser-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--llm-cache", action="store_true", help="Leave the completion cache on.")
+    parser.add_argument("--rerank", action="store_true",
+                        help="Also time search with the cross-encoder stage (its model must be cached too).")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+
+    with tempfile.TemporaryDirectory(prefix="cognitia-bench-") as workdir, \
+            FakeArxivServer(args.papers, args.pages, args.words_per_page) as arxiv, \
+            FakeOllamaServer(latency=args.llm_latency, tokens_per_second=args.tokens_per_second) as ollama:
+        # All data/ paths are relative, so the run happens in a scratch directory.
+        os.chdir(workdir)
+        try:
+            stages = run_benchmark(args, arxiv.url, ollama.url)
+        finally:
+            os.chdir(BACKEND_DIR)
+
+    report = {
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "stages": stages,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "max_rss_mb_children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
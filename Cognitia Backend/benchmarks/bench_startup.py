@@ -0,0 +1,85 @@
+# benchmarks/bench_startup.py
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Measures how long importing each backend module takes, and how much memory
+# it costs, in a fresh interpreter. Run from the backend directory:
+#
+#     python benchmarks/bench_startup.py --max-import-seconds 1.0
+#
+# The command exits non-zero if any import is slower than the limit, so it can
+# guard against heavy work creeping back into import time.
+
+MODULES = [
+    "utils.parser",
+    "semantic_engine.vector_index",
+    "ollama_utils.summarize",
+    "debate.debate_agent",
+    "pipeline.prepare_jobs",
+    "main",
+]
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+result = {{"import_seconds": seconds, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}
+if {warm_up}:
+    from semantic_engine.vector_index import warm_up
+    start = time.perf_counter()
+    warm_up()
+    result["warm_up_seconds"] = time.perf_counter() - start
+    result["max_rss_mb_after_warm_up"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module, warm_up=False, repeat=3):
+    """Imports `module` in `repeat` fresh interpreters and keeps the fastest run."""
+    runs = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, warm_up=warm_up)],
+            cwd=BACKEND_DIR, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return min(runs, key=lambda run: run["import_seconds"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time and startup benchmark for the Cognitia backend.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warm-up", action="store_true", help="Also time semantic_engine.vector_index.warm_up().")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    args = parser.parse_args()
+
+    report = {module: measure(module, repeat=args.repeat) for module in MODULES}
+    if args.warm_up:
+        report["warm_up"] = measure("semantic_engine.vector_index", warm_up=True, repeat=1)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    if args.max_import_seconds is not None:
+        slow = [module for module in MODULES
+                if report[module].get("import_seconds", float("inf")) > args.max_import_seconds]
+        if slow:
+            print(f"❌ Slower than {args.max_import_seconds}s to import (or failed): {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
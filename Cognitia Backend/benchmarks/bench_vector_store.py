@@ -0,0 +1,122 @@
+# benchmarks/bench_vector_store.py
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.bench_pipeline import _git_commit, _percentile
+from semantic_engine.vector_store import ChromaStore, FlatStore
+
+# Recall and throughput of the vector store backends on synthetic embeddings.
+# Vectors are drawn around random cluster centres, like chunks of a handful of
+# papers, and normalized like the real embeddings. Recall@k is measured
+# against exact float32 search. Run from the backend directory:
+#
+#     python benchmarks/bench_vector_store.py --vectors 20000 --output stores.json
+
+BACKENDS = ("chroma", "flat-float16", "flat-int8")
+UPSERT_BATCH = 1000
+
+
+def _normalized(matrix):
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def make_vectors(n, dim, clusters, seed):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    assignment = rng.integers(0, clusters, size=n)
+    return _normalized(centres[assignment] + 0.8 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def open_backend(name, directory):
+    if name == "chroma":
+        return ChromaStore(directory, "bench")
+    return FlatStore(os.path.join(directory, "flat"), dtype=name.split("-", 1)[1])
+
+
+def bench_backend(name, directory, vectors, queries, truth, k):
+    ids = [f"chunk_{i}" for i in range(len(vectors))]
+    store = open_backend(name, directory)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), UPSERT_BATCH):
+        batch = slice(i, i + UPSERT_BATCH)
+        store.upsert(ids[batch], [f"text {j}" for j in range(i, i + len(ids[batch]))],
+                     [{"chunk": j} for j in range(i, i + len(ids[batch]))], vectors[batch].tolist())
+    build_seconds = time.perf_counter() - start
+    store.close()
+
+    # Reopening measures what a fresh worker process pays before its first answer.
+    start = time.perf_counter()
+    store = open_backend(name, directory)
+    store.query(query_embeddings=[queries[0].tolist()], n_results=k)
+    open_seconds = time.perf_counter() - start
+
+    latencies, hits = [], 0
+    start = time.perf_counter()
+    for query, expected in zip(queries, truth):
+        query_start = time.perf_counter()
+        result = store.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - query_start)
+        hits += len({int(chunk_id.rsplit("_", 1)[1]) for chunk_id in result["ids"][0]} & set(expected.tolist()))
+    seconds = time.perf_counter() - start
+    store.close()
+    return {
+        "build_seconds": round(build_seconds, 3),
+        "open_and_first_query_seconds": round(open_seconds, 4),
+        "qps": round(len(queries) / seconds, 1),
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 3),
+        },
+        f"recall_at_{k}": round(hits / (len(queries) * k), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall and QPS of the Cognitia vector store backends.")
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings have 384 dimensions.")
+    parser.add_argument("--clusters", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="Comma-separated subset of " + ", ".join(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout.")
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dim, args.clusters, args.seed)
+    # Queries sit near stored vectors, as real questions sit near the chunks that answer them.
+    rng = np.random.default_rng(args.seed + 1)
+    queries = _normalized(vectors[rng.integers(0, len(vectors), size=args.queries)]
+                          + 0.5 * rng.normal(size=(args.queries, args.dim)) / np.sqrt(args.dim)).astype(np.float32)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    results = {}
+    for name in args.backends.split(","):
+        print(f"⏱️  {name}...")
+        with tempfile.TemporaryDirectory(prefix="cognitia-store-bench-") as directory:
+            results[name] = bench_backend(name, directory, vectors, queries, truth, args.k)
+
+    report = {
+        "commit": _git_commit(),
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "backends": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/fake_arxiv.py
+
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+from benchmarks.fixtures import make_pdf
+
+# A local stand-in for the arXiv query API and PDF host. Point the fetcher at it
+# with ARXIV_API_URL=<url>/api/query and ARXIV_PDF_URL=<url>/pdf.
+
+
+class FakeArxivServer:
+    """
+    Serves `papers` synthetic papers; every feed lists them in the same order.
+    PDF requests honor a Range header, as arXiv does. `log` records the path
+    and Range header of every request.
+    """
+
+    def __init__(self, papers=5, pages=10, words_per_page=400, host="127.0.0.1", port=0):
+        self.papers = {
+            f"2401.{i:05d}v1": (f"Synthetic Paper {i}", make_pdf(pages, words_per_page, seed=i))
+            for i in range(papers)
+        }
+        self.requests = 0
+        self.log = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def feed(self, max_results):
+        entries = "".join(
+            f"<entry><id>http://arxiv.org/abs/{arxiv_id}</id><title>{escape(title)}</title></entry>"
+            for arxiv_id, (title, _) in list(self.papers.items())[:max_results]
+        )
+        return f'<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode("utf-8")
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, content_type, body, headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                    fake.log.append((self.path, self.headers.get("Range")))
+                url = urllib.parse.urlsplit(self.path)
+                if url.path == "/api/query":
+                    params = urllib.parse.parse_qs(url.query)
+                    max_results = int(params.get("max_results", ["10"])[0])
+                    self._send(200, "application/atom+xml", fake.feed(max_results))
+                elif url.path.startswith("/pdf/") and url.path.endswith(".pdf"):
+                    paper = fake.papers.get(url.path[len("/pdf/"):-len(".pdf")])
+                    if paper is None:
+                        self._send(404, "text/plain", b"not found")
+                    else:
+                        self._send_pdf(paper[1])
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send_pdf(self, pdf):
+                requested = self.headers.get("Range", "")
+                if not requested.startswith("bytes="):
+                    self._send(200, "application/pdf", pdf)
+                    return
+                start = int(requested[len("bytes="):].split("-", 1)[0])
+                if start >= len(pdf):
+                    self._send(416, "text/plain", b"", {"Content-Range": f"bytes */{len(pdf)}"})
+                    return
+                self._send(206, "application/pdf", pdf[start:],
+                           {"Content-Range": f"bytes {start}-{len(pdf) - 1}/{len(pdf)}"})
+
+        return Handler
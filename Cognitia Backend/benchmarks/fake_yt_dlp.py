@@ -0,0 +1,66 @@
+# benchmarks/fake_yt_dlp.py
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fixtures import make_rolling_vtt
+
+# A stand-in for the two yt-dlp calls fetchers.youtube_fetcher makes: a flat
+# search that prints "<id> <title>" per result, and a subtitle-only download
+# of one video. Transcripts are synthetic rolling auto-captions seeded by the
+# video ID. Point the fetcher at it with
+#
+#     YT_DLP_BIN="python benchmarks/fake_yt_dlp.py"
+#
+# FAKE_YT_DLP_DELAY adds seconds to every call, like a slow network, and
+# FAKE_YT_DLP_LOG names a file that gets one line per call.
+
+DELAY = float(os.environ.get("FAKE_YT_DLP_DELAY", "0"))
+LOG_PATH = os.environ.get("FAKE_YT_DLP_LOG")
+CAPTION_LINES = int(os.environ.get("FAKE_YT_DLP_LINES", "200"))
+
+
+def video_id(query: str, rank: int) -> str:
+    return hashlib.sha1(f"{query}#{rank}".encode("utf-8")).hexdigest()[:11]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("target")
+    parser.add_argument("--flat-playlist", action="store_true")
+    parser.add_argument("--print", dest="template")
+    parser.add_argument("--skip-download", action="store_true")
+    parser.add_argument("--write-auto-sub", action="store_true")
+    parser.add_argument("--sub-lang")
+    parser.add_argument("--sub-format")
+    parser.add_argument("--output")
+    parser.add_argument("--no-warnings", action="store_true")
+    args = parser.parse_args()
+
+    if LOG_PATH:
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(" ".join(sys.argv[1:]) + "\n")
+    time.sleep(DELAY)
+
+    if args.target.startswith("ytsearch"):
+        count, _, query = args.target[len("ytsearch"):].partition(":")
+        for rank in range(int(count or 1)):
+            print(f"{video_id(query, rank)} Fake talk {rank + 1} on {query}")
+        return
+
+    vid = args.target.rsplit("v=", 1)[-1]
+    if args.write_auto_sub and args.output:
+        path = args.output.replace("%(id)s", vid).replace("%(ext)s", f"{args.sub_lang or 'en'}.vtt")
+        seed = int(hashlib.sha1(vid.encode("utf-8")).hexdigest()[:8], 16)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_rolling_vtt(CAPTION_LINES, seed=seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/fixtures.py
+
+import random
+
+# Synthetic papers and transcripts for the offline benchmarks. Everything is
+# generated from a seed, so two runs with the same settings see the same corpus.
+
+VOCABULARY = (
+    "attention transformer embedding gradient descent convolution recurrent latent diffusion "
+    "retrieval augmented generation benchmark dataset baseline ablation encoder decoder token "
+    "pretraining finetuning alignment reward policy reinforcement graph neural network sparse "
+    "dense vector similarity cosine softmax layer normalization dropout regularization loss "
+    "optimizer adam momentum batch inference latency throughput quantization distillation "
+    "BERT-base GPT-4 ResNet-50 LoRA RLHF ViT CLIP T5 Llama-2 Mistral-7B"
+).split()
+
+LINE_WORDS = 12
+PAGE_LINES = 60
+
+
+def words(rng: random.Random, count: int) -> list[str]:
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+def make_pdf(pages: int, words_per_page: int, seed: int = 0) -> bytes:
+    """Builds a minimal PDF with one Helvetica text block per page."""
+    rng = random.Random(seed)
+    objects = []  # Object bodies; object N is objects[N - 1].
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # Filled in once the page tree exists.
+    page_tree = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for _ in range(pages):
+        page_words = words(rng, words_per_page)
+        lines = [" ".join(page_words[i:i + LINE_WORDS]) for i in range(0, len(page_words), LINE_WORDS)]
+        text = b" T* ".join(f"({line}) Tj".encode("latin-1") for line in lines[:PAGE_LINES])
+        stream = b"BT /F1 9 Tf 11 TL 40 800 Td " + text + b" ET"
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (page_tree, content, font)))
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % page_tree
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[page_tree - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
+
+
+def _timestamp(seconds: float) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{seconds:06.3f}"
+
+
+def make_vtt(cues: int, words_per_cue: int = 8, seed: int = 0) -> str:
+    """Builds a WebVTT transcript with `cues` consecutive three-second cues."""
+    rng = random.Random(seed)
+    blocks = ["WEBVTT\n"]
+    for i in range(cues):
+        blocks.append(f"{_timestamp(i * 3)} --> {_timestamp(i * 3 + 3)}\n{' '.join(words(rng, words_per_cue))}\n")
+    return "\n".join(blocks)
+
+
+def make_rolling_vtt(lines: int, words_per_line: int = 8, seed: int = 0) -> str:
+    """
+    Builds a transcript laid out like YouTube auto-captions: every cue shows
+    the previous line again above the new one, whose words carry inline
+    timing tags, and each cue is followed by a 10 ms cue repeating the line.
+    """
+    rng = random.Random(seed)
+    blocks = ["WEBVTT\nKind: captions\nLanguage: en\n"]
+    previous = " "
+    for i in range(lines):
+        start = i * 3
+        line = words(rng, words_per_line)
+        tagged = line[0] + "".join(f"<{_timestamp(start + (j + 1) * 0.3)}><c> {word}</c>"
+                                   for j, word in enumerate(line[1:]))
+        blocks.append(f"{_timestamp(start)} --> {_timestamp(start + 2.99)} align:start position:0%\n"
+                      f"{previous}\n{tagged}\n")
+        previous = " ".join(line)
+        blocks.append(f"{_timestamp(start + 2.99)} --> {_timestamp(start + 3)} align:start position:0%\n"
+                      f"{previous}\n \n")
+    return "\n".join(blocks)
+
+
+def make_queries(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [f"How does {rng.choice(VOCABULARY)} affect {rng.choice(VOCABULARY)}?" for _ in range(count)]
@@ -1,78 +1,152 @@
 # debate/debate_agent.py
 
-import subprocess
 import re
+import asyncio
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
+
+from ollama_utils.client import generate, stream, astream, OllamaError, MODEL
+from ollama_utils.scheduler import SchedulerBusy, DEBATE
+from semantic_engine.context import truncate_to_tokens, DEBATE_CONTEXT_TOKENS
+
+# A debate is three model calls instead of one long generation: support and
+# counterpoint run concurrently, then the reflection weighs both. Each section
+# is its own completion, so nothing has to be recovered from a combined reply,
+# and the first two sections take as long as the slower of them.
+
+ROLE = "You are a debate-style reasoning assistant who helps deepen understanding of academic material."
+STYLE = "Be concise, insightful, and neutral. Use plain academic English. Write only this argument, without a heading."
+
+
+def _claim(text: str) -> str:
+    return f"Here is a claim or excerpt from a research paper:\n{truncate_to_tokens(text, DEBATE_CONTEXT_TOKENS)}"
+
+
+def build_support_prompt(text: str) -> str:
+    return f"{ROLE}\n\n{_claim(text)}\n\nSupport the claim with evidence or logic. {STYLE}\n"
+
+
+def build_counterpoint_prompt(text: str) -> str:
+    return f"{ROLE}\n\n{_claim(text)}\n\nChallenge the claim with a counterpoint. {STYLE}\n"
+
+
+def build_reflection_prompt(text: str, support: str, counter: str) -> str:
+    return f"""{ROLE}
+
+{_claim(text)}
+
+The argument for it:
+{support}
+
+The argument against it:
+{counter}
+
+Reflect on both sides and conclude which is stronger, or propose a synthesis. {STYLE}
+"""
+
+
+def _strip_heading(section: str) -> str:
+    """Drops a "Support:"-style heading the model may add despite being asked not to."""
+    return re.sub(r"(?i)^[#*_\s]*(?:support|counterpoint|challenge|reflection|synthesis)[*_\s]*:[*_\s]*", "",
+                  section.strip())
+
+
+def debate_sides(text: str, priority=DEBATE, tag=None) -> tuple[str, str]:
+    """The supporting and the opposing argument on `text`, generated concurrently."""
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="debate") as pool:
+        support = pool.submit(generate, build_support_prompt(text), model=MODEL, priority=priority, tag=tag)
+        counter = pool.submit(generate, build_counterpoint_prompt(text), model=MODEL, priority=priority, tag=tag)
+        return _strip_heading(support.result()), _strip_heading(counter.result())
+
+
+def reflect(text: str, support: str, counter: str, priority=DEBATE, tag=None) -> str:
+    return _strip_heading(generate(build_reflection_prompt(text, support, counter), model=MODEL,
+                                   priority=priority, tag=tag))
+
+
+def debate_parts(text: str, priority=DEBATE) -> dict:
+    """Generates the debate on `text`; raises on model errors."""
+    support, counter = debate_sides(text, priority)
+    return {"support": support, "counter": counter, "reflection": reflect(text, support, counter, priority)}
+
+
+def debate_text(parts: dict) -> str:
+    """The debate as headed sections, the form `parse_debate_output` reads."""
+    return f"Support:\n{parts['support']}\n\nCounterpoint:\n{parts['counter']}\n\nReflection:\n{parts['reflection']}"
+
+
+def parse_debate_output(output: str) -> dict:
+    """Splits the model's debate output into its support, counter and reflection sections."""
+    # The flags have to lead the pattern; Python 3.11+ rejects them mid-pattern.
+    # A heading is a line of its own, so "in synthesis:" inside a section is left alone.
+    pattern = r"(?im)^(Support|Counterpoint|Challenge|Reflection|Synthesis):[ \t]*$"
+    parts = re.split(pattern, output.strip())
+
+    sections = {}
+    for i in range(1, len(parts), 2):
+        sections.setdefault(parts[i].lower(), parts[i+1].strip())
+
+    support_text = sections.get('support', '❓ Not found')
+    counter_text = sections.get('counterpoint') or sections.get('challenge', '❓ Not found')
+    reflection_text = sections.get('reflection') or sections.get('synthesis', '❓ Not found')
+
+    if support_text == '❓ Not found' or counter_text == '❓ Not found':
+         error_details = f"Could not parse required sections from LLM output.\n\nRaw Output:\n{output}"
+         return {"support": support_text, "counter": counter_text, "reflection": f"❌ {error_details}"}
+
+    return {"support": support_text, "counter": counter_text, "reflection": reflection_text}
 
-MODEL = "mistral"
 
 def _generate_debate_parts(text: str) -> dict:
     """
     Internal helper that runs the debate logic and returns a structured dict.
-    This preserves the original robust parsing logic.
     """
-    prompt = f"""
-You are a debate-style reasoning assistant who helps deepen understanding of academic material.
-
-Here is a claim or excerpt from a research paper:
-{text[:3500]}
-
-Debate this claim using the following structure:
-1. Support the claim with evidence or logic.
-2. Challenge the claim with a counterpoint.
-3. Reflect on both sides and conclude which is stronger, or propose a synthesis.
-
-Be concise, insightful, and neutral. Use plain academic English.
-Respond using clear section headings like:
-
-Support:
-...
-Counterpoint:
-...
-Reflection:
-...
-"""
     try:
-        result = subprocess.run(
-            ["ollama", "run", MODEL],
-            input=prompt.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
-        )
-        output = result.stdout.decode('utf-8').strip()
-        pattern = r"((?i)\n*(?:Support|Counterpoint|Challenge|Reflection|Synthesis):\s*)"
-        parts = re.split(pattern, output)
-        
-        sections = {}
-        for i in range(1, len(parts), 2):
-            header = parts[i].strip().lower().replace(":", "")
-            content = parts[i+1].strip()
-            sections[header] = content
-            
-        support_text = sections.get('support', '❓ Not found')
-        counter_text = sections.get('counterpoint') or sections.get('challenge', '❓ Not found')
-        reflection_text = sections.get('reflection') or sections.get('synthesis', '❓ Not found')
-
-        if support_text == '❓ Not found' or counter_text == '❓ Not found':
-             error_details = f"Could not parse required sections from LLM output.\n\nRaw Output:\n{output}"
-             return {"support": support_text, "counter": counter_text, "reflection": f"❌ {error_details}"}
-
-        return {"support": support_text, "counter": counter_text, "reflection": reflection_text}
-        
-    except subprocess.CalledProcessError as e:
-        error_msg = e.stderr.decode('utf-8')
-        return {"support": "", "counter": "", "reflection": f"❌ Ollama Error: {error_msg}"}
+        return debate_parts(text)
+    except SchedulerBusy:
+        raise  # Lets the API answer 429/503 instead of an error debate.
+    except OllamaError as e:
+        return {"support": "", "counter": "", "reflection": f"❌ Ollama Error: {e}"}
     except Exception as e:
         return {"support": "", "counter": "", "reflection": f"❌ Error generating debate: {str(e)}"}
 
 
+def generate_debate(text: str) -> dict:
+    """Public function returning the debate on `text` as a support/counter/reflection dict."""
+    return _generate_debate_parts(text)
+
+
+def stream_debate(text: str):
+    """
+    Yields the debate as headed sections: support and counterpoint in one
+    piece once both are done, then the reflection as it is generated. Parse the
+    whole with `parse_debate_output`.
+    """
+    support, counter = debate_sides(text)
+    yield f"Support:\n{support}\n\nCounterpoint:\n{counter}\n\nReflection:\n"
+    yield from stream(build_reflection_prompt(text, support, counter), model=MODEL, priority=DEBATE)
+
+
+async def astream_debate(text: str, priority=DEBATE):
+    """Async variant of `stream_debate`."""
+    support, counter = await asyncio.to_thread(debate_sides, text, priority)
+    yield f"Support:\n{support}\n\nCounterpoint:\n{counter}\n\nReflection:\n"
+    async with aclosing(astream(build_reflection_prompt(text, support, counter), model=MODEL,
+                                priority=priority)) as pieces:
+        async for piece in pieces:
+            yield piece
+
+
 def debate_agent(question: str, context: str) -> str:
     """
     Public function to generate a debate on a given context.
     Returns a single, formatted markdown string.
     """
-    debate_parts = _generate_debate_parts(context)
-    
+    return format_debate(_generate_debate_parts(context))
+
+
+def format_debate(debate_parts: dict) -> str:
+    """Renders a debate dict as the markdown returned by `debate_agent`."""
     support = debate_parts.get("support", "N/A")
     counter = debate_parts.get("counter", "N/A")
     reflection = debate_parts.get("reflection", "N/A")
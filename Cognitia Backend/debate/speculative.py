@@ -0,0 +1,140 @@
+# debate/speculative.py
+
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from debate.debate_agent import debate_sides, reflect
+from ollama_utils.scheduler import get_scheduler, BACKGROUND, DEBATE
+from utils import metrics
+
+# The input of a debate, the last answer, is known as soon as /query returns,
+# so the debate can be generated before anyone asks for it. Speculative
+# debates run at BACKGROUND priority and only use model capacity that
+# interactive work leaves free. When the debate is requested, a finished
+# speculation is returned as is and one still running is waited for: its
+# calls still waiting for a slot, and those it has yet to make, move up to
+# DEBATE priority. One speculation is kept per session, for its latest answer.
+# Speculation is opt-in (SPECULATIVE_DEBATE=1): every answer then costs three
+# more model calls, whether or not a debate follows.
+
+SPECULATIVE_DEBATE = os.environ.get("SPECULATIVE_DEBATE", "0") == "1"
+SPECULATION_WORKERS = 2  # Speculative debates generated at once.
+MAX_SPECULATIONS = 64    # Sessions with a speculation kept; the least recently answered are dropped.
+
+SPECULATIONS = metrics.counter("cognitia_debate_speculation_total",
+                               "Debate requests by the state of their speculative debate.", ("outcome",))
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+
+class _Speculation:
+    __slots__ = ("key", "future", "abandoned", "__weakref__")  # The scheduler tracks promoted tags weakly.
+
+    def __init__(self, key):
+        self.key = key
+        self.future = None
+        self.abandoned = False
+
+    def abandon(self):
+        """Stops the speculation: at once if it has not started, else before its reflection."""
+        self.abandoned = True
+        self.future.cancel()
+
+
+class DebateSpeculator:
+    """Background debates on each session's latest answer, ready for the debate request that may follow."""
+
+    def __init__(self, enabled=SPECULATIVE_DEBATE, workers=SPECULATION_WORKERS, max_entries=MAX_SPECULATIONS):
+        self.enabled = enabled
+        self.workers = workers
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # session_id -> _Speculation
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def start(self, session_id: str, text: str):
+        """Starts debating `text`, the answer just given in `session_id`, unless that is already under way."""
+        if not self.enabled or not text.strip():
+            return
+        key = _text_key(text)
+        with self._lock:
+            current = self._entries.get(session_id)
+            if current is not None and current.key == key:
+                return
+            if current is not None:
+                current.abandon()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="debate-speculation")
+            speculation = _Speculation(key)
+            speculation.future = self._pool.submit(self._run, speculation, text)
+            self._entries[session_id] = speculation
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_entries:
+                _, dropped = self._entries.popitem(last=False)
+                dropped.abandon()
+
+    @staticmethod
+    def _run(speculation, text):
+        # Tagged, so take() can move the calls up to DEBATE while they wait.
+        support, counter = debate_sides(text, BACKGROUND, tag=speculation)
+        if speculation.abandoned:
+            raise CancelledError()
+        return {"support": support, "counter": counter,
+                "reflection": reflect(text, support, counter, BACKGROUND, tag=speculation)}
+
+    def take(self, session_id: str, text: str):
+        """
+        The speculative debate on `text` for `session_id`, waiting for it if
+        it is still being generated; None if there is none or it failed, and
+        the caller generates the debate itself.
+        """
+        with self._lock:
+            speculation = self._entries.get(session_id)
+            if speculation is None or speculation.key != _text_key(text):
+                speculation = None
+            else:
+                del self._entries[session_id]
+        if speculation is None:
+            SPECULATIONS.inc(outcome="miss")
+            return None
+        if speculation.future.cancel():
+            # Still queued behind other speculations; generating it directly at DEBATE priority is faster.
+            SPECULATIONS.inc(outcome="miss")
+            return None
+        outcome = "hit" if speculation.future.done() else "in_flight"
+        get_scheduler().promote(speculation, DEBATE)
+        try:
+            parts = speculation.future.result()
+        except Exception as e:
+            print(f"⚠️ Speculative debate failed, generating it again: {e}")
+            SPECULATIONS.inc(outcome="failed")
+            return None
+        SPECULATIONS.inc(outcome=outcome)
+        return parts
+
+    def shutdown(self):
+        with self._lock:
+            for speculation in self._entries.values():
+                speculation.abandon()
+            self._entries.clear()
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+_default_speculator = None
+_default_speculator_lock = threading.Lock()
+
+
+def get_speculator() -> DebateSpeculator:
+    global _default_speculator
+    if _default_speculator is None:
+        with _default_speculator_lock:
+            if _default_speculator is None:
+                _default_speculator = DebateSpeculator()
+    return _default_speculator
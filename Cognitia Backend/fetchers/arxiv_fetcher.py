@@ -1,59 +1,140 @@
 # fetchers/arxiv_fetcher.py
 
 import os
-import time
+import shutil
+import urllib.error
 import urllib.parse
 import urllib.request
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from utils.ratelimit import TokenBucket
+from utils import metrics
+
 SAVE_DIR = "data/raw_papers"
+CACHE_DIR = "data/arxiv_cache"  # Every PDF ever fetched, keyed by arXiv ID and version.
 MAX_RESULTS = 5  # Number of papers per topic
 
-def _clean_old_papers():
-    if os.path.exists(SAVE_DIR):
-        for filename in os.listdir(SAVE_DIR):
+ARXIV_API_URL = os.environ.get("ARXIV_API_URL", "http://export.arxiv.org/api/query")
+ARXIV_PDF_URL = os.environ.get("ARXIV_PDF_URL", "http://arxiv.org/pdf")
+# arXiv asks for no more than one request every three seconds.
+REQUESTS_PER_SECOND = float(os.environ.get("ARXIV_REQUESTS_PER_SECOND", str(1 / 3)))
+DOWNLOAD_WORKERS = 3
+REQUEST_TIMEOUT = 60  # Seconds.
+USER_AGENT = "Cognitia/1.0 (research assistant)"
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+
+_rate_limiter = TokenBucket(REQUESTS_PER_SECOND)
+
+def _clean_old_papers(save_dir):
+    if os.path.exists(save_dir):
+        for filename in os.listdir(save_dir):
             if filename.endswith(".pdf"):
-                os.remove(os.path.join(SAVE_DIR, filename))
+                os.remove(os.path.join(save_dir, filename))
         print("🧹 Cleared previous arXiv PDFs.")
 
-def fetch_arxiv_papers_by_topic(topic, max_results=MAX_RESULTS):
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    _clean_old_papers()
+def _open(url, headers=None):
+    """Opens `url` once the rate limiter allows another request to arXiv."""
+    _rate_limiter.acquire()
+    request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT, **(headers or {})})
+    return urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT)
 
-    print(f"\n🔍 Searching arXiv for: {topic} (Top {max_results} results)")
+def _iter_entries(response):
+    """Yields (title, id_url) for each Atom entry as soon as it has been read from the feed."""
+    for _, elem in ET.iterparse(response, events=("end",)):
+        if elem.tag == f"{ATOM}entry":
+            yield elem.find(f"{ATOM}title").text, elem.find(f"{ATOM}id").text
+            elem.clear()
 
-    base_url = "http://export.arxiv.org/api/query?"
-    query = f"search_query=all:{urllib.parse.quote(topic)}&start=0&max_results={max_results}&sortBy=relevance&sortOrder=descending"
+def _versioned_id(id_url):
+    """Extracts <id>v<version> from an entry ID like http://arxiv.org/abs/<id>v<version>."""
+    return id_url.split("/abs/", 1)[-1]
 
-    response = urllib.request.urlopen(base_url + query)
-    raw_xml = response.read()
-    root = ET.fromstring(raw_xml)
+def _download(pdf_url, path):
+    """
+    Streams `pdf_url` to `path`. Bytes land in `<path>.part` first, and an
+    interrupted download resumes from where the .part file ends.
+    """
+    part_path = path + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
 
-    count = 0
-    for entry in root.findall("{http://www.w3.org/2005/Atom}entry"):
-        title = entry.find("{http://www.w3.org/2005/Atom}title").text
-        id_url = entry.find("{http://www.w3.org/2005/Atom}id").text
-        pdf_url = id_url.replace("abs", "pdf") + ".pdf"
+    try:
+        response = _open(pdf_url, headers)
+    except urllib.error.HTTPError as e:
+        if e.code != 416:  # 416: the .part file already holds the whole PDF.
+            raise
+    else:
+        with response:
+            # A server that ignores Range sends the whole file again.
+            mode = "ab" if response.status == 206 else "wb"
+            with open(part_path, mode) as f:
+                shutil.copyfileobj(response, f, 1 << 16)
+    os.replace(part_path, path)
 
-        safe_title = title.strip().replace(" ", "_").replace("/", "_")
-        filename = os.path.join(SAVE_DIR, f"{safe_title[:80]}.pdf")
+def _fetch_paper(title, id_url, save_dir):
+    """Makes the paper available in `save_dir`, downloading it only if it is not cached. Returns (path, downloaded)."""
+    safe_title = title.strip().replace(" ", "_").replace("/", "_").replace("\n", "")
+    filename = os.path.join(save_dir, f"{safe_title[:80]}.pdf")
+    arxiv_id = _versioned_id(id_url)
+    cached = os.path.join(CACHE_DIR, arxiv_id.replace("/", "_") + ".pdf")
 
-        if os.path.exists(filename):
-            continue
+    downloaded = False
+    if not os.path.exists(cached):
+        print(f"⬇️ Downloading: {title}")
+        with metrics.span("download_pdf"):
+            _download(f"{ARXIV_PDF_URL}/{arxiv_id}.pdf", cached)
+        downloaded = True
 
+    if not os.path.exists(filename):
         try:
-            print(f"⬇️ Downloading: {title}")
-            urllib.request.urlretrieve(pdf_url, filename)
-            count += 1
-            time.sleep(2)  # Avoid rate limiting
-        except Exception as e:
-            print(f"❌ Failed to download {title}: {e}")
+            os.link(cached, filename)
+        except OSError:
+            shutil.copyfile(cached, filename)
+    return filename, downloaded
+
+def fetch_arxiv_papers_by_topic(topic, max_results=MAX_RESULTS, on_paper=None, save_dir=SAVE_DIR):
+    """
+    Fetches the top arXiv papers for `topic` into `save_dir` and returns their paths.
+    `on_paper(path)` is called for each paper as soon as it is available.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _clean_old_papers(save_dir)
+
+    print(f"\n🔍 Searching arXiv for: {topic} (Top {max_results} results)")
+
+    query = f"search_query=all:{urllib.parse.quote(topic)}&start=0&max_results={max_results}&sortBy=relevance&sortOrder=descending"
+
+    paths = []
+    count = cached = 0
+    # Downloads start while the rest of the feed is still being read.
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {}
+        with _open(f"{ARXIV_API_URL}?{query}") as response:
+            for title, id_url in _iter_entries(response):
+                futures[pool.submit(_fetch_paper, title, id_url, save_dir)] = title
 
-    print(f"✅ Fetched {count} papers on '{topic}' → {SAVE_DIR} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+        for future in as_completed(futures):
+            try:
+                path, downloaded = future.result()
+            except Exception as e:
+                print(f"❌ Failed to download {futures[future]}: {e}")
+                continue
+            paths.append(path)
+            if downloaded:
+                count += 1
+            else:
+                cached += 1
+            if on_paper:
+                on_paper(path)
 
+    print(f"✅ Fetched {count} papers on '{topic}' ({cached} from cache) → {save_dir} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+    return paths
 
 if __name__ == "__main__":
     print("📚 arXiv Paper Fetcher with Topic Search")
     user_topic = input("🧠 Enter a research topic (e.g., 'graph neural networks', 'LLM alignment'): ")
-    fetch_arxiv_papers_by_topic(user_topic)
\ No newline at end of file
+    fetch_arxiv_papers_by_topic(user_topic)
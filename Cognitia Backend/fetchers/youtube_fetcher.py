@@ -1,47 +1,133 @@
 # fetchers/youtube_fetcher.py
 
 import os
+import shlex
+import shutil
+import tempfile
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+from utils import metrics
+
 SAVE_DIR = "data/youtube_transcripts"
+CACHE_DIR = "data/youtube_cache"  # Every transcript ever fetched, keyed by video ID.
 MAX_RESULTS = 5  # Number of YouTube videos to fetch per topic
 
-def _clean_old_transcripts():
-    if os.path.exists(SAVE_DIR):
-        for filename in os.listdir(SAVE_DIR):
+# The yt-dlp command; may include arguments, e.g. "python benchmarks/fake_yt_dlp.py" to run offline.
+YT_DLP_BIN = os.environ.get("YT_DLP_BIN", "yt-dlp")
+DOWNLOAD_WORKERS = 4
+SEARCH_TIMEOUT = 60   # Seconds.
+VIDEO_TIMEOUT = 120   # Seconds per video.
+SUB_LANG = "en"
+WATCH_URL = "https://www.youtube.com/watch?v="
+
+def _clean_old_transcripts(save_dir):
+    if os.path.exists(save_dir):
+        for filename in os.listdir(save_dir):
             if filename.endswith((".vtt", ".json", ".txt")):
-                os.remove(os.path.join(SAVE_DIR, filename))
+                os.remove(os.path.join(save_dir, filename))
         print("🧹 Cleared previous YouTube transcripts.")
 
-def download_subtitles_for_topic(topic, max_results=MAX_RESULTS):
-    os.makedirs(SAVE_DIR, exist_ok=True)
-    _clean_old_transcripts()
+def _yt_dlp(args, timeout):
+    return subprocess.run(shlex.split(YT_DLP_BIN) + args, check=True, capture_output=True, text=True,
+                          timeout=timeout)
 
-    print(f"\n🔍 Searching YouTube for: {topic} (Top {max_results} videos)")
+def search_videos(topic, max_results=MAX_RESULTS):
+    """Returns (video_id, title) for the top YouTube results on `topic`, without downloading anything."""
+    result = _yt_dlp(["--flat-playlist", "--no-warnings", "--print", "%(id)s %(title)s",
+                      f"ytsearch{max_results}:{topic}"], SEARCH_TIMEOUT)
+    videos = []
+    for line in result.stdout.splitlines():
+        video_id, _, title = line.strip().partition(" ")
+        if video_id:
+            videos.append((video_id, title or video_id))
+    return videos
+
+def _download_subtitles(video_id, cached):
+    """Downloads the auto-captions of one video to `cached`. Returns False if the video has none."""
+    # A private directory, so two topics fetching the same video don't collide.
+    work_dir = tempfile.mkdtemp(prefix=f".{video_id}.", dir=CACHE_DIR)
+    try:
+        _yt_dlp(["--skip-download", "--no-warnings", "--write-auto-sub", "--sub-lang", SUB_LANG,
+                 "--sub-format", "vtt", "--output", os.path.join(work_dir, "%(id)s.%(ext)s"),
+                 WATCH_URL + video_id], VIDEO_TIMEOUT)
+        downloaded = os.path.join(work_dir, f"{video_id}.{SUB_LANG}.vtt")
+        if not os.path.exists(downloaded):
+            return False
+        os.replace(downloaded, cached)
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _fetch_transcript(video_id, title, save_dir):
+    """
+    Makes the video's transcript available in `save_dir`, downloading it only
+    if it is not cached. Returns (path, downloaded); path is None if the video
+    has no captions.
+    """
+    safe_title = title.strip().replace(" ", "_").replace("/", "_").replace("\n", "")
+    filename = os.path.join(save_dir, f"{safe_title[:100]}.{video_id}.{SUB_LANG}.vtt")
+    cached = os.path.join(CACHE_DIR, f"{video_id}.{SUB_LANG}.vtt")
 
+    downloaded = False
+    if not os.path.exists(cached):
+        print(f"⬇️ Downloading subtitles: {title}")
+        with metrics.span("download_subtitles"):
+            if not _download_subtitles(video_id, cached):
+                return None, True
+        downloaded = True
+
+    if not os.path.exists(filename):
+        try:
+            os.link(cached, filename)
+        except OSError:
+            shutil.copyfile(cached, filename)
+    return filename, downloaded
+
+def download_subtitles_for_topic(topic, max_results=MAX_RESULTS, on_transcript=None, save_dir=SAVE_DIR):
+    """
+    Fetches English auto-captions for the top YouTube videos on `topic` into
+    `save_dir` and returns their paths. Videos are fetched in parallel and
+    `on_transcript(path)` is called for each one as soon as it is available.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    _clean_old_transcripts(save_dir)
+
+    print(f"\n🔍 Searching YouTube for: {topic} (Top {max_results} videos)")
     try:
-        search_query = f"ytsearch{max_results}:{topic}"
-        command = [
-            "yt-dlp",
-            "--skip-download",
-            "--write-auto-sub",
-            "--sub-lang", "en",
-            "--output", f"{SAVE_DIR}/%(title).100s.%(id)s.%(ext)s",
-            search_query
-        ]
-        subprocess.run(command, check=True)
-        print(f"✅ Subtitles downloaded for: {topic}")
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ yt-dlp failed: {e}")
-    except Exception as ex:
-        print(f"⚠️ Unexpected error: {ex}")
-
-    print(f"📁 Subtitles saved to: {SAVE_DIR} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+        videos = search_videos(topic, max_results)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"❌ yt-dlp search failed: {e}")
+        return []
+
+    paths = []
+    count = cached = 0
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {pool.submit(_fetch_transcript, video_id, title, save_dir): title for video_id, title in videos}
+        for future in as_completed(futures):
+            try:
+                path, downloaded = future.result()
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"❌ Failed to fetch subtitles for {futures[future]}: {e}")
+                continue
+            if path is None:
+                print(f"⚠️ No English captions: {futures[future]}")
+                continue
+            paths.append(path)
+            if downloaded:
+                count += 1
+            else:
+                cached += 1
+            if on_transcript:
+                on_transcript(path)
+
+    print(f"✅ Fetched {count} transcripts on '{topic}' ({cached} from cache) → {save_dir} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+    return paths
 
 
 if __name__ == "__main__":
     print("🎯 YouTube Subtitle Fetcher with Topic Search")
     user_topic = input("🧠 Enter a topic you're interested in (e.g., 'generative art', 'quantum computing'): ")
-    download_subtitles_for_topic(user_topic)
\ No newline at end of file
+    download_subtitles_for_topic(user_topic)
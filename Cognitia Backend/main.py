@@ -1,89 +1,189 @@
 # main.py
 
+import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict
-import subprocess
+from starlette.background import BackgroundTask
+from typing import List, Dict, Optional
 
 # Your core logic modules
-from debate.debate_agent import debate_agent
-from semantic_engine.vector_index import build_vector_index, semantic_search
-from fetchers.arxiv_fetcher import fetch_arxiv_papers_by_topic
-from fetchers.youtube_fetcher import download_subtitles_for_topic
-from utils.parser import run_parser
+from debate.debate_agent import generate_debate, astream_debate, debate_text, parse_debate_output, format_debate
+from debate.speculative import get_speculator
+from semantic_engine.vector_index import semantic_search, warm_up, index_version
+from semantic_engine.snapshot import export_snapshot, import_snapshot, SNAPSHOT_SUFFIX
+from semantic_engine.context import select_passages, SEPARATOR, ANSWER_CONTEXT_TOKENS
+from pipeline.prepare_jobs import submit_prepare_job, get_job
+from ollama_utils.client import agenerate, astream, get_client, OllamaError, MODEL
+from ollama_utils.cache import cache_key
+from ollama_utils.scheduler import get_scheduler, SchedulerBusy, INTERACTIVE, DEBATE
+from memory.session_store import get_session_store
+from utils.topics import get_registry, normalize_topic
+from utils.tokens import get_tokenizer
+from utils.single_flight import SingleFlight
+from utils import metrics
 
-# --- Chat History Management (No Changes) ---
-history: List[Dict[str, str]] = []
+# --- Chat History Management ---
+# History lives in SQLite, one log per session. Clients identify themselves with
+# an X-Session-ID header; requests without one share the "default" session.
+DEFAULT_SESSION_ID = "default"
+HISTORY_TOKENS = 1000  # Budget for earlier conversation included in the answer prompt.
+HISTORY_PAGE_SIZE = 50
 
-def add_to_history(role: str, content: str):
-    history.append({"role": role, "content": content})
+def session_id_header(x_session_id: Optional[str] = Header(None)) -> str:
+    return (x_session_id or "").strip()[:128] or DEFAULT_SESSION_ID
 
-def get_history() -> List[Dict[str, str]]:
-    return history
+def add_to_history(session_id: str, role: str, content: str):
+    get_session_store().append(session_id, role, content)
 
-def clear_history():
-    history.clear()
+def get_history(session_id: str, offset: int = 0, limit: int = HISTORY_PAGE_SIZE) -> List[Dict[str, str]]:
+    return get_session_store().page(session_id, offset, limit)
+
+def clear_history(session_id: str):
+    get_session_store().clear(session_id)
 
 # --- Core Application Logic ---
-def prepare_knowledge_base(topic: str) -> Dict[str, str]:
-    try:
-        print(f"--- Preparing knowledge base for topic: '{topic}' ---")
-        fetch_arxiv_papers_by_topic(topic)
-        download_subtitles_for_topic(topic)
-        run_parser()
-        build_vector_index()
-        return {"status": "success", "message": f"Knowledge base for '{topic}' is ready."}
-    except Exception as e:
-        print(f"ERROR: Failed to prepare knowledge base. {e}")
-        raise HTTPException(status_code=500, detail=f"Failed to prepare knowledge base: {str(e)}")
+NO_KNOWLEDGE_MESSAGE = "No relevant knowledge was found for your query. Try a different topic or question."
+ANSWER_ERROR_MESSAGE = "An error occurred while generating the answer."
+CONTEXT_CANDIDATES = 8  # Chunks retrieved for the context assembler to choose from.
 
-def answer_question(query: str) -> str:
-    print(f"\n--- Answering question: '{query}' with Single-Call RAG ---")
+# Seconds /query and /debate may take before answering 504. /query/stream
+# applies QUERY_TIMEOUT to its search, before the stream starts.
+QUERY_TIMEOUT = float(os.environ.get("QUERY_TIMEOUT", "180"))
+DEBATE_TIMEOUT = float(os.environ.get("DEBATE_TIMEOUT", "300"))
+
+# Concurrent identical requests share one computation: searches by
+# normalized question, topics and index version; answers by prompt; debates
+# by the answer debated.
+_retrievals = SingleFlight("retrieval")
+_answers = SingleFlight("answer")
+_debates = SingleFlight("debate")
+
+# Snapshot files (see semantic_engine/snapshot.py) loaded at startup, comma
+# separated, so a new node serves their topics without preparing them.
+SNAPSHOTS = [path.strip() for path in os.environ.get("SNAPSHOTS", "").split(",") if path.strip()]
+
+def _format_conversation(messages: List[Dict[str, str]]) -> str:
+    return "\n\n".join(f"{msg['role'].capitalize()}: {msg['content']}" for msg in messages)
+
+def retrieve_context(query: str, topics: Optional[List[str]] = None, rerank: Optional[bool] = None) -> Optional[str]:
+    """
+    The context passages for `query`, joined; None if nothing relevant was
+    found. `topics` are the topic namespaces to search; `rerank` turns the
+    cross-encoder stage on or off (None = server default).
+    """
     print("1. Performing semantic search...")
-    search_results = semantic_search(query)
+    search_results = semantic_search(query, top_k=CONTEXT_CANDIDATES, topics=topics, include_embeddings=True,
+                                     rerank=rerank)
     docs = search_results.get('documents', [])
     if not (docs and docs[0]):
-        return "No relevant knowledge was found for your query. Try a different topic or question."
-    source_chunks = docs[0]
-    context_text = "\n\n---\n\n".join(source_chunks)
-    print(f"2. Using {len(source_chunks)} chunks for context...")
+        return None
+    source_chunks = select_passages(
+        docs[0], ANSWER_CONTEXT_TOKENS,
+        query_embedding=search_results["query_embedding"], embeddings=search_results["embeddings"][0]
+    )
+    print(f"2. Using {len(source_chunks)} of {len(docs[0])} chunks for context...")
+    return SEPARATOR.join(source_chunks)
+
+def format_answer_prompt(query: str, context_text: str, conversation: Optional[List[Dict[str, str]]] = None) -> str:
+    """The answer prompt; `conversation` is the earlier exchange, oldest first."""
+    conversation_text = ""
+    if conversation:
+        conversation_text = f"""
+### CONVERSATION SO FAR ###
+{_format_conversation(conversation)}
+"""
     prompt = f"""
 You are a helpful AI research assistant. Your task is to provide a comprehensive answer to the user's question based *only* on the following context.
 Synthesize the information from all parts of the context to form a complete response.
 
 ### CONTEXT ###
-{context_text[:8000]} 
-
+{context_text}
+{conversation_text}
 ### QUESTION ###
 {query}
 
 ### ANSWER ###
 """
-    print("3. Generating final answer in one call...")
+    return prompt
+
+async def coalesced_context(query: str, topics: Optional[List[str]] = None, rerank: Optional[bool] = None):
+    """`retrieve_context`, shared with identical searches of the same index version already in flight."""
+    key = (normalize_topic(query), tuple(topics or ()), index_version(topics), rerank)
+    return await _retrievals.run(key, lambda: run_in_threadpool(retrieve_context, query, topics, rerank))
+
+async def _generate_answer(prompt: str) -> str:
     try:
-        result = subprocess.run(
-            ["ollama", "run", "mistral"],
-            input=prompt.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
-        )
-        answer = result.stdout.decode('utf-8').strip()
+        answer = await agenerate(prompt, priority=INTERACTIVE)
         print("4. Answer generated successfully.")
         return answer
+    except SchedulerBusy:
+        raise
     except Exception as e:
         print(f"ERROR: Failed to get answer from Ollama. {e}")
-        return "An error occurred while generating the answer."
+        return ANSWER_ERROR_MESSAGE
+
+async def answer_question(query: str, conversation: Optional[List[Dict[str, str]]] = None,
+                          topics: Optional[List[str]] = None, rerank: Optional[bool] = None) -> str:
+    """
+    Answers `query` in one model call over the retrieved context. Identical
+    questions in flight share one search, and identical prompts one generation.
+    """
+    print(f"\n--- Answering question: '{query}' with Single-Call RAG ---")
+    context_text = await coalesced_context(query, topics, rerank)
+    if context_text is None:
+        return NO_KNOWLEDGE_MESSAGE
+    prompt = format_answer_prompt(query, context_text, conversation)
+    print("3. Generating final answer in one call...")
+    return await _answers.run(cache_key(prompt, MODEL), lambda: _generate_answer(prompt))
+
+def speculate_debate(session_id: str, answer: str):
+    """Starts the debate on a fresh answer in the background, in case the user asks for it."""
+    if answer not in (NO_KNOWLEDGE_MESSAGE, ANSWER_ERROR_MESSAGE):
+        get_speculator().start(session_id, answer)
+
+async def debate_answer_async(session_id: str, context: str) -> str:
+    """
+    The debate on `context` as markdown, from the session's speculative debate
+    if there is one. Each session takes its own speculation, so none is left
+    running; only debates generated afresh are shared with identical ones in flight.
+    """
+    parts = await run_in_threadpool(get_speculator().take, session_id, context)
+    if parts is None:
+        key = cache_key(context, MODEL)
+        parts = await _debates.run(key, lambda: run_in_threadpool(generate_debate, context))
+    return format_debate(parts)
+
+async def within(seconds: float, awaitable, what: str):
+    """Awaits `awaitable`, or answers 504 after `seconds`. Shared computations carry on for their other callers."""
+    try:
+        return await asyncio.wait_for(awaitable, seconds)
+    except asyncio.TimeoutError:
+        print(f"ERROR: {what} timed out after {seconds:.0f}s.")
+        raise HTTPException(status_code=504, detail=f"The {what} took longer than {seconds:.0f}s.")
 
 # --- Pydantic Models ---
 class PrepareRequest(BaseModel):
     topic: str
+    refresh: bool = False  # Fetch again even if the topic is already prepared.
 
 class QueryRequest(BaseModel):
     question: str
     debate: bool = False
+    topics: Optional[List[str]] = None  # Topic names or IDs to search instead of the active topics.
+    rerank: Optional[bool] = None  # Cross-encoder reranking of retrieved chunks; None = RERANK_ENABLED.
+
+class ActiveTopicsRequest(BaseModel):
+    topics: List[str]
 
 # --- FastAPI App Setup ---
 app = FastAPI(
@@ -100,58 +200,293 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+HTTP_SECONDS = metrics.histogram("cognitia_http_request_seconds", "API request duration.",
+                                 ("method", "path", "status"))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """
+    Times every request and collects the stage timings recorded while handling
+    it. For streaming endpoints the time covers everything up to the first byte.
+    """
+    if not metrics.ENABLED:
+        return await call_next(request)
+    token = metrics.begin_request()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        seconds = time.perf_counter() - start
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_SECONDS.observe(seconds, method=request.method, path=path, status=str(status))
+        metrics.end_request(token, method=request.method, path=path, status=status, seconds=round(seconds, 4))
+
+@app.exception_handler(SchedulerBusy)
+async def scheduler_busy(request: Request, exc: SchedulerBusy):
+    """The model queue is full (429) or the request waited too long (503)."""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.on_event("startup")
+def pin_model():
+    """
+    Loads the model into Ollama, and its tokenizer for prompt budgets, up
+    front so the first question doesn't pay for them. Runs in the background,
+    so startup does not wait on Ollama.
+    """
+    def run():
+        get_tokenizer()
+        try:
+            get_client().pin_model()
+        except OllamaError as e:
+            print(f"WARNING: Could not preload the model. {e}")
+    threading.Thread(target=run, name="pin-model", daemon=True).start()
+
+@app.on_event("startup")
+def warm_up_semantic_engine():
+    """
+    Imports SNAPSHOTS, loads the embedding model and opens the indexes in the
+    background, so the server accepts requests right away; a request that
+    needs them first waits.
+    """
+    def run():
+        imported = []
+        for path in SNAPSHOTS:
+            try:
+                imported.append(import_snapshot(path))
+            except Exception as e:
+                print(f"WARNING: Could not import snapshot {path}. {e}")
+        try:
+            if imported:
+                get_registry().set_active(imported)
+            warm_up(get_registry().active())
+            print("Semantic engine warmed up.")
+        except Exception as e:
+            print(f"WARNING: Semantic engine warm-up failed. {e}")
+    threading.Thread(target=run, name="warm-up", daemon=True).start()
+
+@app.on_event("shutdown")
+def close_ollama_client():
+    get_speculator().shutdown()
+    get_client().close()
+
+# --- Streaming Helpers ---
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_completion(http_request: Request, tokens, finalize):
+    """
+    Relays tokens from Ollama (`tokens`, an async iterator such as `astream`)
+    to the client as Server-Sent Events.
+    When generation completes, `finalize(full_text)` returns the message to
+    store in history, which is sent as the final `done` event. A client that
+    disconnects cancels generation and nothing is stored.
+    """
+    pieces = []
+    try:
+        async with aclosing(tokens):
+            async for piece in tokens:
+                if await http_request.is_disconnected():
+                    print("Client disconnected, generation cancelled.")
+                    return
+                pieces.append(piece)
+                yield _sse("token", {"token": piece})
+    except (OllamaError, SchedulerBusy) as e:
+        print(f"ERROR: Streaming from Ollama failed. {e}")
+        yield _sse("error", {"detail": str(e)})
+        return
+    yield _sse("done", {"response": finalize("".join(pieces).strip())})
+
+def _event_stream(events) -> StreamingResponse:
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _query_topics(requested: Optional[List[str]]) -> Optional[List[str]]:
+    """
+    The topic namespaces a query searches: the requested ones, else the active
+    ones. None (nothing prepared yet) searches the default namespace.
+    """
+    registry = get_registry()
+    if requested:
+        slugs = [registry.resolve(name) for name in requested]
+        unknown = [name for name, slug in zip(requested, slugs) if slug is None]
+        if unknown:
+            raise HTTPException(status_code=404, detail=f"Unknown topic(s): {', '.join(unknown)}")
+    else:
+        slugs = registry.active()
+    registry.touch(slugs)
+    return slugs or None
+
+def _debate_context(session_id: str, detail: str):
+    """Returns (last assistant message, question that led to it) or rejects the request."""
+    last_role, context_for_debate, original_question = get_session_store().last_exchange(session_id)
+    if last_role != 'assistant':
+        raise HTTPException(status_code=400, detail=detail)
+    return context_for_debate, original_question or "related context"
+
 # --- API Endpoints ---
 
-@app.post("/prepare", summary="Prepare Knowledge Base")
+@app.post("/prepare", summary="Prepare Knowledge Base", status_code=202)
 def api_prepare_knowledge_base(request: PrepareRequest):
-    return prepare_knowledge_base(topic=request.topic)
+    job, created = submit_prepare_job(request.topic, refresh=request.refresh)
+    if job.status == "succeeded":
+        return {"status": "ready", "job_id": job.id, "topic_id": job.slug,
+                "message": f"Switched to the prepared knowledge base for '{job.topic}'."}
+    message = (f"Preparing knowledge base for '{job.topic}'." if created
+               else f"Knowledge base for '{job.topic}' is already being prepared.")
+    return {"status": "accepted", "job_id": job.id, "topic_id": job.slug, "message": message}
+
+@app.get("/prepare/{job_id}", summary="Prepare Job Status")
+def api_prepare_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown prepare job '{job_id}'.")
+    return job.to_dict()
 
 @app.post("/query", summary="Process User Input (Query or Debate)")
-def api_process_query(request: QueryRequest):
+async def api_process_query(request: QueryRequest, session_id: str = Depends(session_id_header)):
     if request.debate:
         print("\n--- DEBATE request received ---")
-        if not history or history[-1]['role'] != 'assistant':
-            raise HTTPException(status_code=400, detail="Cannot generate debate without a previous answer.")
-        context_for_debate = history[-1]['content']
-        original_question = next((msg['content'] for msg in reversed(history) if msg['role'] == 'user'), "related context")
+        context_for_debate, original_question = await run_in_threadpool(
+            _debate_context, session_id, "Cannot generate debate without a previous answer.")
         print(f"1. Debating context from question: '{original_question}'")
-        debate_response = debate_agent(question=original_question, context=context_for_debate)
+        get_scheduler().check_admission(DEBATE)
+        debate_response = await within(DEBATE_TIMEOUT, debate_answer_async(session_id, context_for_debate), "debate")
         full_debate_message = f"**Debate Response:**\n\n{debate_response}"
-        add_to_history("assistant", full_debate_message)
+        await run_in_threadpool(add_to_history, session_id, "assistant", full_debate_message)
         print("2. Debate generated successfully.")
         return {"response": full_debate_message}
     else:
-        add_to_history("user", request.question)
-        answer = answer_question(query=request.question)
-        add_to_history("assistant", answer)
+        get_scheduler().check_admission(INTERACTIVE)
+        topics = await run_in_threadpool(_query_topics, request.topics)
+        conversation = await run_in_threadpool(get_session_store().window, session_id, HISTORY_TOKENS)
+        await run_in_threadpool(add_to_history, session_id, "user", request.question)
+        answer = await within(QUERY_TIMEOUT, answer_question(
+            query=request.question, conversation=conversation, topics=topics, rerank=request.rerank), "answer")
+        await run_in_threadpool(add_to_history, session_id, "assistant", answer)
+        speculate_debate(session_id, answer)
         return {"response": answer}
 
 @app.post("/debate", summary="Dedicated Debate Endpoint")
-def api_generate_debate(request: QueryRequest):
+async def api_generate_debate(request: QueryRequest, session_id: str = Depends(session_id_header)):
     print("\n--- [DEBATE] POST /debate ---")
-    if not history or history[-1]['role'] != 'assistant':
-        raise HTTPException(status_code=400, detail="Cannot generate debate without a previous assistant message.")
-    context_for_debate = history[-1]['content']
-    original_question = next((msg['content'] for msg in reversed(history) if msg['role'] == 'user'), "related context")
+    context_for_debate, original_question = await run_in_threadpool(
+        _debate_context, session_id, "Cannot generate debate without a previous assistant message.")
     print(f"Generating debate for question: '{original_question}'")
     try:
-        debate_response = debate_agent(question=original_question, context=context_for_debate)
+        debate_response = await within(DEBATE_TIMEOUT, debate_answer_async(session_id, context_for_debate), "debate")
         debate_message = f"**Debate Response:**\n\n{debate_response}"
-        add_to_history("assistant", debate_message)
+        await run_in_threadpool(add_to_history, session_id, "assistant", debate_message)
         print("Debate generated successfully.")
         return {"response": debate_message}
+    except (SchedulerBusy, HTTPException):
+        raise
     except Exception as e:
         print(f"Error generating debate: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate debate.")
 
+@app.post("/query/stream", summary="Stream Answer (Server-Sent Events)")
+async def api_stream_query(request: QueryRequest, http_request: Request,
+                           session_id: str = Depends(session_id_header)):
+    if request.debate:
+        return await api_stream_debate(request, http_request, session_id)
+    print(f"\n--- Streaming answer to: '{request.question}' ---")
+    # Refuse before the 200 response starts; later refusals arrive as an `error` event.
+    get_scheduler().check_admission(INTERACTIVE)
+    topics = await run_in_threadpool(_query_topics, request.topics)
+    store = get_session_store()
+    conversation = await run_in_threadpool(store.window, session_id, HISTORY_TOKENS)
+    await run_in_threadpool(add_to_history, session_id, "user", request.question)
+    context_text = await within(QUERY_TIMEOUT, coalesced_context(request.question, topics, request.rerank), "search")
+
+    if context_text is None:
+        await run_in_threadpool(add_to_history, session_id, "assistant", NO_KNOWLEDGE_MESSAGE)
+        async def no_knowledge():
+            yield _sse("done", {"response": NO_KNOWLEDGE_MESSAGE})
+        return _event_stream(no_knowledge())
+
+    prompt = format_answer_prompt(request.question, context_text, conversation)
+    def finalize(answer):
+        add_to_history(session_id, "assistant", answer)
+        speculate_debate(session_id, answer)
+        return answer
+    return _event_stream(_stream_completion(http_request, astream(prompt), finalize))
+
+@app.post("/debate/stream", summary="Stream Debate (Server-Sent Events)")
+async def api_stream_debate(request: QueryRequest, http_request: Request,
+                            session_id: str = Depends(session_id_header)):
+    print("\n--- [DEBATE] POST /debate/stream ---")
+    context_for_debate, original_question = await run_in_threadpool(
+        _debate_context, session_id, "Cannot generate debate without a previous assistant message.")
+    print(f"Streaming debate for question: '{original_question}'")
+    get_scheduler().check_admission(DEBATE)
+
+    def finalize(output):
+        debate_message = f"**Debate Response:**\n\n{format_debate(parse_debate_output(output))}"
+        add_to_history(session_id, "assistant", debate_message)
+        return debate_message
+
+    async def tokens():
+        # A speculative debate arrives as a single piece; otherwise the sides come first, then the reflection.
+        parts = await run_in_threadpool(get_speculator().take, session_id, context_for_debate)
+        if parts is not None:
+            yield debate_text(parts)
+            return
+        async with aclosing(astream_debate(context_for_debate)) as pieces:
+            async for piece in pieces:
+                yield piece
+    return _event_stream(_stream_completion(http_request, tokens(), finalize))
+
+@app.get("/topics", summary="List Prepared Topics")
+def api_list_topics():
+    return get_registry().list_topics()
+
+@app.put("/topics/active", summary="Choose the Topics Queries Search")
+def api_set_active_topics(request: ActiveTopicsRequest):
+    registry = get_registry()
+    slugs = [registry.resolve(name) or name for name in request.topics]
+    try:
+        registry.set_active(slugs)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    return {"status": "success", "active": slugs}
+
+@app.get("/topics/{name}/snapshot", summary="Download a Topic Snapshot")
+def api_export_snapshot(name: str):
+    """The prepared topic as a snapshot file, for another node's SNAPSHOTS."""
+    slug = get_registry().resolve(name)
+    if slug is None:
+        raise HTTPException(status_code=404, detail=f"Not a prepared topic: {name}")
+    fd, path = tempfile.mkstemp(suffix=SNAPSHOT_SUFFIX)
+    os.close(fd)
+    try:
+        export_snapshot(slug, path)
+    except KeyError as e:
+        os.remove(path)
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except Exception:
+        os.remove(path)
+        raise
+    return FileResponse(path, media_type="application/zip", filename=f"{slug}{SNAPSHOT_SUFFIX}",
+                        background=BackgroundTask(os.remove, path))
+
 @app.post("/reset", summary="Reset Chat History")
-def api_reset_history():
-    clear_history()
+def api_reset_history(session_id: str = Depends(session_id_header)):
+    clear_history(session_id)
     return {"status": "success", "message": "Chat history has been cleared."}
 
 @app.get("/history", summary="Get Chat History")
-def api_get_history() -> List[Dict[str, str]]:
-    return get_history()
+def api_get_history(offset: int = Query(0, ge=0), limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=500),
+                    session_id: str = Depends(session_id_header)) -> List[Dict[str, str]]:
+    """One page of the session's history, oldest first."""
+    return get_history(session_id, offset, limit)
+
+@app.get("/metrics", summary="Prometheus Metrics", response_class=PlainTextResponse)
+def api_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # --- Uvicorn Runner ---
 if __name__ == "__main__":
@@ -0,0 +1,141 @@
+# memory/session_store.py
+
+import os
+import time
+import sqlite3
+import threading
+
+from utils.tokens import count_tokens
+
+# Per-session chat history in SQLite. Nothing is held in memory per session,
+# so memory use stays flat however many users are active.
+
+DB_PATH = os.environ.get("SESSION_DB_PATH", "data/sessions.sqlite3")
+SESSION_TTL = float(os.environ.get("SESSION_TTL", str(7 * 24 * 3600)))  # Seconds a session may sit idle.
+EVICT_INTERVAL = 300  # Seconds between idle-session sweeps.
+
+
+class SessionStore:
+    """
+    Append-only message log per session. Each session row also carries its
+    last message's role, the last assistant message and the last question,
+    so debate endpoints read them without scanning history.
+    """
+
+    def __init__(self, path=DB_PATH, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                last_role TEXT,
+                last_assistant TEXT,
+                last_question TEXT
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+        self._db.commit()
+
+    def append(self, session_id: str, role: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO sessions (session_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO NOTHING", (session_id, now))
+            seq = self._db.execute("SELECT message_count FROM sessions WHERE session_id = ?",
+                                   (session_id,)).fetchone()[0]
+            self._db.execute(
+                "INSERT INTO messages (session_id, seq, role, content, tokens, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, seq, role, content, count_tokens(content), now))
+            self._db.execute(
+                "UPDATE sessions SET last_seen = ?, message_count = message_count + 1, last_role = ? "
+                "WHERE session_id = ?", (now, role, session_id))
+            if role in ("user", "assistant"):
+                column = "last_question" if role == "user" else "last_assistant"
+                self._db.execute(f"UPDATE sessions SET {column} = ? WHERE session_id = ?", (content, session_id))
+            self._db.commit()
+            if now - self._last_sweep > EVICT_INTERVAL:
+                self._evict_idle(now)
+
+    def last_exchange(self, session_id: str):
+        """Returns (last role, last assistant message, last question), or Nones for an unknown session."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_role, last_assistant, last_question FROM sessions WHERE session_id = ?",
+                (session_id,)).fetchone()
+        return row or (None, None, None)
+
+    def window(self, session_id: str, token_budget: int) -> list[dict]:
+        """The most recent messages that fit in `token_budget` tokens, oldest first."""
+        messages, used = [], 0
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT role, content, tokens FROM messages WHERE session_id = ? ORDER BY seq DESC", (session_id,))
+            for role, content, tokens in cursor:
+                if used + tokens > token_budget:
+                    break
+                messages.append({"role": role, "content": content})
+                used += tokens
+        messages.reverse()
+        return messages
+
+    def page(self, session_id: str, offset: int = 0, limit: int = 50) -> list[dict]:
+        """Messages in chronological order, `limit` at a time."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT role, content FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq LIMIT ?",
+                (session_id, offset, limit)).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def _evict_idle(self, now):
+        self._last_sweep = now
+        cutoff = now - self.ttl
+        idle = [session_id for (session_id,) in
+                self._db.execute("SELECT session_id FROM sessions WHERE last_seen < ?", (cutoff,))]
+        for session_id in idle:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+        self._db.commit()
+        if idle:
+            print(f"🧹 Evicted {len(idle)} idle chat sessions.")
+
+    def evict_idle(self):
+        """Deletes every session that has been idle for longer than the TTL."""
+        with self._lock:
+            self._evict_idle(time.time())
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Returns the process-wide session store, opening it on first use."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = SessionStore()
+    return _default_store
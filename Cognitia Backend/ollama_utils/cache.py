@@ -0,0 +1,171 @@
+# ollama_utils/cache.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from utils import metrics
+
+# Content-addressed cache of model completions, keyed by model, generation
+# options and the whitespace-normalized prompt. The same top-k chunks come back
+# for related questions, so repeated summaries become a lookup.
+
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "data/llm_cache.sqlite3")
+CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+MAX_AGE = float(os.environ.get("LLM_CACHE_MAX_AGE", str(7 * 24 * 3600)))  # Seconds.
+EVICT_BATCH = 64  # Least recently used entries fetched per eviction query.
+
+
+def cache_key(prompt: str, model: str, options=None, system=None) -> str:
+    normalized = " ".join(prompt.split())
+    material = json.dumps({"model": model, "options": options or {}, "system": system or "", "prompt": normalized},
+                          sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    SQLite-backed completion store with least-recently-used eviction once it
+    holds more than `max_bytes` of responses, and expiry after `max_age` seconds.
+    Entry count and size are kept as running totals, so writes and stats do
+    not scan the table; the cache file is owned by a single process.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = self.misses = self.writes = self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_last_access ON completions (last_access)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS completions_created ON completions (created)")
+        self._db.commit()
+        self._entries, self._bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+
+    def get(self, key: str):
+        """Returns the cached response for `key`, or None."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT response, created FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.max_age:
+                self._delete(key)
+                self._db.commit()
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._delete(key)
+            self._db.execute(
+                "INSERT INTO completions (key, model, response, size, created, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now)
+            )
+            self._entries += 1
+            self._bytes += size
+            self.writes += 1
+            self._evict(now)
+            self._db.commit()
+
+    def _delete(self, key):
+        """Deletes `key` if present and takes it off the running totals."""
+        row = self._db.execute("SELECT size FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+            self._entries -= 1
+            self._bytes -= row[0]
+
+    def _evict(self, now):
+        cutoff = now - self.max_age
+        expired, expired_bytes = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions WHERE created < ?", (cutoff,)).fetchone()
+        if expired:
+            self._db.execute("DELETE FROM completions WHERE created < ?", (cutoff,))
+            self._entries -= expired
+            self._bytes -= expired_bytes
+        evicted = 0
+        while self._bytes > self.max_bytes and self._entries:
+            batch = self._db.execute("SELECT key, size FROM completions ORDER BY last_access LIMIT ?",
+                                     (EVICT_BATCH,)).fetchall()
+            victims = []
+            for key, size in batch:
+                victims.append((key,))
+                self._entries -= 1
+                self._bytes -= size
+                if self._bytes <= self.max_bytes:
+                    break
+            self._db.executemany("DELETE FROM completions WHERE key = ?", victims)
+            evicted += len(victims)
+        self.evictions += expired + evicted
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM completions")
+            self._db.commit()
+            self._entries = self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                    "evictions": self.evictions, "entries": self._entries, "bytes": self._bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide completion cache, or None when LLM_CACHE_ENABLED=0."""
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = CompletionCache()
+    return _default_cache
+
+
+def _collect_cache_stats():
+    if _default_cache is None:
+        return []
+    stats = _default_cache.stats()
+    return [
+        ("cognitia_llm_cache_hits_total", "counter", "Completion cache hits.", stats["hits"]),
+        ("cognitia_llm_cache_misses_total", "counter", "Completion cache misses.", stats["misses"]),
+        ("cognitia_llm_cache_writes_total", "counter", "Completions written to the cache.", stats["writes"]),
+        ("cognitia_llm_cache_evictions_total", "counter", "Completions expired or evicted.", stats["evictions"]),
+        ("cognitia_llm_cache_entries", "gauge", "Completions currently cached.", stats["entries"]),
+        ("cognitia_llm_cache_bytes", "gauge", "Size of the cached completions.", stats["bytes"]),
+    ]
+
+
+metrics.register_collector(_collect_cache_stats)
@@ -0,0 +1,353 @@
+# ollama_utils/client.py
+
+import os
+import json
+import time
+import queue
+import asyncio
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+from ollama_utils.cache import cache_key, get_cache
+from ollama_utils.scheduler import get_scheduler, INTERACTIVE
+from utils import metrics
+
+# Shared client for the Ollama HTTP API. Every model call in the backend goes
+# through here instead of forking `ollama run`, so connections are reused and
+# the model stays loaded between calls.
+
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+MODEL = os.environ.get("COGNITIA_MODEL", "mistral")
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # How long Ollama keeps the model in memory.
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "8"))
+TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "300"))  # Seconds.
+RETRIES = 2
+RETRY_BACKOFF = 0.5  # Seconds, doubled on every retry.
+
+LLM_REQUESTS = metrics.counter("cognitia_llm_requests_total", "Model calls by mode and outcome.", ("mode", "outcome"))
+LLM_TOKENS = metrics.counter("cognitia_llm_tokens_total", "Prompt and completion tokens reported by Ollama.", ("kind",))
+LLM_FIRST_TOKEN = metrics.histogram("cognitia_llm_first_token_seconds", "Time until a streamed completion starts.")
+
+
+def _record_completion(mode, start, final):
+    """Records a finished model call; `final` is Ollama's closing response object."""
+    metrics.record_stage(f"llm_{mode}", time.perf_counter() - start)
+    LLM_REQUESTS.inc(mode=mode, outcome="ok")
+    LLM_TOKENS.inc(final.get("prompt_eval_count", 0), kind="prompt")
+    LLM_TOKENS.inc(final.get("eval_count", 0), kind="completion")
+
+
+class OllamaError(Exception):
+    """Raised when the Ollama server cannot produce a completion."""
+
+
+class OllamaClient:
+    """Thread-safe Ollama API client backed by a pool of keep-alive connections."""
+
+    def __init__(self, host=OLLAMA_HOST, pool_size=POOL_SIZE, timeout=TIMEOUT,
+                 retries=RETRIES, keep_alive=KEEP_ALIVE, cache=None, scheduler=None):
+        url = urlsplit(host if "://" in host else f"http://{host}")
+        self._connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        self._host = url.hostname or "127.0.0.1"
+        self._port = url.port
+        self.timeout = timeout
+        self.retries = retries
+        self.keep_alive = keep_alive
+        self.cache = cache  # Optional CompletionCache consulted before every generation.
+        self.scheduler = scheduler  # Optional LLMScheduler every generation takes a slot from.
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    # --- Connection pool ---
+
+    def _acquire(self, timeout):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connection_class(self._host, self._port, timeout=timeout)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        """Closes every pooled connection."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- Requests ---
+
+    def _open(self, path, payload, timeout=None):
+        """
+        POSTs JSON and returns (connection, response) once a 200 response has started.
+        Transient failures before that point are retried.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        body = json.dumps(payload).encode("utf-8")
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+            conn = self._acquire(timeout)
+            try:
+                conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+                response = conn.getresponse()
+            except TimeoutError as e:
+                conn.close()
+                raise OllamaError(f"Ollama did not respond within {timeout}s") from e
+            except (OSError, http.client.HTTPException) as e:
+                # Covers refused connections and pooled connections the server has since closed.
+                conn.close()
+                last_error = e
+                continue
+
+            if response.status == 200:
+                return conn, response
+
+            error = OllamaError(f"Ollama returned HTTP {response.status}: {response.read().decode('utf-8', 'replace')}")
+            self._finish(conn, response)
+            if response.status < 500:
+                raise error
+            last_error = error
+
+        raise OllamaError(f"Ollama request failed after {self.retries + 1} attempts: {last_error}")
+
+    def _finish(self, conn, response):
+        """Returns a fully read connection to the pool."""
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+    def _post(self, path, payload, timeout=None):
+        """POSTs JSON and returns the decoded JSON response."""
+        conn, response = self._open(path, payload, timeout)
+        try:
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise OllamaError(f"Ollama connection failed mid-response: {e}") from e
+        self._finish(conn, response)
+        try:
+            result = json.loads(data)
+        except ValueError as e:  # Also covers bodies that are not UTF-8.
+            raise OllamaError(f"Ollama returned a malformed response: {data[:200]!r}") from e
+        if not isinstance(result, dict):
+            raise OllamaError(f"Ollama returned a malformed response: {data[:200]!r}")
+        return result
+
+    def _generate_payload(self, prompt, model, options, system, keep_alive, stream):
+        payload = {
+            "model": model or MODEL,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive if keep_alive is None else keep_alive,
+        }
+        if options:
+            payload["options"] = options
+        if system:
+            payload["system"] = system
+        return payload
+
+    def generate(self, prompt, model=None, options=None, system=None, keep_alive=None, timeout=None,
+                 priority=INTERACTIVE, tag=None) -> str:
+        """
+        Returns the full completion for `prompt`.
+        `options` are passed through as Ollama generation options
+        (temperature, num_ctx, num_predict, ...). `priority` is the scheduler
+        class the call waits in; cache hits skip the queue. `tag` lets the
+        scheduler promote the call while it waits (see LLMScheduler.promote).
+        """
+        payload = self._generate_payload(prompt, model, options, system, keep_alive, stream=False)
+        key = cache_key(prompt, payload["model"], options, system) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_REQUESTS.inc(mode="generate", outcome="cached")
+                return cached
+
+        if self.scheduler:
+            self.scheduler.acquire(priority, tag)
+        start = time.perf_counter()
+        try:
+            result = self._post("/api/generate", payload, timeout=timeout)
+            if "error" in result:
+                raise OllamaError(result["error"])
+            response = result.get("response") or ""
+            if not isinstance(response, str):
+                raise OllamaError(f"Ollama returned a malformed response: {result!r:.200}")
+        except OllamaError:
+            LLM_REQUESTS.inc(mode="generate", outcome="error")
+            raise
+        finally:
+            if self.scheduler:
+                self.scheduler.release()
+        _record_completion("generate", start, result)
+        response = response.strip()
+        if key and response:
+            self.cache.put(key, payload["model"], response)
+        return response
+
+    async def agenerate(self, prompt, **kwargs) -> str:
+        """Async variant of `generate`; the request runs on a worker thread."""
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    def stream(self, prompt, model=None, options=None, system=None, keep_alive=None, timeout=None,
+               priority=INTERACTIVE):
+        """
+        Yields the completion for `prompt` piece by piece as Ollama produces it.
+        Closing the generator early drops the connection, which makes Ollama
+        stop generating. The scheduler slot is held until the stream ends.
+        """
+        payload = self._generate_payload(prompt, model, options, system, keep_alive, stream=True)
+        key = cache_key(prompt, payload["model"], options, system) if self.cache else None
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                LLM_REQUESTS.inc(mode="stream", outcome="cached")
+                yield cached
+                return
+
+        if self.scheduler:
+            self.scheduler.acquire(priority)
+        start = time.perf_counter()
+        try:
+            conn, response = self._open("/api/generate", payload, timeout=timeout)
+        except BaseException as e:
+            if isinstance(e, OllamaError):
+                LLM_REQUESTS.inc(mode="stream", outcome="error")
+            if self.scheduler:
+                self.scheduler.release()
+            raise
+        finished = False
+        pieces = []
+        try:
+            for line in iter(response.readline, b""):
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    raise OllamaError(f"Ollama sent a malformed stream line: {line[:200]!r}") from e
+                if not isinstance(chunk, dict) or not isinstance(chunk.get("response", ""), (str, type(None))):
+                    raise OllamaError(f"Ollama sent a malformed stream line: {line[:200]!r}")
+                if "error" in chunk:
+                    raise OllamaError(chunk["error"])
+                if chunk.get("response"):
+                    if not pieces:
+                        LLM_FIRST_TOKEN.observe(time.perf_counter() - start)
+                    pieces.append(chunk["response"])
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    response.read()
+                    finished = True
+                    _record_completion("stream", start, chunk)
+                    break
+        except TimeoutError as e:
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            raise OllamaError(f"Ollama stalled for more than {conn.timeout}s") from e
+        except (OSError, http.client.HTTPException) as e:
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            raise OllamaError(f"Ollama connection failed mid-stream: {e}") from e
+        except OllamaError:
+            LLM_REQUESTS.inc(mode="stream", outcome="error")
+            raise
+        finally:
+            if finished:
+                self._finish(conn, response)
+            else:
+                conn.close()
+            if self.scheduler:
+                self.scheduler.release()
+
+        # Only completions that ran to the end are cached.
+        completion = "".join(pieces).strip()
+        if key and completion:
+            self.cache.put(key, payload["model"], completion)
+
+    async def astream(self, prompt, **kwargs):
+        """
+        Async variant of `stream`. The blocking read runs on a worker thread;
+        if the consumer stops early (e.g. a client disconnects and the task is
+        cancelled), the worker closes the connection at the next piece.
+        """
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(pieces.put_nowait, item)
+            except RuntimeError:  # Event loop already closed.
+                cancelled.set()
+
+        def pump():
+            gen = self.stream(prompt, **kwargs)
+            try:
+                for piece in gen:
+                    if cancelled.is_set():
+                        break
+                    put(("piece", piece))
+            except Exception as e:
+                put(("error", e))
+            finally:
+                gen.close()
+                put(("done", None))
+
+        loop.run_in_executor(None, pump)
+        try:
+            while True:
+                kind, value = await pieces.get()
+                if kind == "piece":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            cancelled.set()
+
+    def pin_model(self, model=None, keep_alive=None):
+        """Loads `model` into memory and keeps it there for `keep_alive` (-1 = forever)."""
+        payload = {"model": model or MODEL, "keep_alive": self.keep_alive if keep_alive is None else keep_alive}
+        self._post("/api/generate", payload)
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> OllamaClient:
+    """Returns the process-wide shared client."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = OllamaClient(cache=get_cache(), scheduler=get_scheduler())
+    return _default_client
+
+
+def generate(prompt, **kwargs) -> str:
+    return get_client().generate(prompt, **kwargs)
+
+
+async def agenerate(prompt, **kwargs) -> str:
+    return await get_client().agenerate(prompt, **kwargs)
+
+
+def stream(prompt, **kwargs):
+    return get_client().stream(prompt, **kwargs)
+
+
+def astream(prompt, **kwargs):
+    return get_client().astream(prompt, **kwargs)
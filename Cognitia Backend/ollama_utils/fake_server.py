@@ -0,0 +1,167 @@
+# ollama_utils/fake_server.py
+
+import json
+import time
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A stand-in for the Ollama HTTP API, so the client and everything built on it
+# can be exercised offline. Responses are deterministic for a given prompt.
+
+RESPONSE_WORDS = 40
+
+
+def default_response(prompt: str) -> str:
+    """Builds a deterministic reply from the prompt's digest and its last words."""
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    words = prompt.split()[-RESPONSE_WORDS:]
+    return f"Response {digest}: " + " ".join(words)
+
+
+class FakeOllamaServer:
+    """
+    Runs a fake Ollama server on a background thread.
+    `latency` is added before the first token and `tokens_per_second` paces the
+    rest (0 = as fast as possible). Set `failures` to answer that many of the
+    next generations with HTTP 503; `cancelled` counts streams the client
+    hung up on.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, tokens_per_second=0.0, respond=default_response):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.respond = respond
+        self.requests = []
+        self.failures = 0
+        self.cancelled = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _record(self, payload):
+        """Records a generation; returns False if it should fail instead."""
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return False
+            self.requests.append(payload)
+            return True
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json(200, {"version": "0.0.0-fake"})
+                elif self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "mistral:latest"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json(400, {"error": "invalid JSON"})
+                    return
+                if self.path != "/api/generate":
+                    self._send_json(404, {"error": "not found"})
+                    return
+
+                if not fake._record(payload):
+                    self._send_json(503, {"error": "server busy"})
+                    return
+                model = payload.get("model", "")
+                prompt = payload.get("prompt")
+                if not prompt:
+                    # An empty prompt only loads the model, as in Ollama.
+                    self._send_json(200, {"model": model, "response": "", "done": True})
+                    return
+
+                tokens = [word + " " for word in fake.respond(prompt).split(" ")]
+                time.sleep(fake.latency)
+                delay = 1.0 / fake.tokens_per_second if fake.tokens_per_second else 0.0
+                final = {"model": model, "done": True,
+                         "prompt_eval_count": len(prompt.split()), "eval_count": len(tokens)}
+
+                if not payload.get("stream", True):
+                    time.sleep(delay * len(tokens))
+                    self._send_json(200, dict(final, response="".join(tokens).strip()))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for token in tokens:
+                        time.sleep(delay)
+                        self._write_chunk({"model": model, "response": token, "done": False})
+                    self._write_chunk(dict(final, response=""))
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client hung up mid-stream, which is how generation is cancelled.
+                    self.close_connection = True
+                    with fake._lock:
+                        fake.cancelled += 1
+
+            def _write_chunk(self, payload):
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Ollama server for offline runs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(args.host, args.port, args.latency, args.tokens_per_second)
+    print(f"🧪 Fake Ollama listening on {server.url}")
+    server.serve_forever()
@@ -0,0 +1,185 @@
+# ollama_utils/scheduler.py
+
+import os
+import time
+import weakref
+import threading
+from collections import deque
+
+from utils import metrics
+
+# Admission control in front of the Ollama server. Every model call takes a
+# slot first; at most MAX_CONCURRENCY calls run at once and waiting calls are
+# served strictly by priority class, so an interactive answer overtakes a
+# queue of background summaries. Each class has a bounded queue: a call that
+# cannot be queued, or waits too long, fails fast instead of hanging. Calls
+# made with a tag can be moved up a class while they wait, e.g. when the
+# user asks for a speculative debate that is still queued.
+#
+# The scheduler is per process; the API server and the Streamlit app each
+# have their own.
+
+INTERACTIVE = "interactive"  # A user is waiting on an answer.
+DEBATE = "debate"
+BACKGROUND = "background"    # Summaries and other work nobody is watching token by token.
+PRIORITIES = (INTERACTIVE, DEBATE, BACKGROUND)  # Highest first.
+
+# Concurrent calls let through to Ollama; match the server's OLLAMA_NUM_PARALLEL.
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+QUEUE_LIMITS = {INTERACTIVE: 16, DEBATE: 8, BACKGROUND: 64}  # Calls allowed to wait per class.
+QUEUE_TIMEOUTS = {INTERACTIVE: 60.0, DEBATE: 120.0, BACKGROUND: 900.0}  # Seconds a call may wait for a slot.
+
+QUEUE_WAIT = metrics.histogram("cognitia_llm_queue_wait_seconds", "Time model calls waited for a slot.", ("priority",))
+REJECTED = metrics.counter("cognitia_llm_rejected_total", "Model calls refused by admission control.",
+                           ("priority", "reason"))
+QUEUE_DEPTH = metrics.gauge("cognitia_llm_queue_depth", "Model calls waiting for a slot.", ("priority",))
+RUNNING = metrics.gauge("cognitia_llm_running", "Model calls holding a slot.")
+
+
+class _Ticket:
+    __slots__ = ("priority", "tag", "deadline")
+
+    def __init__(self, priority, tag, deadline):
+        self.priority = priority
+        self.tag = tag
+        self.deadline = deadline
+
+
+class SchedulerBusy(Exception):
+    """
+    Raised when a model call is refused. `status_code` is 429 when the class
+    queue is full and 503 when the call timed out waiting.
+    """
+
+    def __init__(self, message, status_code, retry_after):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMScheduler:
+    """Priority-ordered counting semaphore with per-class queue limits and wait timeouts."""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, queue_limits=None, queue_timeouts=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.queue_limits = {**QUEUE_LIMITS, **(queue_limits or {})}
+        self.queue_timeouts = {**QUEUE_TIMEOUTS, **(queue_timeouts or {})}
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = {priority: deque() for priority in PRIORITIES}
+        self._promoted = weakref.WeakKeyDictionary()  # tag -> the class its calls wait in from now on
+
+    def _check(self, priority):
+        if priority not in self._waiting:
+            raise ValueError(f"Unknown priority '{priority}'; expected one of {', '.join(PRIORITIES)}")
+
+    def _next_ticket(self):
+        for priority in PRIORITIES:
+            if self._waiting[priority]:
+                return self._waiting[priority][0]
+        return None
+
+    def _publish(self, priority):
+        QUEUE_DEPTH.set(len(self._waiting[priority]), priority=priority)
+        RUNNING.set(self._running)
+
+    def check_admission(self, priority=INTERACTIVE):
+        """Raises SchedulerBusy if a call of this class would be refused right now; used before a response starts."""
+        self._check(priority)
+        with self._cond:
+            if len(self._waiting[priority]) >= self.queue_limits[priority]:
+                REJECTED.inc(priority=priority, reason="queue_full")
+                raise SchedulerBusy(f"Too many {priority} requests are waiting for the model.", 429, 5)
+
+    def acquire(self, priority=INTERACTIVE, tag=None):
+        """
+        Blocks until a slot is free for `priority`, or raises SchedulerBusy.
+        A call with a `tag` waits in the class the tag was promoted to, if that
+        is higher.
+        """
+        self._check(priority)
+        start = time.perf_counter()
+        with self._cond:
+            promoted = self._promoted.get(tag) if tag is not None else None
+            if promoted is not None and PRIORITIES.index(promoted) < PRIORITIES.index(priority):
+                priority = promoted
+            if self._running < self.max_concurrency and self._next_ticket() is None:
+                self._running += 1
+                self._publish(priority)
+                QUEUE_WAIT.observe(0.0, priority=priority)
+                return
+
+            waiting = self._waiting[priority]
+            if len(waiting) >= self.queue_limits[priority]:
+                REJECTED.inc(priority=priority, reason="queue_full")
+                raise SchedulerBusy(f"Too many {priority} requests are waiting for the model.", 429, 5)
+
+            ticket = _Ticket(priority, tag, start + self.queue_timeouts[priority])
+            waiting.append(ticket)
+            self._publish(priority)
+            try:
+                while not (self._running < self.max_concurrency and self._next_ticket() is ticket):
+                    # The ticket's class and deadline change if its tag is promoted.
+                    remaining = ticket.deadline - time.perf_counter()
+                    if remaining <= 0:
+                        REJECTED.inc(priority=ticket.priority, reason="timeout")
+                        raise SchedulerBusy(f"The model is busy; a {ticket.priority} request waited "
+                                            f"{time.perf_counter() - start:.0f}s.", 503, 30)
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiting[ticket.priority].remove(ticket)
+                self._publish(ticket.priority)
+                self._cond.notify_all()  # The next ticket in line may now be at the front.
+                raise
+            self._waiting[ticket.priority].popleft()
+            self._running += 1
+            self._publish(ticket.priority)
+            self._cond.notify_all()
+        QUEUE_WAIT.observe(time.perf_counter() - start, priority=ticket.priority)
+
+    def promote(self, tag, priority):
+        """
+        Moves the waiting calls made with `tag` up to `priority`, behind the
+        calls already waiting there, with that class's wait timeout from now.
+        Calls made with the tag later start in that class too.
+        """
+        self._check(priority)
+        with self._cond:
+            self._promoted[tag] = priority
+            now = time.perf_counter()
+            for source in PRIORITIES[PRIORITIES.index(priority) + 1:]:
+                moved = [ticket for ticket in self._waiting[source] if ticket.tag is tag]
+                for ticket in moved:
+                    self._waiting[source].remove(ticket)
+                    ticket.priority = priority
+                    ticket.deadline = now + self.queue_timeouts[priority]
+                    self._waiting[priority].append(ticket)
+                if moved:
+                    self._publish(source)
+            self._publish(priority)
+            self._cond.notify_all()
+
+    def release(self):
+        with self._cond:
+            self._running -= 1
+            RUNNING.set(self._running)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"running": self._running, "max_concurrency": self.max_concurrency,
+                    "waiting": {priority: len(waiting) for priority, waiting in self._waiting.items()}}
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Returns the process-wide scheduler shared by every model call."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_scheduler_lock:
+            if _default_scheduler is None:
+                _default_scheduler = LLMScheduler()
+    return _default_scheduler
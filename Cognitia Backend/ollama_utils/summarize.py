@@ -1,52 +1,46 @@
 # ollama_utils/summarize.py
 
-import subprocess
-import re
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-# This file is well-structured for backend use and remains unchanged.
-# Its functions are stateless and focused on a single task.
+from ollama_utils.client import generate, stream, OllamaError, MODEL
+from ollama_utils.scheduler import BACKGROUND
+from utils.tokens import count_tokens
+from semantic_engine.context import drop_duplicates, truncate_to_tokens, SUMMARY_CHUNK_TOKENS
 
-MODEL = "mistral"
+# How many chunk summaries are requested at once. Match this to the Ollama
+# server's OLLAMA_NUM_PARALLEL; more only queues up inside Ollama.
+MAP_CONCURRENCY = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+# Upper bound on the summaries merged by a single reduce prompt.
+REDUCE_GROUP_TOKENS = 3000
 
-def _summarize_chunk(text: str) -> str:
+SEPARATOR = "\n\n---\n\n"
+
+def _summarize_chunk(text: str, priority: str = BACKGROUND) -> str:
     """(Internal Helper) Uses Ollama to summarize a single chunk of text."""
     prompt = f"""
     Concisely summarize the key points from the following academic text excerpt.
     Focus on the main argument, evidence, or finding.
 
     Excerpt:
-    {text.strip()[:4000]}
+    {truncate_to_tokens(text, SUMMARY_CHUNK_TOKENS)}
     """
-    try:
-        result = subprocess.run(
-            ["ollama", "run", MODEL],
-            input=prompt.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
-        )
-        return result.stdout.decode('utf-8').strip()
-    except subprocess.CalledProcessError as e:
-        return f"Error summarizing chunk: {e.stderr.decode('utf-8')}"
-    except Exception as e:
-        return f"Error during chunk summarization: {str(e)}"
+    return generate(prompt, model=MODEL, priority=priority)
 
 
-def summarize_sources(sources: list[str]) -> str:
+def _synthesis_prompt(summaries: list[str], final: bool) -> str:
     """
-    Summarizes a list of source text chunks using a Map-Reduce strategy.
+    (Internal Helper) Builds the prompt that merges a group of summaries into
+    one. Summaries that together exceed REDUCE_GROUP_TOKENS are each cut to an
+    equal share of it, so every one of them still has its say.
     """
-    if not sources:
-        return "No sources found to summarize."
+    if sum(count_tokens(summary) for summary in summaries) > REDUCE_GROUP_TOKENS:
+        share = REDUCE_GROUP_TOKENS // len(summaries)
+        summaries = [truncate_to_tokens(summary, share) for summary in summaries]
+    combined_summaries_text = SEPARATOR.join(summaries)
 
-    individual_summaries = [_summarize_chunk(chunk) for chunk in sources]
-
-    if len(individual_summaries) == 1:
-        return individual_summaries[0]
-
-    combined_summaries_text = "\n\n---\n\n".join(individual_summaries)
-
-    synthesis_prompt = f"""
+    if final:
+        prompt = f"""
     You are a research assistant. You have been provided with several summaries from different academic sources.
     Your task is to synthesize these summaries into a single, cohesive, and well-structured answer.
     Do not just list the summaries. Integrate their points into a comprehensive explanation.
@@ -56,17 +50,124 @@ def summarize_sources(sources: list[str]) -> str:
 
     Synthesized Answer:
     """
+    else:
+        prompt = f"""
+    You are a research assistant. Merge the following summaries of academic sources into one concise summary.
+    Keep every distinct finding, argument and piece of evidence, and drop repetition.
 
+    Here are the summaries:
+    {combined_summaries_text}
+
+    Merged Summary:
+    """
+    return prompt
+
+
+def _synthesize(summaries: list[str], final: bool, priority: str = BACKGROUND) -> str:
+    """(Internal Helper) Merges a group of summaries into one."""
+    return generate(_synthesis_prompt(summaries, final), model=MODEL, priority=priority)
+
+
+def _try(fn, *args):
+    """Runs one model call, turning a failure into None so the rest of the batch survives."""
     try:
-        result = subprocess.run(
-            ["ollama", "run", MODEL],
-            input=synthesis_prompt.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
-        )
-        return result.stdout.decode('utf-8').strip()
-    except subprocess.CalledProcessError as e:
-        return f"❌ Error in final synthesis: {e.stderr.decode('utf-8')}"
+        return fn(*args)
     except Exception as e:
-        return f"❌ Error during synthesis: {str(e)}"
\ No newline at end of file
+        print(f"⚠️ {fn.__name__} failed: {e}")
+        return None
+
+
+def _group_by_budget(summaries: list[str], budget: int) -> list[list[str]]:
+    """Packs consecutive summaries into groups of at most `budget` tokens (a longer summary gets its own group)."""
+    groups, current, used = [], [], 0
+    for summary in summaries:
+        tokens = count_tokens(summary)
+        if current and used + tokens > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(summary)
+        used += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _map_reduce(sources: list[str], concurrency: int, priority: str) -> list[str]:
+    """
+    (Internal Helper) Runs the map phase and every intermediate reduce level.
+    Returns the summaries that go into the final synthesis prompt: at most
+    REDUCE_GROUP_TOKENS worth, or a single summary that needs no synthesis.
+    When reducing stops making progress (merges fail, or the summaries are
+    too long to pair up) every remaining summary is returned, and the final
+    prompt trims them to fit.
+    """
+    # Near-duplicate chunks would only produce near-duplicate summaries.
+    sources = drop_duplicates(sources)
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(sources)))) as pool:
+        # pool.map keeps results in source order.
+        individual_summaries = [s for s in pool.map(lambda chunk: _try(_summarize_chunk, chunk, priority), sources) if s]
+        if len(individual_summaries) <= 1:
+            return individual_summaries
+
+        level = individual_summaries
+        while True:
+            groups = _group_by_budget(level, REDUCE_GROUP_TOKENS)
+            if len(groups) == 1:
+                return groups[0]
+            merged = list(pool.map(
+                lambda group: group[0] if len(group) == 1 else _try(_synthesize, group, False, priority),
+                groups
+            ))
+            # A failed merge keeps its inputs; if nothing merged at all, stop
+            # reducing and synthesize from everything that is left.
+            next_level = []
+            for group, summary in zip(groups, merged):
+                next_level.extend([summary] if summary else group)
+            if len(next_level) == len(level):
+                return next_level
+            level = next_level
+
+
+def summarize_sources(sources: list[str], concurrency: int = MAP_CONCURRENCY, priority: str = BACKGROUND) -> str:
+    """
+    Summarizes a list of source text chunks using a Map-Reduce strategy.
+    The map phase summarizes up to `concurrency` chunks at a time; the reduce
+    phase merges the summaries in token-budgeted groups, level by level, until
+    one answer is left. Chunks that fail to summarize are left out.
+    Model calls wait in the `priority` scheduler class.
+    """
+    if not sources:
+        return "No sources found to summarize."
+
+    final_group = _map_reduce(sources, concurrency, priority)
+    if not final_group:
+        return "❌ Error summarizing sources: every chunk summary failed."
+    if len(final_group) == 1:
+        return final_group[0]
+
+    try:
+        return _synthesize(final_group, final=True, priority=priority)
+    except OllamaError as e:
+        return f"❌ Error in final synthesis: {e}"
+    except Exception as e:
+        return f"❌ Error during synthesis: {str(e)}"
+
+
+def stream_summarize_sources(sources: list[str], concurrency: int = MAP_CONCURRENCY, priority: str = BACKGROUND):
+    """Like `summarize_sources`, but yields the final synthesis as it is generated."""
+    if not sources:
+        yield "No sources found to summarize."
+        return
+
+    final_group = _map_reduce(sources, concurrency, priority)
+    if not final_group:
+        yield "❌ Error summarizing sources: every chunk summary failed."
+        return
+    if len(final_group) == 1:
+        yield final_group[0]
+        return
+
+    try:
+        yield from stream(_synthesis_prompt(final_group, final=True), model=MODEL, priority=priority)
+    except OllamaError as e:
+        yield f"❌ Error in final synthesis: {e}"
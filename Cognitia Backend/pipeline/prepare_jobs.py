@@ -0,0 +1,297 @@
+# pipeline/prepare_jobs.py
+
+import uuid
+import queue
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from fetchers.arxiv_fetcher import fetch_arxiv_papers_by_topic
+from fetchers.youtube_fetcher import download_subtitles_for_topic
+from utils.parser import parse_file, remove_stale_outputs, PARSER_WORKERS
+from semantic_engine.vector_index import index_file, prune_index, topic_offline, near_duplicate_stats
+from semantic_engine.near_duplicates import NEAR_DUPLICATE_ACTION
+from utils import metrics
+from utils.topics import get_registry, topic_paths, topic_slug, remove_topic_files
+
+# Background /prepare jobs. Each job runs fetch -> parse -> index as
+# concurrent stages connected by bounded queues, so the first paper is parsed
+# and embedded while the others are still downloading. Every topic is
+# prepared into its own namespace (see utils/topics.py).
+
+QUEUE_SIZE = 16  # Documents waiting between two stages before the upstream stage blocks.
+MAX_FINISHED_JOBS = 100  # Finished jobs kept around for status requests.
+
+_DONE = object()  # End-of-stream marker passed down the queues.
+
+
+class PrepareJob:
+    """One run of the prepare pipeline for a topic, with per-stage progress."""
+
+    def __init__(self, topic: str, slug: str):
+        self.id = uuid.uuid4().hex
+        self.topic = topic
+        self.slug = slug
+        self.paths = topic_paths(slug)
+        self.status = "queued"
+        self.error = None
+        self.warning = None  # Set when the job succeeded without some of its documents.
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.finished_at = None
+        self.stages = {
+            "fetch": {"status": "pending", "completed": 0, "failed": 0},
+            "parse": {"status": "pending", "completed": 0, "unchanged": 0, "failed": 0},
+            "index": {"status": "pending", "completed": 0, "chunks": 0, "failed": 0},
+        }
+        self._fetch_errors = []  # A failed source is a warning; the other source may still fill the topic.
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "topic": self.topic,
+                "topic_id": self.slug,
+                "status": self.status,
+                "error": self.error,
+                "degraded": self.warning is not None,
+                "warning": self.warning,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            }
+
+    def _count(self, stage, **increments):
+        with self._lock:
+            for key, value in increments.items():
+                self.stages[stage][key] += value
+
+    def _stage_status(self, stage, status):
+        with self._lock:
+            self.stages[stage]["status"] = status
+
+    def _fail(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+
+    def _check_outcome(self):
+        """
+        Fails a job that indexed nothing, so an empty index never becomes the
+        active topic, and marks one that lost a source or documents on the way
+        as degraded.
+        """
+        with self._lock:
+            parse, index = self.stages["parse"], self.stages["index"]
+            if self.error is None and index["completed"] == 0:
+                self.error = "; ".join(self._fetch_errors + [
+                    f"No documents were indexed ({parse['failed']} failed to parse, {index['failed']} failed to index)"])
+            elif self._fetch_errors or parse["failed"] or index["failed"]:
+                problems = list(self._fetch_errors)
+                if parse["failed"] or index["failed"]:
+                    problems.append(f"{parse['failed']} documents failed to parse and {index['failed']} failed to index")
+                self.warning = "; ".join(problems)
+
+    # --- Stages ---
+
+    def _fetch(self, source_type, fetch, parse_queue):
+        """Runs `fetch(on_fetched)`, which reports each downloaded file through the callback."""
+        def on_fetched(path):
+            self._count("fetch", completed=1)
+            parse_queue.put((path, source_type))
+
+        try:
+            with metrics.span(f"fetch_{source_type}"):
+                fetch(on_fetched)
+        except Exception as e:
+            print(f"❌ {source_type} fetch failed for '{self.topic}': {e}")
+            with self._lock:
+                self.stages["fetch"]["failed"] += 1
+                self._fetch_errors.append(f"{source_type} fetch failed: {e}")
+
+    def _parse(self, parse_queue, index_queue, pool, outputs):
+        while True:
+            item = parse_queue.get()
+            if item is _DONE:
+                return
+            path, source_type = item
+            try:
+                if pool is None:
+                    report = parse_file(path, source_type, self.paths["processed"])
+                else:
+                    report = pool.submit(parse_file, path, source_type, self.paths["processed"]).result()
+            except Exception as e:
+                report = {"status": "failed", "output": None, "error": f"{type(e).__name__}: {e}"}
+
+            metrics.record_stage("parse", report.get("seconds", 0.0), items=1)
+            if report["output"]:
+                outputs.add(report["output"])
+            if report["status"] == "failed":
+                print(f"❌ {source_type} parse failed: {path} | Error: {report['error']}")
+                self._count("parse", failed=1)
+            elif report["status"] == "empty":
+                self._count("parse", completed=1)
+            else:
+                self._count("parse", completed=1, unchanged=int(report["status"] == "unchanged"))
+                index_queue.put(report["output"])
+
+    def _index(self, index_queue):
+        while True:
+            out_name = index_queue.get()
+            if out_name is _DONE:
+                return
+            try:
+                chunks = index_file(out_name, topic=self.slug)
+                self._count("index", completed=1, chunks=chunks)
+            except Exception as e:
+                # Keep draining the queue so the parse stage never blocks on a dead indexer.
+                print(f"❌ Indexing failed: {out_name} | Error: {e}")
+                self._count("index", failed=1)
+
+    def skip(self):
+        """Completes the job without running it, for a topic that is already prepared."""
+        with self._lock:
+            self.status = "succeeded"
+            self.finished_at = datetime.now().isoformat(timespec="seconds")
+            for stage in self.stages.values():
+                stage["status"] = "skipped"
+
+    def run(self):
+        with self._lock:
+            self.status = "running"
+        print(f"--- Preparing knowledge base for topic: '{self.topic}' (job {self.id}) ---")
+
+        parse_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        index_queue = queue.Queue(maxsize=QUEUE_SIZE)
+        outputs = set()
+        workers = max(1, PARSER_WORKERS)
+        # Spawned rather than forked: the API process runs threads and holds large models.
+        pool = (ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+                if workers > 1 else None)
+
+        fetchers = [
+            threading.Thread(target=self._fetch, args=(
+                "pdf", lambda on_fetched: fetch_arxiv_papers_by_topic(
+                    self.topic, on_paper=on_fetched, save_dir=self.paths["raw_papers"]), parse_queue)),
+            threading.Thread(target=self._fetch, args=(
+                "youtube", lambda on_fetched: download_subtitles_for_topic(
+                    self.topic, on_transcript=on_fetched, save_dir=self.paths["youtube_transcripts"]), parse_queue)),
+        ]
+        parsers = [threading.Thread(target=self._parse, args=(parse_queue, index_queue, pool, outputs))
+                   for _ in range(workers)]
+        indexer = threading.Thread(target=self._index, args=(index_queue,))
+
+        try:
+            for stage in ("fetch", "parse", "index"):
+                self._stage_status(stage, "running")
+            for thread in fetchers + parsers + [indexer]:
+                thread.start()
+
+            for thread in fetchers:
+                thread.join()
+            self._stage_status("fetch", "done")
+            for _ in parsers:
+                parse_queue.put(_DONE)
+            for thread in parsers:
+                thread.join()
+            self._stage_status("parse", "done")
+            index_queue.put(_DONE)
+            indexer.join()
+            self._check_outcome()
+
+            # Only a complete run may decide what is stale.
+            if self.error is None and self.warning is None:
+                remove_stale_outputs(outputs, self.paths["processed"])
+                prune_index(topic=self.slug)
+            self._stage_status("index", "done")
+        except Exception as e:
+            self._fail(f"{type(e).__name__}: {e}")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        near_duplicates = None
+        if NEAR_DUPLICATE_ACTION != "off":
+            try:
+                near_duplicates = near_duplicate_stats(self.slug)
+            except Exception as e:
+                print(f"⚠️ Could not read near-duplicate counts for '{self.topic}': {e}")
+        get_registry().finish(self.slug, succeeded=self.error is None, near_duplicates=near_duplicates)
+        _evict_topics(keep={self.slug})
+        with self._lock:
+            self.status = "failed" if self.error else "succeeded"
+            self.finished_at = datetime.now().isoformat(timespec="seconds")
+        if self.error:
+            print(f"ERROR: Failed to prepare knowledge base for '{self.topic}'. {self.error}")
+        elif self.warning:
+            print(f"⚠️ Knowledge base for '{self.topic}' is ready without some documents: {self.warning} (job {self.id})")
+        else:
+            print(f"--- Knowledge base for '{self.topic}' is ready (job {self.id}) ---")
+
+
+# All jobs share the raw/processed data directories, so they run one at a time.
+_runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prepare")
+_jobs: "OrderedDict[str, PrepareJob]" = OrderedDict()
+_active_by_topic: dict[str, PrepareJob] = {}
+_registry_lock = threading.Lock()
+
+
+def _evict_topics(keep=()):
+    """Deletes least-recently-used topics while the prepared topics exceed the disk budget."""
+    for slug in get_registry().evict(keep):
+        # Searches that resolved the topic before it was evicted finish first.
+        with topic_offline(slug):
+            remove_topic_files(slug)
+        print(f"🧹 Evicted topic '{slug}' to stay within the disk budget.")
+
+
+def _run_job(job: PrepareJob, key: str):
+    try:
+        job.run()
+    finally:
+        with _registry_lock:
+            if _active_by_topic.get(key) is job:
+                del _active_by_topic[key]
+
+
+def submit_prepare_job(topic: str, refresh: bool = False) -> tuple[PrepareJob, bool]:
+    """
+    Starts a background prepare job for `topic`.
+    A topic that already has a queued or running job reuses it; the second
+    value is False in that case. A topic that is already prepared is made the
+    active topic at once and its job is returned already succeeded, unless
+    `refresh` asks for it to be fetched again.
+    """
+    key = topic_slug(topic)
+    topics = get_registry()
+    with _registry_lock:
+        active = _active_by_topic.get(key)
+        if active is not None:
+            return active, False
+
+        job = PrepareJob(topic.strip(), key)
+        _jobs[job.id] = job
+        finished = [job_id for job_id, other in _jobs.items() if other.status in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[job_id]
+
+        entry = topics.get(key)
+        if entry is not None and entry["status"] == "ready" and not refresh:
+            topics.set_active([key])
+            job.skip()
+            print(f"--- Switched to already prepared topic '{entry['topic']}' ---")
+            return job, True
+
+        topics.begin(topic)
+        _active_by_topic[key] = job
+
+    _runner.submit(_run_job, job, key)
+    return job, True
+
+
+def get_job(job_id: str):
+    """Returns the job with this ID, or None."""
+    with _registry_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,60 @@
+# semantic_engine/chunker.py
+
+from bisect import bisect_right
+
+from utils.tokens import token_spans
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, so windows stay a bit below
+# that to leave room for sub-word splits. The regex tokens of utils.tokens
+# undercount word pieces on rare words, numbers and code, so given the
+# model's tokenizer, chunk_text also shrinks any window the model would cut.
+CHUNK_TOKENS = 200
+CHUNK_OVERLAP = 40
+
+# utils.parser separates PDF pages with a form feed.
+PAGE_BREAK = "\f"
+
+
+def chunk_text(text: str, chunk_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP,
+               count_pieces=None, max_pieces=None) -> list[dict]:
+    """
+    Splits `text` into overlapping token windows.
+    Each chunk is a dict with its text, character offset, token count and
+    1-based page number (always 1 for sources without page breaks).
+    With `count_pieces` (text -> model tokens) and `max_pieces`, windows are
+    shortened until they fit the model.
+    """
+    if overlap >= chunk_tokens:
+        raise ValueError("overlap must be smaller than chunk_tokens")
+
+    spans = token_spans(text)
+    if not spans:
+        return []
+
+    page_breaks = [i for i, ch in enumerate(text) if ch == PAGE_BREAK]
+    chunks = []
+    first = 0
+
+    while True:
+        window = spans[first:first + chunk_tokens]
+        chunk = text[window[0][0]:window[-1][1]].replace(PAGE_BREAK, " ")
+        if count_pieces is not None:
+            pieces = count_pieces(chunk)
+            while pieces > max_pieces and len(window) > 1:
+                # Cut in proportion to the overshoot, then measure again.
+                window = window[:max(1, min(len(window) - 1, len(window) * max_pieces // pieces))]
+                chunk = text[window[0][0]:window[-1][1]].replace(PAGE_BREAK, " ")
+                pieces = count_pieces(chunk)
+        start = window[0][0]
+        chunks.append({
+            "text": chunk,
+            "offset": start,
+            "tokens": len(window),
+            "page": bisect_right(page_breaks, start) + 1,
+        })
+        if first + len(window) >= len(spans):
+            break
+        # A shortened window still moves on by at least half its length.
+        first += max(len(window) - overlap, (len(window) + 1) // 2)
+
+    return chunks
@@ -0,0 +1,121 @@
+# semantic_engine/context.py
+
+import os
+import re
+
+from utils.tokens import count_tokens, prompt_token_spans
+
+# Packs retrieved passages into a prompt-sized context. Passages are chosen by
+# maximal marginal relevance, so each one adds something the others don't,
+# near-duplicates are dropped outright, and the total stays within a token
+# budget instead of being cut at a character count.
+
+ANSWER_CONTEXT_TOKENS = int(os.environ.get("ANSWER_CONTEXT_TOKENS", "1500"))
+SUMMARY_CHUNK_TOKENS = 800   # Largest excerpt sent to a single summary call.
+DEBATE_CONTEXT_TOKENS = 700  # Largest claim sent to a debate call.
+
+# 1 ranks purely by relevance, 0 purely by novelty.
+MMR_LAMBDA = 0.7
+# Passages at least this similar to one already chosen are dropped.
+DUPLICATE_THRESHOLD = 0.92
+
+SEPARATOR = "\n\n---\n\n"
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s")
+SHINGLE_SIZE = 3
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts `text` to at most `max_tokens` tokens, at the last sentence end if one is reasonably close."""
+    text = text.strip()
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    spans = prompt_token_spans(text)
+    # Fewer spans than tokens when count_tokens is an estimate with a margin.
+    max_tokens = max_tokens * len(spans) // tokens
+    cut = spans[max_tokens - 1][1] if max_tokens > 0 else 0
+    ends = [match.end() for match in SENTENCE_END.finditer(text, 0, cut + 1)]
+    if ends and ends[-1] >= cut // 2:
+        return text[:ends[-1]].rstrip()
+    # The ellipsis takes the last token of the budget.
+    cut = spans[max_tokens - 2][1] if max_tokens > 1 else 0
+    return (text[:cut].rstrip() + " …").strip()
+
+
+def _dot(a, b) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def select_passages(passages: list[str], token_budget=None, query_embedding=None, embeddings=None,
+                    mmr_lambda=MMR_LAMBDA, duplicate_threshold=DUPLICATE_THRESHOLD) -> list[str]:
+    """
+    Chooses passages, most useful first, that together fit in `token_budget`
+    tokens (None = no budget, only duplicates are dropped).
+    `passages` are ranked best first. With normalized `embeddings` (one per
+    passage) and the `query_embedding`, relevance and similarity are cosine
+    similarities; without them, relevance follows the ranking and similarity
+    is word-shingle overlap. If even the best passage does not fit, it is
+    truncated to the budget.
+    """
+    if not passages:
+        return []
+    n = len(passages)
+    if embeddings is not None and len(embeddings) == n:
+        relevance = ([_dot(query_embedding, e) for e in embeddings] if query_embedding is not None
+                     else [1.0 - i / n for i in range(n)])
+        similarity = lambda i, j: _dot(embeddings[i], embeddings[j])
+    else:
+        relevance = [1.0 - i / n for i in range(n)]
+        shingles = [_shingles(passage) for passage in passages]
+        similarity = lambda i, j: _jaccard(shingles[i], shingles[j])
+
+    tokens = [count_tokens(passage) for passage in passages]
+    separator_tokens = count_tokens(SEPARATOR)
+    remaining = token_budget
+    chosen, chosen_texts = [], []
+    max_similarity = [0.0] * n
+    candidates = set(range(n))
+
+    while candidates:
+        best = max(candidates, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * max_similarity[i])
+        candidates.discard(best)
+        if max_similarity[best] >= duplicate_threshold:
+            continue
+
+        text = passages[best]
+        cost = tokens[best] + (separator_tokens if chosen else 0)
+        if remaining is not None and cost > remaining:
+            if chosen:
+                continue  # A shorter passage further down may still fit.
+            text = truncate_to_tokens(text, remaining)
+            cost = remaining
+        chosen.append(best)
+        chosen_texts.append(text)
+        if remaining is not None:
+            remaining -= cost
+            if remaining <= separator_tokens:
+                break
+        for i in candidates:
+            max_similarity[i] = max(max_similarity[i], similarity(i, best))
+    return chosen_texts
+
+
+def drop_duplicates(passages: list[str], threshold=DUPLICATE_THRESHOLD) -> list[str]:
+    """Keeps passages in order, skipping any whose word shingles mostly repeat an earlier one."""
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage)
+        if all(_jaccard(shingles, other) < threshold for other in kept_shingles):
+            kept.append(passage)
+            kept_shingles.append(shingles)
+    return kept
+
@@ -0,0 +1,216 @@
+# semantic_engine/embedder.py
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+from utils import metrics
+
+# One embedding model, shared by queries and indexing, behind a small worker
+# pool. Query encodes that arrive while the model is busy queue up and run as
+# a single forward pass, so load turns into bigger batches instead of many
+# one-sentence passes fighting over the CPU. BATCH_WINDOW additionally holds a
+# lone query back in case others follow; on a busy server the queue fills by
+# itself, so it defaults to no wait (benchmarks/bench_embedding.py measures
+# both). Queries and bulk indexing have separate lanes: queries always go
+# first, and bulk work is cut into BULK_BATCH_SIZE slices so a query waits for
+# one slice at most, never for a whole document.
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Lightweight CPU model
+
+BATCH_WINDOW = float(os.environ.get("EMBED_BATCH_WINDOW_MS", "0")) / 1000  # Seconds a query waits for company.
+MAX_QUERY_BATCH = 32
+BULK_BATCH_SIZE = 64
+# Forward passes run at once. The model already spreads one pass over the
+# cores, so more workers mostly add contention.
+EMBED_WORKERS = int(os.environ.get("EMBED_WORKERS", "1"))
+QUERY_CACHE_SIZE = 1024  # Recent query embeddings kept in memory.
+
+QUERY = "query"
+BULK = "bulk"
+
+BATCH_SIZES = metrics.histogram("cognitia_embed_batch_size", "Texts per embedding forward pass.", ("lane",),
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+QUERY_CACHE = metrics.counter("cognitia_embed_query_cache_total", "Query embedding cache lookups.", ("outcome",))
+
+
+class _BulkJob:
+    __slots__ = ("texts", "future", "vectors", "next", "remaining")
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.future = Future()
+        self.vectors = [None] * len(texts)
+        self.next = 0          # First text not yet handed to a worker.
+        self.remaining = len(texts)
+
+
+class EmbeddingService:
+    """Micro-batching front end to a SentenceTransformer, with a query embedding cache."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, workers=EMBED_WORKERS, batch_window=BATCH_WINDOW,
+                 max_query_batch=MAX_QUERY_BATCH, bulk_batch_size=BULK_BATCH_SIZE, cache_size=QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.workers = max(1, workers)
+        self.batch_window = batch_window
+        self.max_query_batch = max_query_batch
+        self.bulk_batch_size = bulk_batch_size
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._queries = deque()  # (text, arrival time)
+        self._pending = {}       # text -> Future, so identical concurrent queries share one encode.
+        self._bulk = deque()
+        self._cache = OrderedDict()
+        self._threads = []
+
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def count_pieces(self, text: str) -> int:
+        """Number of model tokens in `text`, special tokens included."""
+        tokenizer = self.model().tokenizer
+        return len(tokenizer.tokenize(text)) + tokenizer.num_special_tokens_to_add()
+
+    def max_pieces(self) -> int:
+        """Model tokens the model reads before truncating its input."""
+        return self.model().max_seq_length
+
+    def _start(self):
+        # Called with the condition held.
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"embedder-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def encode_query(self, text: str) -> list[float]:
+        """The normalized embedding of one query, from the cache or the next query batch."""
+        key = " ".join(text.split())
+        with self._cond:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                QUERY_CACHE.inc(outcome="hit")
+                return vector
+            QUERY_CACHE.inc(outcome="miss")
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queries.append((key, time.perf_counter()))
+                self._start()
+                self._cond.notify_all()
+        return future.result()
+
+    def encode_documents(self, texts: list[str]) -> list[list[float]]:
+        """Normalized embeddings of `texts`, computed in the bulk lane."""
+        if not texts:
+            return []
+        job = _BulkJob(list(texts))
+        with self._cond:
+            self._bulk.append(job)
+            self._start()
+            self._cond.notify_all()
+        return job.future.result()
+
+    def _take_queries(self):
+        """Waits out the batch window for the oldest query, then takes up to a batch of queries."""
+        deadline = self._queries[0][1] + self.batch_window
+        while len(self._queries) < self.max_query_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+            if not self._queries:
+                return []  # Another worker took them.
+        batch = []
+        while self._queries and len(batch) < self.max_query_batch:
+            batch.append(self._queries.popleft()[0])
+        return batch
+
+    def _encode(self, texts, lane):
+        start = time.perf_counter()
+        vectors = self.model().encode(texts, batch_size=len(texts), normalize_embeddings=True).tolist()
+        metrics.record_stage(f"embed_{lane}_batch", time.perf_counter() - start, items=len(texts))
+        BATCH_SIZES.observe(len(texts), lane=lane)
+        return vectors
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queries and not self._bulk:
+                    self._cond.wait()
+                if self._queries:
+                    batch = self._take_queries()
+                    futures = [self._pending[text] for text in batch]
+                    job = None
+                else:
+                    job = self._bulk[0]
+                    start, end = job.next, min(job.next + self.bulk_batch_size, len(job.texts))
+                    job.next = end
+                    if end == len(job.texts):
+                        self._bulk.popleft()
+            if job is None:
+                if batch:
+                    self._run_queries(batch, futures)
+            else:
+                self._run_bulk_slice(job, start, end)
+
+    def _run_queries(self, batch, futures):
+        try:
+            vectors = self._encode(batch, QUERY)
+        except Exception as e:
+            with self._cond:
+                for text in batch:
+                    del self._pending[text]
+            for future in futures:
+                future.set_exception(e)
+            return
+        with self._cond:
+            for text, vector in zip(batch, vectors):
+                del self._pending[text]
+                self._cache[text] = vector
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        for future, vector in zip(futures, vectors):
+            future.set_result(vector)
+
+    def _run_bulk_slice(self, job, start, end):
+        try:
+            job.vectors[start:end] = self._encode(job.texts[start:end], BULK)
+        except Exception as e:
+            with self._cond:
+                if job in self._bulk:
+                    self._bulk.remove(job)  # Its other slices are not worth computing.
+                first_failure = job.remaining > 0
+                job.remaining = 0  # Slices still running elsewhere now end below zero and report nothing.
+            if first_failure:
+                job.future.set_exception(e)
+            return
+        with self._cond:
+            job.remaining -= end - start
+            finished = job.remaining == 0
+        if finished:
+            job.future.set_result(job.vectors)
+
+
+_default_service = None
+_default_service_lock = threading.Lock()
+
+
+def get_embedding_service() -> EmbeddingService:
+    global _default_service
+    if _default_service is None:
+        with _default_service_lock:
+            if _default_service is None:
+                _default_service = EmbeddingService()
+    return _default_service
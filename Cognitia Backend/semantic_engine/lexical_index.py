@@ -0,0 +1,124 @@
+# semantic_engine/lexical_index.py
+
+import os
+import re
+import math
+import sqlite3
+import threading
+from collections import Counter
+
+# On-disk BM25 inverted index over the same chunks as the vector collection.
+# Dense retrieval misses exact matches on equation names, acronyms and model
+# identifiers; this index catches them.
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Identifiers such as "GPT-4", "BERT-base" or "ResNet-50" are indexed whole and
+# by their parts, so both "gpt-4" and "gpt" find them.
+TERM_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for match in TERM_PATTERN.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(part for part in re.split(r"[-_.]", term) if part)
+    return terms
+
+
+class LexicalIndex:
+    """BM25 index stored in SQLite. Postings are clustered by term, so a lookup reads only the query's terms."""
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (chunk_id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                chunk_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, chunk_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+        """)
+        self._db.commit()
+        self._doc_count, self._total_length = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs").fetchone()
+
+    def count(self) -> int:
+        return self._doc_count
+
+    def _delete(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            row = self._db.execute("SELECT length FROM docs WHERE chunk_id = ?", (chunk_id,)).fetchone()
+            if row is None:
+                continue
+            terms = [t for (t,) in self._db.execute("SELECT term FROM postings WHERE chunk_id = ?", (chunk_id,))]
+            self._db.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", [(t,) for t in terms])
+            self._db.execute("DELETE FROM postings WHERE chunk_id = ?", (chunk_id,))
+            self._db.execute("DELETE FROM docs WHERE chunk_id = ?", (chunk_id,))
+            self._doc_count -= 1
+            self._total_length -= row[0]
+        self._db.execute("DELETE FROM terms WHERE df <= 0")
+
+    def add(self, chunk_ids, texts):
+        """Indexes the chunks, replacing any existing entries with the same IDs."""
+        with self._lock:
+            self._delete(chunk_ids)
+            for chunk_id, text in zip(chunk_ids, texts):
+                tfs = Counter(tokenize(text))
+                length = sum(tfs.values())
+                self._db.execute("INSERT INTO docs (chunk_id, length) VALUES (?, ?)", (chunk_id, length))
+                self._db.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)",
+                                     [(term, chunk_id, tf) for term, tf in tfs.items()])
+                self._db.executemany(
+                    "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                    [(term,) for term in tfs])
+                self._doc_count += 1
+                self._total_length += length
+            self._db.commit()
+
+    def delete(self, chunk_ids):
+        with self._lock:
+            self._delete(chunk_ids)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.executescript("DELETE FROM postings; DELETE FROM terms; DELETE FROM docs;")
+            self._doc_count = self._total_length = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple[str, float]]:
+        """Returns up to `top_k` (chunk_id, BM25 score) pairs, best first."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self._doc_count:
+            return []
+
+        with self._lock:
+            placeholders = ",".join("?" * len(terms))
+            dfs = dict(self._db.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", terms))
+            if not dfs:
+                return []
+            rows = self._db.execute(
+                f"SELECT p.term, p.chunk_id, p.tf, d.length FROM postings p JOIN docs d ON d.chunk_id = p.chunk_id "
+                f"WHERE p.term IN ({placeholders})", terms).fetchall()
+            n, avg_length = self._doc_count, self._total_length / self._doc_count
+
+        scores = Counter()
+        for term, chunk_id, tf, length in rows:
+            idf = math.log(1 + (n - dfs[term] + 0.5) / (dfs[term] + 0.5))
+            scores[chunk_id] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        return scores.most_common(top_k)
@@ -0,0 +1,212 @@
+# semantic_engine/near_duplicates.py
+
+import os
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+
+from utils import metrics
+
+# MinHash signatures of every indexed document and chunk, with an LSH table to
+# find near-identical ones at ingestion time: arXiv versions of one paper, a
+# talk posted twice, a passage two topics share. A new item whose estimated
+# Jaccard similarity (over word shingles) to an indexed one reaches
+# NEAR_DUPLICATE_THRESHOLD is a near-duplicate:
+#
+#   "link"  a duplicate chunk is stored with its canonical chunk's embedding
+#           (no forward pass) and a "duplicate_of" field; search returns one
+#           chunk per group.
+#   "drop"  duplicates are not stored at all.
+#   "off"   no detection.
+#
+# Should a canonical copy go away, the documents that linked or dropped
+# duplicates of it are indexed again, so nothing points at a deleted chunk.
+
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+NEAR_DUPLICATE_ACTION = os.environ.get("NEAR_DUPLICATE_ACTION", "link")
+
+SHINGLE_SIZE = 5  # Words per shingle; shorter shingles make unrelated prose look alike.
+NUM_PERMUTATIONS = 128
+# 32 bands of 4 rows: pairs at 0.5 similarity become candidates 87% of the
+# time and pairs at 0.8 practically always; candidates are then checked
+# against the threshold on the full signature.
+LSH_BANDS = 32
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+DOCUMENT = "document"
+CHUNK = "chunk"
+
+DUPLICATES = metrics.counter("cognitia_near_duplicates_total", "Near-duplicates found at ingestion.", ("kind", "action"))
+
+
+def _permutations():
+    # Derived from fixed strings, so every process and numpy version computes the same signatures.
+    def draw(label):
+        return int.from_bytes(hashlib.blake2b(label.encode("utf-8"), digest_size=8).digest(), "little")
+    a = np.array([draw(f"a{i}") | 1 for i in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+    b = np.array([draw(f"b{i}") for i in range(NUM_PERMUTATIONS)], dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+_A, _B = _permutations()
+
+
+def shingle_hashes(text: str) -> np.ndarray:
+    words = text.lower().split()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    return np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                     for s in shingles], dtype=np.uint64)
+
+
+def minhash(text: str) -> np.ndarray:
+    """The MinHash signature of `text`: NUM_PERMUTATIONS uint32 minima of (a*h + b) mod 2^64 >> 32."""
+    hashes = shingle_hashes(text)
+    with np.errstate(over="ignore"):
+        return ((_A * hashes[None, :] + _B) >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    Signatures of the canonical (first seen) documents and chunks, stored in
+    SQLite and bucketed in memory by LSH band, plus a record of every
+    duplicate found and what it duplicates.
+    """
+
+    def __init__(self, path: str, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS signatures (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                doc_hash TEXT NOT NULL,
+                signature BLOB NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS signatures_doc ON signatures (doc_hash);
+            CREATE TABLE IF NOT EXISTS duplicates (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                doc_hash TEXT NOT NULL,
+                canonical TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                action TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS duplicates_doc ON duplicates (doc_hash);
+            CREATE INDEX IF NOT EXISTS duplicates_canonical ON duplicates (canonical);
+        """)
+        self._db.commit()
+        self._signatures = {}  # id -> (kind, doc_hash, signature)
+        self._buckets = {}     # (kind, band, band bytes) -> ids
+        for item_id, kind, doc_hash, blob in self._db.execute("SELECT id, kind, doc_hash, signature FROM signatures"):
+            self._remember(item_id, kind, doc_hash, np.frombuffer(blob, dtype=np.uint32))
+
+    def _bands(self, kind, signature):
+        for band in range(LSH_BANDS):
+            yield kind, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes()
+
+    def _remember(self, item_id, kind, doc_hash, signature):
+        self._signatures[item_id] = (kind, doc_hash, signature)
+        for key in self._bands(kind, signature):
+            self._buckets.setdefault(key, []).append(item_id)
+
+    def _forget(self, item_id):
+        kind, _, signature = self._signatures.pop(item_id)
+        for key in self._bands(kind, signature):
+            bucket = self._buckets[key]
+            bucket.remove(item_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def find(self, kind: str, signature: np.ndarray, doc_hash: str):
+        """
+        The most similar indexed item of `kind` at or above the threshold, as
+        (id, similarity), or None. Items of document `doc_hash` itself never
+        match, so leftovers of an earlier attempt at it are not its duplicates.
+        """
+        with self._lock:
+            candidates = {item_id for key in self._bands(kind, signature) for item_id in self._buckets.get(key, ())
+                          if self._signatures[item_id][1] != doc_hash}
+            best = None
+            for item_id in candidates:
+                score = similarity(signature, self._signatures[item_id][2])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (item_id, score)
+        return best
+
+    def add(self, kind: str, item_id: str, doc_hash: str, signature: np.ndarray):
+        """Records a canonical item, so later copies of it are found."""
+        with self._lock:
+            if item_id in self._signatures:
+                self._forget(item_id)
+            self._remember(item_id, kind, doc_hash, signature)
+            self._db.execute("INSERT OR REPLACE INTO signatures (id, kind, doc_hash, signature) VALUES (?, ?, ?, ?)",
+                             (item_id, kind, doc_hash, signature.tobytes()))
+
+    def add_duplicate(self, kind: str, item_id: str, doc_hash: str, canonical: str, score: float, action: str):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO duplicates (id, kind, doc_hash, canonical, similarity, action) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (item_id, kind, doc_hash, canonical, score, action))
+        DUPLICATES.inc(kind=kind, action=action)
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def dependents(self, doc_hashes) -> set:
+        """Other documents that linked or dropped a duplicate of an item of `doc_hashes`."""
+        doc_hashes = set(doc_hashes)
+        with self._lock:
+            canonical = {item_id for item_id, (_, doc_hash, _) in self._signatures.items() if doc_hash in doc_hashes}
+            dependents = set()
+            ids = list(canonical)
+            for i in range(0, len(ids), 500):  # Below SQLite's limit on query parameters.
+                chunk = ids[i:i + 500]
+                dependents.update(doc_hash for (doc_hash,) in self._db.execute(
+                    f"SELECT DISTINCT doc_hash FROM duplicates WHERE canonical IN ({','.join('?' * len(chunk))})",
+                    chunk))
+        return dependents - doc_hashes
+
+    def delete_documents(self, doc_hashes):
+        """Forgets the signatures and duplicates recorded for the given documents."""
+        doc_hashes = set(doc_hashes)
+        with self._lock:
+            for item_id in [item_id for item_id, (_, doc_hash, _) in self._signatures.items() if doc_hash in doc_hashes]:
+                self._forget(item_id)
+            self._db.executemany("DELETE FROM signatures WHERE doc_hash = ?", [(h,) for h in doc_hashes])
+            self._db.executemany("DELETE FROM duplicates WHERE doc_hash = ?", [(h,) for h in doc_hashes])
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._db.executescript("DELETE FROM signatures; DELETE FROM duplicates;")
+            self._signatures.clear()
+            self._buckets.clear()
+
+    def stats(self) -> dict:
+        """Canonical and duplicate counts per kind, and the share of chunks that were duplicates."""
+        with self._lock:
+            counts = {f"{kind}s": n for kind, n in
+                      self._db.execute("SELECT kind, COUNT(*) FROM signatures GROUP BY kind")}
+            counts.update({f"duplicate_{kind}s": n for kind, n in
+                           self._db.execute("SELECT kind, COUNT(*) FROM duplicates GROUP BY kind")})
+        stats = {key: counts.get(key, 0) for key in ("documents", "duplicate_documents", "chunks", "duplicate_chunks")}
+        seen = stats["chunks"] + stats["duplicate_chunks"]
+        stats["dedup_ratio"] = round(stats["duplicate_chunks"] / seen, 4) if seen else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,113 @@
+# semantic_engine/reranker.py
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils import metrics
+
+# Optional second-stage ranking. The bi-encoder compares a query and a chunk
+# through two separate embeddings; a cross-encoder reads them together and
+# judges relevance much better, at the cost of one forward pass per pair. So
+# search over-fetches RERANK_CANDIDATES chunks, the cross-encoder scores them
+# all in one batch on the CPU, and only the best few reach the prompt.
+#
+# Chunk IDs are derived from the chunk's content, so a cached score stays
+# valid for as long as the chunk exists.
+
+RERANK_ENABLED = os.environ.get("RERANK_ENABLED", "0") == "1"  # Default for requests that don't say.
+RERANK_MODEL = os.environ.get("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", "20"))  # Chunks retrieved for scoring.
+SCORE_CACHE_SIZE = 4096  # (query, chunk) scores kept in memory.
+
+CACHE_LOOKUPS = metrics.counter("cognitia_rerank_cache_total", "Rerank score cache lookups.", ("outcome",))
+
+
+def query_hash(query: str) -> str:
+    return hashlib.sha1(" ".join(query.lower().split()).encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """Cross-encoder scoring with an LRU cache of scores keyed by (query hash, chunk ID)."""
+
+    def __init__(self, model_name=RERANK_MODEL, cache_size=SCORE_CACHE_SIZE):
+        self.model_name = model_name
+        self.cache_size = cache_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._scores = OrderedDict()
+        self._scores_lock = threading.Lock()
+
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def score(self, query: str, ids: list[str], documents: list[str]) -> list[float]:
+        """Relevance of each document to `query`; uncached pairs are scored in a single batch."""
+        qhash = query_hash(query)
+        scores = [None] * len(ids)
+        with self._scores_lock:
+            for i, chunk_id in enumerate(ids):
+                cached = self._scores.get((qhash, chunk_id))
+                if cached is not None:
+                    self._scores.move_to_end((qhash, chunk_id))
+                    scores[i] = cached
+        missing = [i for i, score in enumerate(scores) if score is None]
+        CACHE_LOOKUPS.inc(len(ids) - len(missing), outcome="hit")
+        CACHE_LOOKUPS.inc(len(missing), outcome="miss")
+        if not missing:
+            return scores
+
+        model = self.model()
+        start = time.perf_counter()
+        predicted = model.predict([(query, documents[i]) for i in missing], batch_size=len(missing),
+                                  show_progress_bar=False)
+        metrics.record_stage("rerank_predict", time.perf_counter() - start, items=len(missing))
+        with self._scores_lock:
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+                self._scores[(qhash, ids[i])] = scores[i]
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, result: dict, top_k: int) -> dict:
+        """
+        Reorders a search result (shaped like a Chroma query result) by
+        cross-encoder score and keeps the best `top_k`. Every per-chunk list in
+        the result is reordered alike; the scores are added as "rerank_scores".
+        """
+        ids = result["ids"][0]
+        if not ids:
+            return result
+        with metrics.span("rerank"):
+            scores = self.score(query, ids, result["documents"][0])
+            order = sorted(range(len(ids)), key=lambda i: scores[i], reverse=True)[:top_k]
+        reranked = dict(result)
+        for key, value in result.items():
+            # Per-chunk fields are lists or, for Chroma's embeddings, arrays; "included" is a list of names.
+            if (isinstance(value, list) and value and value[0] is not None and not isinstance(value[0], str)
+                    and len(value[0]) == len(ids)):
+                reranked[key] = [[value[0][i] for i in order]]
+        reranked["rerank_scores"] = [[scores[i] for i in order]]
+        return reranked
+
+
+_default_reranker = None
+_default_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    global _default_reranker
+    if _default_reranker is None:
+        with _default_reranker_lock:
+            if _default_reranker is None:
+                _default_reranker = Reranker()
+    return _default_reranker
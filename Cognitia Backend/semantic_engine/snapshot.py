@@ -0,0 +1,310 @@
+# semantic_engine/snapshot.py
+
+import os
+import json
+import time
+import uuid
+import shutil
+import struct
+import sqlite3
+import zipfile
+import argparse
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from semantic_engine.vector_index import (_Namespace, _using, _load_manifest, _save_manifest, _chunker_config,
+                                          _near_duplicate_config, topic_offline, near_duplicate_stats,
+                                          LEXICAL_NAME, NEAR_DUPLICATES_NAME)
+from semantic_engine.vector_store import VECTOR_STORE
+from semantic_engine.embedder import get_embedding_service
+from utils import metrics
+from utils.topics import get_registry, topic_paths, topic_slug, TOPICS_DIR
+
+# A prepared topic packed into one file, so a node can serve it without
+# running fetch -> parse -> index itself. A snapshot is a zip archive:
+#
+#   snapshot.json            format, version, topic, embedding model, dimension, chunk count, index settings
+#   manifest.json            the index manifest
+#   chunks.jsonl             id, document and metadata of every chunk, in row order
+#   embeddings.f16           the embeddings as a raw float16 matrix, stored uncompressed
+#   lexical.sqlite3          the BM25 index
+#   near_duplicates.sqlite3  MinHash signatures, so later additions are still deduplicated
+#   processed/               the processed texts and cue timestamps, so a later refresh keeps them
+#
+# Everything but the embeddings is deflated; float16 vectors barely compress,
+# and stored uncompressed they are memory-mapped straight out of the archive
+# on import. Nothing is embedded again, so a snapshot only imports into a
+# node running the same embedding model and index settings.
+
+SNAPSHOT_FORMAT = "cognitia-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".snapshot.zip"
+SNAPSHOT_ID_NAME = "snapshot.json"  # Kept in the topic's vector_db after an import.
+
+EXPORT_BATCH = 1000  # Chunks read from the store at a time.
+IMPORT_BATCH = 4096  # Chunks written to the store at a time; below Chroma's maximum batch size.
+
+SNAPSHOT_SECONDS = metrics.histogram("cognitia_snapshot_seconds", "Time to export or import a topic snapshot.",
+                                     ("operation",))
+
+
+def _index_config():
+    return {"chunker": _chunker_config(), "near_duplicates": _near_duplicate_config()}
+
+
+def _sqlite_copy(source, target):
+    """A consistent copy of a SQLite database that may be open, and written to, elsewhere."""
+    src, dst = sqlite3.connect(source), sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+
+def export_snapshot(topic: str, path=None) -> str:
+    """Packs the prepared topic `topic` (name or slug) into a snapshot at `path` and returns the path."""
+    registry = get_registry()
+    slug = registry.resolve(topic)
+    entry = registry.get(slug) if slug else None
+    if entry is None or entry["status"] != "ready":
+        raise KeyError(f"Not a prepared topic: {topic}")
+    path = path or f"{slug}{SNAPSHOT_SUFFIX}"
+    start = time.perf_counter()
+
+    tmp_path = path + ".tmp"
+    try:
+        row = _write_snapshot(slug, entry, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    seconds = time.perf_counter() - start
+    SNAPSHOT_SECONDS.observe(seconds, operation="export")
+    print(f"📦 Exported '{entry['topic']}' ({row} chunks) → {path} in {seconds:.1f}s")
+    return path
+
+
+def _write_snapshot(slug, entry, tmp_path):
+    """Writes the snapshot of topic `slug` to `tmp_path` and returns its chunk count."""
+    with _using(slug) as ns, ns.index_lock, tempfile.TemporaryDirectory(prefix="cognitia-snapshot-") as work_dir, \
+            zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        manifest = _load_manifest(ns)
+        ids = [chunk_id for doc in manifest["documents"].values() for chunk_id in doc["chunk_ids"]]
+        if not ids:
+            raise ValueError(f"Topic '{entry['topic']}' has no indexed chunks")
+        store = ns.store()
+
+        embeddings, row = None, 0
+        with archive.open("chunks.jsonl", "w") as chunks:
+            for i in range(0, len(ids), EXPORT_BATCH):
+                found = store.get(ids=ids[i:i + EXPORT_BATCH], include=["documents", "metadatas", "embeddings"])
+                vectors = np.asarray(found["embeddings"], dtype=np.float16)
+                if embeddings is None:
+                    embeddings = np.empty((len(ids), vectors.shape[1]), dtype=np.float16)
+                # Rows are written in the order the store returns them, so chunks and embeddings stay aligned.
+                embeddings[row:row + len(vectors)] = vectors
+                row += len(vectors)
+                for chunk_id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+                    line = json.dumps({"id": chunk_id, "document": document, "metadata": metadata})
+                    chunks.write((line + "\n").encode("utf-8"))
+        archive.writestr("embeddings.f16", embeddings[:row].tobytes(), compress_type=zipfile.ZIP_STORED)
+
+        for name in (LEXICAL_NAME, NEAR_DUPLICATES_NAME):
+            if os.path.exists(os.path.join(ns.db_dir, name)):  # No near-duplicate index with the action "off".
+                copy = os.path.join(work_dir, name)
+                _sqlite_copy(os.path.join(ns.db_dir, name), copy)
+                archive.write(copy, name)
+        for name in sorted(os.listdir(ns.data_dir)):
+            archive.write(os.path.join(ns.data_dir, name), f"processed/{name}")
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+        archive.writestr("snapshot.json", json.dumps({
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "id": uuid.uuid4().hex,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "topic": entry["topic"],
+            "slug": slug,
+            "embedding_model": get_embedding_service().model_name,
+            "dim": int(embeddings.shape[1]),
+            "dtype": "float16",
+            "count": row,
+            "index": _index_config(),
+            "near_duplicates": near_duplicate_stats(slug),
+        }, indent=2))
+    return row
+
+
+def read_header(path: str) -> dict:
+    """The snapshot.json of the snapshot at `path`, after checking this node can import it."""
+    with zipfile.ZipFile(path) as archive:
+        header = json.loads(archive.read("snapshot.json"))
+    if header.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"{path} is not a Cognitia snapshot")
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {header.get('version')} is not supported (expected {SNAPSHOT_VERSION})")
+    model = get_embedding_service().model_name
+    if header["embedding_model"] != model:
+        raise ValueError(f"Snapshot was embedded with '{header['embedding_model']}', this node uses '{model}'")
+    if header["index"] != _index_config():
+        raise ValueError(f"Snapshot index settings {header['index']} differ from this node's {_index_config()}")
+    return header
+
+
+def _map_embeddings(path, archive, header):
+    """The embedding matrix, memory-mapped from the archive when it is stored uncompressed."""
+    info = archive.getinfo("embeddings.f16")
+    shape = (header["count"], header["dim"])
+    if info.compress_type != zipfile.ZIP_STORED:
+        return np.frombuffer(archive.read(info), dtype=np.float16).reshape(shape)
+    # The data follows the member's local header, whose name and extra field lengths are at bytes 26-29.
+    with open(path, "rb") as f:
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+    name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+    offset = info.header_offset + len(local_header) + name_length + extra_length
+    return np.memmap(path, dtype=np.float16, mode="r", offset=offset, shape=shape)
+
+
+def _chunk_batches(archive):
+    """The rows of chunks.jsonl, IMPORT_BATCH at a time."""
+    batch = []
+    with archive.open("chunks.jsonl") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == IMPORT_BATCH:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def imported_snapshot(slug: str):
+    """The id of the snapshot the topic was last imported from, or None."""
+    try:
+        with open(os.path.join(topic_paths(slug)["vector_db"], SNAPSHOT_ID_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)["id"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def import_snapshot(path: str, force: bool = False) -> str:
+    """
+    Loads the snapshot at `path` as a prepared topic, replacing any local copy,
+    and makes it the active topic. Returns the topic's slug. A snapshot that
+    was already imported is skipped unless `force` is set.
+
+    The snapshot is loaded into a staging directory next to the topics and
+    swapped in only once it is complete, so a failed import leaves any
+    earlier copy of the topic as it was.
+    """
+    header = read_header(path)
+    slug = topic_slug(header["topic"])
+    registry = get_registry()
+    entry = registry.get(slug)
+    if entry is not None and entry["status"] == "preparing":
+        raise RuntimeError(f"Topic '{header['topic']}' is being prepared; import it afterwards")
+    if not force and entry is not None and entry["status"] == "ready" and imported_snapshot(slug) == header["id"]:
+        print(f"📦 Snapshot {path} is already imported.")
+        registry.set_active([slug])
+        return slug
+
+    start = time.perf_counter()
+    registry.begin(header["topic"])
+    os.makedirs(TOPICS_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".import-{slug}-", dir=TOPICS_DIR)  # Same file system, so it can be renamed.
+    try:
+        _load_snapshot(path, header, os.path.join(staging, "processed"), os.path.join(staging, "vector_db"))
+        _swap_in(slug, staging)
+    except Exception:
+        registry.finish(slug, succeeded=False)
+        raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    registry.finish(slug, succeeded=True, near_duplicates=header["near_duplicates"])
+
+    seconds = time.perf_counter() - start
+    SNAPSHOT_SECONDS.observe(seconds, operation="import")
+    print(f"📦 Imported '{header['topic']}' ({header['count']} chunks) from {path} in {seconds:.1f}s")
+    return slug
+
+
+def _load_snapshot(path, header, data_dir, db_dir):
+    """Unpacks the snapshot at `path` into a fresh processed directory and vector_db directory."""
+    os.makedirs(data_dir)
+    os.makedirs(db_dir)
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            if info.filename.startswith("processed/") and not info.is_dir():
+                target = os.path.join(data_dir, os.path.basename(info.filename))
+                with archive.open(info) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        for name in set(archive.namelist()) & {LEXICAL_NAME, NEAR_DUPLICATES_NAME}:
+            with archive.open(name) as src, open(os.path.join(db_dir, name), "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+        # A namespace of its own, outside the topic table; nothing else can see it yet.
+        ns = _Namespace(data_dir, db_dir)
+        try:
+            embeddings = _map_embeddings(path, archive, header)
+            row = 0
+            for batch in _chunk_batches(archive):
+                ns.store().upsert(ids=[chunk["id"] for chunk in batch],
+                                  documents=[chunk["document"] for chunk in batch],
+                                  metadatas=[chunk["metadata"] for chunk in batch],
+                                  embeddings=np.asarray(embeddings[row:row + len(batch)], dtype=np.float32))
+                row += len(batch)
+            del embeddings  # Unmaps the archive.
+        finally:
+            ns.close()
+        manifest = json.loads(archive.read("manifest.json"))
+        manifest["store"] = VECTOR_STORE
+        _save_manifest(ns, manifest)
+    with open(os.path.join(db_dir, SNAPSHOT_ID_NAME), "w", encoding="utf-8") as f:
+        json.dump({"id": header["id"], "path": os.path.abspath(path), "created_at": header["created_at"]}, f)
+
+
+def _swap_in(slug, staging):
+    """Replaces the topic's processed and vector_db directories with those in `staging`, moving the old ones there."""
+    paths = topic_paths(slug)
+    with topic_offline(slug):
+        moved = []
+        try:
+            for key in ("processed", "vector_db"):
+                if os.path.exists(paths[key]):
+                    os.replace(paths[key], os.path.join(staging, f"old_{key}"))
+                    moved.append(key)
+            for key in ("processed", "vector_db"):
+                os.makedirs(os.path.dirname(paths[key]), exist_ok=True)
+                os.replace(os.path.join(staging, key), paths[key])
+        except OSError:
+            # Put back whatever was moved out, so the earlier copy stays usable.
+            for key in moved:
+                shutil.rmtree(paths[key], ignore_errors=True)
+                os.replace(os.path.join(staging, f"old_{key}"), paths[key])
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a prepared topic as a snapshot file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="Pack a prepared topic into a snapshot.")
+    export.add_argument("topic", help="Topic name or slug.")
+    export.add_argument("--output", help=f"Snapshot path (default: <slug>{SNAPSHOT_SUFFIX}).")
+    load = commands.add_parser("import", help="Load a snapshot as a prepared topic.")
+    load.add_argument("path")
+    load.add_argument("--force", action="store_true", help="Import even if this snapshot was imported before.")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_snapshot(args.topic, args.output)
+    else:
+        import_snapshot(args.path, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
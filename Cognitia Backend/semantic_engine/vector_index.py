@@ -1,49 +1,692 @@
 # semantic_engine/vector_index.py
 
 import os
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
+import json
+import time
+import hashlib
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
 
+from semantic_engine.chunker import chunk_text, CHUNK_TOKENS, CHUNK_OVERLAP
+from semantic_engine.lexical_index import LexicalIndex
+from semantic_engine.vector_store import open_store, VECTOR_STORE
+from semantic_engine.embedder import get_embedding_service
+from semantic_engine.reranker import get_reranker, RERANK_ENABLED, RERANK_CANDIDATES
+from semantic_engine.near_duplicates import (NearDuplicateIndex, minhash, NEAR_DUPLICATE_ACTION,
+                                             NEAR_DUPLICATE_THRESHOLD, DOCUMENT, CHUNK)
+from utils import metrics
+from utils.topics import topic_paths
+from utils.parser import timestamps_path
+
+# The default namespace, used when no topic is given (the Streamlit app and
+# the command-line scripts). Prepared topics have their own directories.
 DATA_DIR = "data/processed"
 DB_DIR = "data/vector_db"
 COLLECTION_NAME = "research_knowledge"
+MANIFEST_NAME = "index_manifest.json"
+LEXICAL_NAME = "lexical.sqlite3"
+NEAR_DUPLICATES_NAME = "near_duplicates.sqlite3"
 
-client = chromadb.Client(Settings(
-    persist_directory=DB_DIR,
-    anonymized_telemetry=False
-))
-collection = client.get_or_create_collection(name=COLLECTION_NAME)
+# Chunks are embedded and written to the vector store in batches of this size.
+EMBED_BATCH_SIZE = 64
 
-# Lightweight CPU model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# "dense" searches embeddings only; "hybrid" fuses dense and BM25 rankings.
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "hybrid")
+# Each ranking contributes this many times top_k candidates to the fusion.
+HYBRID_CANDIDATES = 4
+# Reciprocal rank fusion constant; 60 is the value from the original RRF paper.
+RRF_K = 60
 
-def build_vector_index():
-    print("📚 Building vector index...")
-    doc_id = 0
+# With NEAR_DUPLICATE_ACTION "link", searches fetch this many times the
+# chunks they return, so collapsing duplicate groups still leaves enough.
+DUPLICATE_OVERFETCH = 2
 
-    for filename in os.listdir(DATA_DIR):
-        if not filename.endswith(".txt"):
-            continue
+# Topic namespaces whose index handles stay open; the least recently used idle one is closed beyond this.
+MAX_OPEN_TOPICS = 4
+
+# One manifest lock per namespace key (None for the default namespace). They
+# outlive the namespaces, so a topic reopened after being closed is still
+# serialized against indexing calls that hold its earlier handles.
+_index_locks: dict = {}
+_index_locks_lock = threading.Lock()
+
+
+def _index_lock(key):
+    with _index_locks_lock:
+        return _index_locks.setdefault(key, threading.Lock())
+
+
+class _Namespace:
+    """
+    One knowledge base: a directory of processed files, a vector store
+    (Chroma or flat, per VECTOR_STORE), a BM25 index and the manifest that
+    keeps them in step, with the near-duplicate index alongside. Each index
+    is opened on first use.
+    """
+
+    def __init__(self, data_dir, db_dir, key=None):
+        self.data_dir = data_dir
+        self.db_dir = db_dir
+        self.manifest_path = os.path.join(db_dir, MANIFEST_NAME)
+        # Serializes manifest read-modify-write cycles between concurrent indexing calls.
+        self.index_lock = _index_lock(key)
+        self.users = 0  # Callers inside _using(); guarded by _namespaces_lock.
+        self._store = None
+        self._lexical = None
+        self._near_duplicates = None
+        self._init_lock = threading.Lock()
+
+    def store(self):
+        if self._store is None:
+            with self._init_lock:
+                if self._store is None:
+                    self._store = open_store(self.db_dir, COLLECTION_NAME)
+        return self._store
+
+    def lexical(self):
+        """BM25 index over the same chunks, kept in step with the store."""
+        if self._lexical is None:
+            with self._init_lock:
+                if self._lexical is None:
+                    self._lexical = LexicalIndex(os.path.join(self.db_dir, LEXICAL_NAME))
+        return self._lexical
+
+    def near_duplicates(self):
+        """MinHash signatures of the indexed documents and chunks."""
+        if self._near_duplicates is None:
+            with self._init_lock:
+                if self._near_duplicates is None:
+                    self._near_duplicates = NearDuplicateIndex(os.path.join(self.db_dir, NEAR_DUPLICATES_NAME))
+        return self._near_duplicates
+
+    def close(self):
+        with self._init_lock:
+            for index in (self._store, self._lexical, self._near_duplicates):
+                if index is not None:
+                    index.close()
+            self._store = self._lexical = self._near_duplicates = None
+
+
+_default_namespace = _Namespace(DATA_DIR, DB_DIR)
+_topic_namespaces: "OrderedDict[str, _Namespace]" = OrderedDict()
+_namespaces_lock = threading.Lock()
+_namespaces_idle = threading.Condition(_namespaces_lock)  # Notified when a namespace loses a user or comes back online.
+_offline = set()  # Topics whose directories are being deleted or replaced.
+
+
+def _acquire(topic) -> _Namespace:
+    """
+    The namespace for a topic slug, or the default namespace for None, with
+    one more user. Call with _namespaces_lock held.
+    """
+    if topic is None:
+        namespace = _default_namespace
+    else:
+        _namespaces_idle.wait_for(lambda: topic not in _offline)
+        namespace = _topic_namespaces.get(topic)
+        if namespace is None:
+            paths = topic_paths(topic)
+            namespace = _topic_namespaces[topic] = _Namespace(paths["processed"], paths["vector_db"], topic)
+        _topic_namespaces.move_to_end(topic)
+    namespace.users += 1
+    return namespace
+
+def _idle_overflow() -> list:
+    """
+    Takes the least recently used idle namespaces beyond MAX_OPEN_TOPICS out
+    of the table, for the caller to close. Call with _namespaces_lock held.
+    """
+    surplus = len(_topic_namespaces) - MAX_OPEN_TOPICS
+    idle = [topic for topic, namespace in _topic_namespaces.items() if namespace.users == 0][:max(0, surplus)]
+    return [_topic_namespaces.pop(topic) for topic in idle]
 
-        filepath = os.path.join(DATA_DIR, filename)
-        with open(filepath, "r", encoding="utf-8") as f:
-            content = f.read()
+@contextmanager
+def _using_all(topics=None):
+    """
+    The namespaces of the given topic slugs (the default namespace if there
+    are none). They are not closed while the block runs; namespaces in use
+    don't count against MAX_OPEN_TOPICS until they are released.
+    """
+    with _namespaces_lock:
+        namespaces = [_acquire(topic) for topic in topics] if topics else [_acquire(None)]
+    try:
+        yield namespaces
+    finally:
+        with _namespaces_lock:
+            for namespace in namespaces:
+                namespace.users -= 1
+            closed = _idle_overflow()
+            _namespaces_idle.notify_all()
+        for namespace in closed:
+            namespace.close()
 
-        collection.add(
-            documents=[content],
-            metadatas=[{"source": filename}],
-            ids=[f"doc_{doc_id}"]
+@contextmanager
+def _using(topic=None):
+    """The namespace for a topic slug, or the default namespace for None, kept open while the block runs."""
+    with _using_all([topic]) as (namespace,):
+        yield namespace
+
+@contextmanager
+def topic_offline(topic):
+    """
+    Closes a topic namespace once its current users are done and keeps it
+    closed while the block runs, e.g. while its directory is deleted or
+    replaced. Callers that need the topic meanwhile wait.
+    """
+    with _namespaces_lock:
+        _namespaces_idle.wait_for(lambda: topic not in _offline)
+        _offline.add(topic)
+        namespace = _topic_namespaces.pop(topic, None)
+        if namespace is not None:
+            _namespaces_idle.wait_for(lambda: namespace.users == 0)
+    try:
+        if namespace is not None:
+            namespace.close()
+        yield
+    finally:
+        with _namespaces_lock:
+            _offline.discard(topic)
+            _namespaces_idle.notify_all()
+
+def close_topic(topic):
+    """Releases the open handles of a topic namespace, after waiting for its current users to finish."""
+    with topic_offline(topic):
+        pass
+
+def get_store(topic=None):
+    """The namespace's vector store. It stays usable until the namespace is closed for lack of use."""
+    with _using(topic) as ns:
+        return ns.store()
+
+def get_lexical_index(topic=None):
+    with _using(topic) as ns:
+        return ns.lexical()
+
+def get_model():
+    """The embedding model; it is shared by every namespace and loaded on first use (or by warm_up)."""
+    return get_embedding_service().model()
+
+def warm_up(topics=None):
+    """Opens the indexes and loads the embedding model (and reranker, if enabled) now instead of on the first request."""
+    with _using_all(topics) as namespaces:
+        for namespace in namespaces:
+            namespace.store()
+            namespace.lexical()
+    get_model().encode("warm-up", normalize_embeddings=True)
+    if RERANK_ENABLED:
+        get_reranker().model()
+
+def _read_processed_file(filepath):
+    """Splits a file written by utils.parser into its header fields and body text."""
+    with open(filepath, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    header = {}
+    head, sep, body = content.partition("\n\n")
+    if not sep:
+        return header, content
+    for line in head.splitlines():
+        if not line.startswith("["):
+            return {}, content
+        key, _, value = line.partition("]: ")
+        header[key.lstrip("[").lower()] = value
+    return header, body
+
+def _read_timestamps(filepath):
+    """(body offsets, start seconds) of a processed transcript's cues, or None for untimed sources."""
+    try:
+        with open(timestamps_path(filepath), "r", encoding="utf-8") as f:
+            timestamps = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return timestamps["offsets"], timestamps["seconds"]
+
+def _cue_seconds(timestamps, offset):
+    """Start time of the cue that contains body offset `offset`."""
+    offsets, seconds = timestamps
+    return seconds[max(0, bisect_right(offsets, offset) - 1)]
+
+def _chunker_config():
+    return {"chunk_tokens": CHUNK_TOKENS, "overlap": CHUNK_OVERLAP, "fit_to_model": True}
+
+def _near_duplicate_config():
+    return {"action": NEAR_DUPLICATE_ACTION, "threshold": NEAR_DUPLICATE_THRESHOLD}
+
+def _load_manifest(ns):
+    """
+    Loads the record of which documents (by content hash) are in the store.
+    A manifest that disagrees with the store or the lexical index, e.g.
+    because the store did not survive a restart, the chunking or
+    near-duplicate settings changed or the namespace switched to another
+    VECTOR_STORE, is discarded along with the indexes.
+    """
+    empty = {"chunker": _chunker_config(), "store": VECTOR_STORE, "near_duplicates": _near_duplicate_config(),
+             "documents": {}}
+    if not os.path.exists(ns.manifest_path):
+        return empty
+    try:
+        with open(ns.manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return empty
+
+    store, lexical = ns.store(), ns.lexical()
+    indexed = sum(len(doc["chunk_ids"]) for doc in manifest.get("documents", {}).values())
+    near_duplicates = manifest.get("near_duplicates", {"action": "off", "threshold": NEAR_DUPLICATE_THRESHOLD})
+    if (manifest.get("chunker") != _chunker_config() or manifest.get("store", "chroma") != VECTOR_STORE
+            or near_duplicates != _near_duplicate_config()
+            or indexed != store.count() or indexed != lexical.count()):
+        print("⚠️ Index manifest is out of date, rebuilding the index.")
+        stale_ids = store.get(include=[])["ids"]
+        if stale_ids:
+            store.delete(ids=stale_ids)
+        lexical.clear()
+        ns.near_duplicates().clear()
+        return empty
+    return manifest
+
+def _save_manifest(ns, manifest):
+    os.makedirs(ns.db_dir, exist_ok=True)
+    tmp_path = ns.manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, ns.manifest_path)
+
+def _embed_batch(ns, batch):
+    """
+    Embeddings for a batch of chunks. Chunks linked to a near-duplicate reuse
+    its embedding, from this batch or from the store; the rest are embedded in
+    one forward pass.
+    """
+    fresh = [chunk for chunk in batch if "duplicate_of" not in chunk["metadata"]]
+    start = time.perf_counter()
+    vectors = dict(zip([chunk["id"] for chunk in fresh],
+                       get_embedding_service().encode_documents([chunk["text"] for chunk in fresh])))
+    metrics.record_stage("embed", time.perf_counter() - start, items=len(fresh))
+    stored = [chunk["metadata"]["duplicate_of"] for chunk in batch
+              if "duplicate_of" in chunk["metadata"] and chunk["metadata"]["duplicate_of"] not in vectors]
+    if stored:
+        found = ns.store().get(ids=stored, include=["embeddings"])
+        vectors.update(zip(found["ids"], ([float(x) for x in vector] for vector in found["embeddings"])))
+    return [vectors[chunk["metadata"].get("duplicate_of", chunk["id"])] for chunk in batch]
+
+def _flush(ns, batch):
+    """Embeds a batch of chunks in one forward pass and writes them with a single upsert to both indexes."""
+    embeddings = _embed_batch(ns, batch)
+    with metrics.span("vector_upsert"):
+        ns.store().upsert(
+            ids=[chunk["id"] for chunk in batch],
+            documents=[chunk["text"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch],
+            embeddings=embeddings
         )
-        doc_id += 1
-        print(f"✅ Indexed: {filename}")
-
-    print("✅ Vector DB ready.")
-
-def semantic_search(query, top_k=3):
-    query_embedding = model.encode(query).tolist()
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k
-    )
-    return results
\ No newline at end of file
+    with metrics.span("lexical_upsert"):
+        ns.lexical().add([chunk["id"] for chunk in batch], [chunk["text"] for chunk in batch])
+
+def _doc_hash(body):
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+ACTION_VERBS = {"link": "linked", "drop": "dropped"}
+
+def _check_duplicate(ns, kind, item_id, doc_hash, text):
+    """
+    The (id, similarity) of an indexed near-duplicate of `text`, recording the
+    find; or None, after recording `text` as canonical. Always None when
+    NEAR_DUPLICATE_ACTION is "off".
+    """
+    if NEAR_DUPLICATE_ACTION == "off":
+        return None
+    index = ns.near_duplicates()
+    signature = minhash(text)
+    match = index.find(kind, signature, doc_hash)
+    if match is None:
+        index.add(kind, item_id, doc_hash, signature)
+    else:
+        index.add_duplicate(kind, item_id, doc_hash, match[0], match[1], NEAR_DUPLICATE_ACTION)
+    return match
+
+def _index_documents(ns, filenames, manifest):
+    """
+    Chunks, embeds and upserts the given processed files, batching across files.
+    Content already in the manifest is skipped, and near-duplicates of indexed
+    documents and chunks are linked or dropped per NEAR_DUPLICATE_ACTION.
+    Updates the manifest in place and returns (new chunks, unchanged
+    documents, hashes of all the given documents).
+    """
+    current = set()
+    added, written = [], []  # Documents and chunk ids of this call, undone if it fails.
+    try:
+        new_chunks, skipped = _index_new_documents(ns, filenames, manifest["documents"], current, added, written)
+    except Exception:
+        _roll_back(ns, added, written)
+        for doc_hash in added:
+            manifest["documents"].pop(doc_hash, None)
+        raise
+    return new_chunks, skipped, current
+
+def _roll_back(ns, doc_hashes, chunk_ids):
+    """
+    Undoes a failed _index_documents call: deletes the chunks it wrote and
+    forgets the signatures it recorded, so the next attempt starts clean
+    instead of matching its own leftovers.
+    """
+    if chunk_ids:
+        ns.store().delete(ids=chunk_ids)
+        ns.lexical().delete(chunk_ids)
+    if NEAR_DUPLICATE_ACTION != "off" and doc_hashes:
+        ns.near_duplicates().delete_documents(doc_hashes)
+
+def _index_new_documents(ns, filenames, indexed, current, added, written):
+    """The body of _index_documents; records what it writes in `added` and `written` as it goes."""
+    batch = []
+    new_chunks = skipped = 0
+
+    for filename in filenames:
+        filepath = os.path.join(ns.data_dir, filename)
+        header, body = _read_processed_file(filepath)
+        doc_hash = _doc_hash(body)
+        if doc_hash in current:
+            continue
+        current.add(doc_hash)
+
+        if doc_hash in indexed:
+            indexed[doc_hash]["source"] = filename
+            skipped += 1
+            continue
+
+        added.append(doc_hash)
+        duplicate = _check_duplicate(ns, DOCUMENT, doc_hash, doc_hash, body)
+        if duplicate and NEAR_DUPLICATE_ACTION == "drop":
+            indexed[doc_hash] = {"source": filename, "chunk_ids": [], "duplicate_of": duplicate[0]}
+            print(f"🔁 Skipped near-duplicate: {filename} ({duplicate[1]:.0%} similar to an indexed document)")
+            continue
+
+        start = time.perf_counter()
+        embedder = get_embedding_service()
+        chunks = chunk_text(body, count_pieces=embedder.count_pieces, max_pieces=embedder.max_pieces())
+        metrics.record_stage("chunk", time.perf_counter() - start, items=len(chunks))
+        chunk_ids = []
+        linked = 0
+        timestamps = _read_timestamps(filepath)
+
+        for i, chunk in enumerate(chunks):
+            chunk_id = f"{doc_hash[:16]}_{i}"
+            duplicate = _check_duplicate(ns, CHUNK, chunk_id, doc_hash, chunk["text"])
+            if duplicate and NEAR_DUPLICATE_ACTION == "drop":
+                continue
+            chunk_ids.append(chunk_id)
+            metadata = {
+                "source": filename,
+                "origin": header.get("source", ""),
+                "type": header.get("type", ""),
+                "doc_hash": doc_hash,
+                "chunk": i,
+                "offset": chunk["offset"],
+                "page": chunk["page"],
+                "tokens": chunk["tokens"],
+            }
+            if timestamps:
+                # Where the chunk's speech starts and where its last cue starts.
+                metadata["start_time"] = _cue_seconds(timestamps, chunk["offset"])
+                metadata["end_time"] = _cue_seconds(timestamps, chunk["offset"] + len(chunk["text"]) - 1)
+            if duplicate:
+                metadata["duplicate_of"] = duplicate[0]
+                linked += 1
+            batch.append({"id": chunk_id, "text": chunk["text"], "metadata": metadata})
+            if len(batch) >= EMBED_BATCH_SIZE:
+                written.extend(chunk["id"] for chunk in batch)
+                _flush(ns, batch)
+                batch = []
+
+        # Recorded before the final flush; the manifest is only saved after it.
+        indexed[doc_hash] = {"source": filename, "chunk_ids": chunk_ids}
+        new_chunks += len(chunk_ids)
+        duplicates = len(chunks) - len(chunk_ids) + linked
+        print(f"✅ Indexed: {filename} ({len(chunk_ids)} chunks"
+              + (f", {duplicates} near-duplicates {ACTION_VERBS[NEAR_DUPLICATE_ACTION]})" if duplicates else ")"))
+
+    if batch:
+        written.extend(chunk["id"] for chunk in batch)
+        _flush(ns, batch)
+    if NEAR_DUPLICATE_ACTION != "off":
+        ns.near_duplicates().commit()
+
+    return new_chunks, skipped
+
+def _remove_documents(ns, manifest, keep):
+    """
+    Deletes every indexed document whose hash is not in `keep`. Documents that
+    linked or dropped near-duplicates of a deleted one are deleted as well, so
+    they can be indexed again on their own. Returns (documents removed,
+    filenames to index again).
+    """
+    indexed = manifest["documents"]
+    removed = [doc_hash for doc_hash in indexed if doc_hash not in keep]
+    reindex = []
+    doomed = removed
+    while doomed:
+        stale_ids = [chunk_id for doc_hash in doomed for chunk_id in indexed[doc_hash]["chunk_ids"]]
+        if stale_ids:
+            ns.store().delete(ids=stale_ids)
+            ns.lexical().delete(stale_ids)
+        dependents = set()
+        if NEAR_DUPLICATE_ACTION != "off":
+            dependents = ns.near_duplicates().dependents(doomed) & indexed.keys()
+            ns.near_duplicates().delete_documents(doomed)
+        for doc_hash in doomed:
+            if doc_hash in keep:
+                reindex.append(indexed[doc_hash]["source"])
+            del indexed[doc_hash]
+        doomed = list(dependents)
+    return len(removed), reindex
+
+def _processed_files(ns):
+    if not os.path.isdir(ns.data_dir):
+        return []
+    return sorted(filename for filename in os.listdir(ns.data_dir) if filename.endswith(".txt"))
+
+def index_file(filename, topic=None):
+    """
+    Indexes a single processed file from the namespace's processed directory,
+    unless its content is already indexed. Used by the prepare pipeline to
+    index documents as they are parsed. Returns the number of new chunks.
+    """
+    with _using(topic) as ns, ns.index_lock:
+        manifest = _load_manifest(ns)
+        new_chunks, _, _ = _index_documents(ns, [filename], manifest)
+        _save_manifest(ns, manifest)
+    return new_chunks
+
+def _remove_and_reindex(ns, manifest, keep):
+    """
+    _remove_documents, then indexes again the documents it had to take down
+    with the removed ones. Returns (documents removed, chunks re-indexed).
+    """
+    removed, reindex = _remove_documents(ns, manifest, keep)
+    reindexed = 0
+    if reindex:
+        print(f"🔁 Re-indexing {len(reindex)} documents whose near-duplicates were removed.")
+        reindexed = _index_documents(ns, reindex, manifest)[0]
+    return removed, reindexed
+
+def prune_index(topic=None):
+    """Deletes indexed documents that are no longer in the namespace's processed directory."""
+    with _using(topic) as ns, ns.index_lock:
+        manifest = _load_manifest(ns)
+        keep = {_doc_hash(_read_processed_file(os.path.join(ns.data_dir, filename))[1])
+                for filename in _processed_files(ns)}
+        removed, _ = _remove_and_reindex(ns, manifest, keep)
+        _save_manifest(ns, manifest)
+    if removed:
+        print(f"🧹 Removed {removed} documents no longer in {ns.data_dir}.")
+    return removed
+
+def build_vector_index(topic=None):
+    """
+    Brings the index in line with the processed directory.
+    Documents and chunks are keyed by content hash: unchanged documents are
+    skipped, new or changed ones are embedded and upserted, and documents that
+    are no longer on disk are deleted.
+    """
+    print("📚 Building vector index...")
+    with _using(topic) as ns, ns.index_lock:
+        manifest = _load_manifest(ns)
+        new_chunks, skipped, current = _index_documents(ns, _processed_files(ns), manifest)
+        removed, reindexed = _remove_and_reindex(ns, manifest, current)
+        new_chunks += reindexed
+        _save_manifest(ns, manifest)
+
+    if removed:
+        print(f"🧹 Removed {removed} documents no longer in {ns.data_dir}.")
+    print(f"✅ Vector DB ready. ({new_chunks} new chunks, {skipped} documents unchanged)")
+    if NEAR_DUPLICATE_ACTION != "off":
+        stats = near_duplicate_stats(topic)
+        print(f"🔁 Near-duplicates: {stats['duplicate_chunks']} of "
+              f"{stats['chunks'] + stats['duplicate_chunks']} chunks ({stats['dedup_ratio']:.1%}), "
+              f"{stats['duplicate_documents']} documents")
+
+def index_version(topics=None) -> tuple:
+    """
+    Changes whenever any of the namespaces' indexes does: the manifest is
+    rewritten after every indexing call. Identical searches against the same
+    version return the same chunks.
+    """
+    db_dirs = [topic_paths(topic)["vector_db"] for topic in topics] if topics else [DB_DIR]
+    versions = []
+    for db_dir in db_dirs:
+        try:
+            versions.append(os.stat(os.path.join(db_dir, MANIFEST_NAME)).st_mtime_ns)
+        except OSError:
+            versions.append(0)
+    return tuple(versions)
+
+def near_duplicate_stats(topic=None):
+    """Counts of canonical and near-duplicate documents and chunks in a namespace, with its dedup ratio."""
+    with _using(topic) as ns:
+        return ns.near_duplicates().stats()
+
+QUERY_INCLUDE = ["documents", "metadatas", "distances"]
+
+def _rows(result, include_embeddings, nested):
+    """(id, document, metadata, embedding) tuples from a store query (nested) or get result."""
+    pick = (lambda key: result[key][0]) if nested else (lambda key: result[key])
+    embeddings = pick("embeddings") if include_embeddings else [None] * len(pick("ids"))
+    return zip(pick("ids"), pick("documents"), pick("metadatas"), embeddings)
+
+def _hybrid_search(query, query_embedding, top_k, namespaces, include_embeddings=False):
+    """Fuses the dense and BM25 rankings of every namespace with reciprocal rank fusion."""
+    n_candidates = top_k * HYBRID_CANDIDATES
+    include = QUERY_INCLUDE + (["embeddings"] if include_embeddings else [])
+    rankings = []
+    found = {}
+    owner = {}  # chunk_id -> namespace it came from, for chunks only the lexical index returned.
+    for ns in namespaces:
+        with metrics.span("vector_query"):
+            dense = ns.store().query(query_embeddings=[query_embedding], n_results=n_candidates, include=include)
+        rankings.append(dense["ids"][0])
+        found.update({chunk_id: (doc, meta, embedding) for chunk_id, doc, meta, embedding
+                      in _rows(dense, include_embeddings, nested=True)})
+        with metrics.span("lexical_query"):
+            lexical_ids = [chunk_id for chunk_id, _ in ns.lexical().search(query, n_candidates)]
+        rankings.append(lexical_ids)
+        for chunk_id in lexical_ids:
+            owner.setdefault(chunk_id, ns)
+
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+
+    missing = [chunk_id for chunk_id in best if chunk_id not in found]
+    for ns in {owner[chunk_id] for chunk_id in missing}:
+        extra = ns.store().get(ids=[chunk_id for chunk_id in missing if owner[chunk_id] is ns],
+                                    include=[key for key in include if key != "distances"])
+        found.update({chunk_id: (doc, meta, embedding) for chunk_id, doc, meta, embedding
+                      in _rows(extra, include_embeddings, nested=False)})
+    best = [chunk_id for chunk_id in best if chunk_id in found]
+
+    # Same shape as a Chroma query result, with fused scores in place of distances.
+    result = {
+        "ids": [best],
+        "documents": [[found[chunk_id][0] for chunk_id in best]],
+        "metadatas": [[found[chunk_id][1] for chunk_id in best]],
+        "scores": [[scores[chunk_id] for chunk_id in best]],
+    }
+    if include_embeddings:
+        result["embeddings"] = [[found[chunk_id][2] for chunk_id in best]]
+    return result
+
+def _dense_search(query_embedding, top_k, namespaces, include_embeddings=False):
+    """
+    Queries every namespace and keeps the `top_k` closest chunks overall. The
+    result is rebuilt from plain lists even for one namespace: Chroma returns
+    embeddings as an array, which the per-chunk list handling downstream
+    would pass over.
+    """
+    include = QUERY_INCLUDE + (["embeddings"] if include_embeddings else [])
+    hits = []
+    for ns in namespaces:
+        with metrics.span("vector_query"):
+            result = ns.store().query(query_embeddings=[query_embedding], n_results=top_k, include=include)
+        hits.extend((distance,) + row for distance, row
+                    in zip(result["distances"][0], _rows(result, include_embeddings, nested=True)))
+    hits.sort(key=lambda hit: hit[0])
+    hits = hits[:top_k]
+    result = {
+        "ids": [[hit[1] for hit in hits]],
+        "documents": [[hit[2] for hit in hits]],
+        "metadatas": [[hit[3] for hit in hits]],
+        "distances": [[hit[0] for hit in hits]],
+    }
+    if include_embeddings:
+        result["embeddings"] = [[hit[4] for hit in hits]]
+    return result
+
+def _collapse_duplicates(result, top_k):
+    """Keeps the best-ranked chunk of each near-duplicate group, and at most `top_k` chunks."""
+    ids = result["ids"][0]
+    groups, order = set(), []
+    for i, metadata in enumerate(result["metadatas"][0]):
+        group = (metadata or {}).get("duplicate_of", ids[i])
+        if group not in groups:
+            groups.add(group)
+            order.append(i)
+    order = order[:top_k]
+    collapsed = dict(result)
+    for key, value in result.items():
+        if isinstance(value, list) and value and isinstance(value[0], list) and len(value[0]) == len(ids):
+            collapsed[key] = [[value[0][i] for i in order]]
+    return collapsed
+
+def semantic_search(query, top_k=3, mode=None, topics=None, include_embeddings=False, rerank=None):
+    """
+    Returns the `top_k` chunks most relevant to `query`, shaped like a Chroma query result.
+    `mode` is "dense" or "hybrid" and defaults to SEARCH_MODE. `topics` lists
+    the topic namespaces to search; by default the default namespace is searched.
+    With `include_embeddings`, the result also carries each chunk's embedding
+    under "embeddings" and the query's under "query_embedding".
+    With `rerank` (default RERANK_ENABLED), RERANK_CANDIDATES chunks are
+    retrieved and the cross-encoder picks the `top_k`; its scores are under
+    "rerank_scores". Near-duplicate chunks come back once per group.
+    """
+    rerank = RERANK_ENABLED if rerank is None else rerank
+    n_results = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+    linked = NEAR_DUPLICATE_ACTION == "link"
+    n_fetch = n_results * DUPLICATE_OVERFETCH if linked else n_results
+    with metrics.span("embed_query"):
+        query_embedding = get_embedding_service().encode_query(query)
+    with _using_all(topics) as namespaces:
+        if (mode or SEARCH_MODE) == "hybrid":
+            result = _hybrid_search(query, query_embedding, n_fetch, namespaces, include_embeddings)
+        else:
+            result = _dense_search(query_embedding, n_fetch, namespaces, include_embeddings)
+    if linked:
+        result = _collapse_duplicates(result, n_results)
+    if rerank:
+        result = get_reranker().rerank(query, result, top_k)
+    if include_embeddings:
+        result["query_embedding"] = query_embedding
+    return result
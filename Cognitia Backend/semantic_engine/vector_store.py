@@ -0,0 +1,412 @@
+# semantic_engine/vector_store.py
+
+import os
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# Storage for chunk embeddings behind one small interface, so the index can
+# run on Chroma or on a flat file. The interface is the subset of the Chroma
+# collection API the index uses, with the same result shapes:
+#
+#     upsert(ids, documents, metadatas, embeddings)
+#     delete(ids)
+#     count()
+#     get(ids=None, include=...)                       -> {"ids": [...], ...}
+#     query(query_embeddings, n_results, include=...)  -> {"ids": [[...]], ...}
+#     close()
+#
+# FlatStore keeps normalized embeddings, quantized to int8 or float16, in a
+# memory-mapped .npy file and answers queries with an exact, vectorized dot
+# product. At our corpus sizes (tens of thousands of chunks) a query costs a
+# few milliseconds, more than an HNSW lookup but nothing next to a model call,
+# in exchange for indexing several times faster, a quarter of the memory of
+# float32 vectors and one index shared by every worker process.
+# benchmarks/bench_vector_store.py compares the backends.
+
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "chroma")  # "chroma" or "flat".
+FLAT_DTYPE = os.environ.get("FLAT_STORE_DTYPE", "int8")  # "int8" or "float16".
+FLAT_DIR_NAME = "flat"
+
+INITIAL_CAPACITY = 1024  # Rows; the vector file doubles when full.
+COMPACT_RATIO = 0.25     # Rewrite the vector file once this fraction of its rows is dead.
+SCORE_BLOCK_ROWS = 1024  # Rows converted to float32 and scored at a time; small enough to stay in cache.
+INT8_LEVELS = 127.0     # int8 rows are scaled so their largest component maps to ±127.
+LOOKUP_BATCH = 500       # Keys per sidecar query; SQLite limits the number of parameters.
+
+
+class VectorStore(ABC):
+    """
+    Interface of a vector store; see the module comment for the result shapes.
+    A backend missing one of the abstract methods fails when it is created.
+    """
+
+    @abstractmethod
+    def upsert(self, ids, documents, metadatas, embeddings):
+        ...
+
+    @abstractmethod
+    def delete(self, ids):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def get(self, ids=None, include=("documents", "metadatas")) -> dict:
+        ...
+
+    @abstractmethod
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")) -> dict:
+        ...
+
+    def close(self):
+        pass
+
+
+class ChromaStore(VectorStore):
+    """A Chroma collection with cosine distance, persisted under `db_dir`."""
+
+    def __init__(self, db_dir, collection_name):
+        import chromadb
+        from chromadb.config import Settings
+
+        # A plain chromadb.Client keeps the collection in memory, whatever its persist_directory says.
+        self._client = chromadb.PersistentClient(path=db_dir, settings=Settings(anonymized_telemetry=False))
+        # Embeddings are normalized, so cosine distance is the natural metric.
+        self._collection = self._client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        self._collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def delete(self, ids):
+        self._collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def get(self, ids=None, include=("documents", "metadatas")) -> dict:
+        return self._collection.get(ids=ids, include=list(include))
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")) -> dict:
+        return self._collection.query(query_embeddings=query_embeddings, n_results=n_results, include=list(include))
+
+    def close(self):
+        # Releases the database files, so the directory can be deleted or replaced; older Chroma clients can't.
+        close = getattr(self._client, "close", None)
+        if close is not None:
+            close()
+
+
+class FlatStore(VectorStore):
+    """
+    Exact cosine search over a memory-mapped matrix of quantized embeddings.
+
+    Vectors live in `vectors.<n>.npy` and everything else in `rows.sqlite3`:
+    which file is current, how many of its rows are written, and each live
+    row's id, document and metadata. Writes only append: an upsert or delete
+    drops the old sidecar row and leaves its vector behind as dead space, and
+    the file is rewritten without dead rows once they pass COMPACT_RATIO.
+
+    The sidecar's write transaction is the lock, so several processes can
+    share one store: each maps the file read-only (the OS shares the pages)
+    and remaps when the sidecar's generation number moves on.
+    """
+
+    def __init__(self, directory, dtype=FLAT_DTYPE):
+        import numpy as np
+
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported flat store dtype '{dtype}'; use float16 or int8")
+        self._np = np
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "rows.sqlite3"), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                scale REAL NOT NULL  -- Multiplier that turns the stored int8 vector back into floats; 1 for float16.
+            )
+        """)
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('dtype', ?)", (dtype,))
+        self.dtype = self._meta().get("dtype", dtype)  # An existing store keeps the dtype it was built with.
+        self._lock = threading.Lock()
+        self._generation = None
+        self._vectors = None  # Read-only map of the written rows.
+        self._live = None     # Row numbers that still have a sidecar row.
+        self._live_mask = None
+        self._scales = None   # Per-row int8 scale, 0 for dead rows.
+
+    # --- Sidecar state ---
+
+    def _meta(self) -> dict:
+        return dict(self._db.execute("SELECT key, value FROM meta"))
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(key, str(value)) for key, value in values.items()])
+
+    def _refresh(self):
+        """Maps the current vector file and loads the live rows if another write happened since the last call."""
+        meta = self._meta()
+        generation = int(meta.get("generation", 0))
+        if generation == self._generation:
+            return
+        np = self._np
+        n_rows = int(meta.get("n_rows", 0))
+        if n_rows:
+            matrix = np.load(os.path.join(self.directory, meta["vectors_file"]), mmap_mode="r")
+            self._vectors = matrix[:n_rows]
+        else:
+            self._vectors = None
+        live = self._db.execute("SELECT row, scale FROM rows ORDER BY row").fetchall()
+        self._live = np.array([row for row, _ in live], dtype=np.int64)
+        self._live_mask = np.zeros(n_rows, dtype=bool)
+        self._live_mask[self._live] = True
+        if self.dtype == "int8":
+            self._scales = np.zeros(n_rows, dtype=np.float32)
+            self._scales[self._live] = [scale for _, scale in live]
+        self._generation = generation
+
+    # --- Writes ---
+
+    def _quantize(self, embeddings):
+        """The stored form of `embeddings` and each row's scale."""
+        np = self._np
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self.dtype == "int8":
+            scales = np.abs(vectors).max(axis=1) / INT8_LEVELS
+            scales[scales == 0] = 1.0
+            return np.rint(vectors / scales[:, None]).astype(np.int8), scales
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+    def _dequantize(self, rows):
+        vectors = self._vectors[rows].astype(self._np.float32)
+        return vectors * self._scales[rows][:, None] if self.dtype == "int8" else vectors
+
+    def _open_writable(self, meta, needed):
+        """The writable vector file with room for `needed` rows, growing it if necessary. Returns (matrix, meta)."""
+        np = self._np
+        n_rows = int(meta.get("n_rows", 0))
+        current = meta.get("vectors_file")
+        if current:
+            matrix = np.load(os.path.join(self.directory, current), mmap_mode="r+")
+            if matrix.shape[0] >= needed:
+                return matrix, meta
+        capacity = max(INITIAL_CAPACITY, matrix.shape[0] if current else 0)
+        while capacity < needed:
+            capacity *= 2
+        grown = self._new_file(meta, capacity)
+        if current and n_rows:
+            grown[:n_rows] = matrix[:n_rows]
+        meta["vectors_file"] = os.path.basename(grown.filename)
+        return grown, meta
+
+    def _new_file(self, meta, capacity):
+        """
+        A new vector file named after the generation about to be committed.
+        Names are never reused, so a reader still on an older generation
+        cannot open a newer file by mistake.
+        """
+        path = os.path.join(self.directory, f"vectors.{int(meta.get('generation', 0)) + 1}.npy")
+        return self._np.lib.format.open_memmap(path, mode="w+", dtype=self.dtype, shape=(capacity, int(meta["dim"])))
+
+    def _commit(self, meta, old_file):
+        meta["generation"] = int(meta.get("generation", 0)) + 1
+        self._set_meta(**meta)
+        self._db.execute("COMMIT")
+        if old_file and old_file != meta.get("vectors_file"):
+            try:
+                os.remove(os.path.join(self.directory, old_file))
+            except OSError:
+                pass  # Still mapped by a reader on a platform that forbids removing it; left for later.
+
+    def upsert(self, ids, documents, metadatas, embeddings):
+        if not ids:
+            return
+        vectors, scales = self._quantize(embeddings)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta()
+                old_file = meta.get("vectors_file")
+                if "dim" not in meta:
+                    meta["dim"] = vectors.shape[1]
+                elif int(meta["dim"]) != vectors.shape[1]:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the store's {meta['dim']}")
+                n_rows = int(meta.get("n_rows", 0))
+                matrix, meta = self._open_writable(meta, n_rows + len(ids))
+                matrix[n_rows:n_rows + len(ids)] = vectors
+                matrix.flush()
+                del matrix
+                self._db.executemany("DELETE FROM rows WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+                self._db.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?)", [
+                    (n_rows + i, chunk_id, document, json.dumps(metadata), float(scale))
+                    for i, (chunk_id, document, metadata, scale) in enumerate(zip(ids, documents, metadatas, scales))
+                ])
+                meta["n_rows"] = n_rows + len(ids)
+                self._commit(meta, old_file)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._maybe_compact()
+
+    def delete(self, ids):
+        if not ids:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("DELETE FROM rows WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+                self._commit(self._meta(), None)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        with self._lock:
+            n_rows = int(self._meta().get("n_rows", 0))
+            dead = n_rows - self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        if n_rows and dead > COMPACT_RATIO * n_rows:
+            self.compact()
+
+    def compact(self):
+        """Rewrites the vector file with only the live rows, renumbered in order."""
+        np = self._np
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta()
+                old_file = meta.get("vectors_file")
+                live = [row for (row,) in self._db.execute("SELECT row FROM rows ORDER BY row")]
+                if old_file:
+                    source = np.load(os.path.join(self.directory, old_file), mmap_mode="r")
+                    compacted = self._new_file(meta, max(INITIAL_CAPACITY, 2 * len(live)))
+                    for start in range(0, len(live), SCORE_BLOCK_ROWS):
+                        block = live[start:start + SCORE_BLOCK_ROWS]
+                        compacted[start:start + len(block)] = source[block]
+                    compacted.flush()
+                    meta["vectors_file"] = os.path.basename(compacted.filename)
+                    del source, compacted
+                # Renumbering in ascending order never collides with a row not yet moved.
+                self._db.executemany("UPDATE rows SET row = ? WHERE row = ?",
+                                     [(new, old) for new, old in enumerate(live) if new != old])
+                meta["n_rows"] = len(live)
+                self._commit(meta, old_file)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    # --- Reads ---
+
+    def _read(self, read):
+        """
+        Runs `read()` with the lock held, in a read transaction over a fresh
+        map of the vectors, so the sidecar and the vectors it numbers agree
+        even while another process writes.
+        """
+        while True:
+            with self._lock:
+                self._db.execute("BEGIN")
+                try:
+                    self._refresh()
+                    return read()
+                except FileNotFoundError:
+                    self._generation = None  # Compacted and removed by another process since; map the new file.
+                finally:
+                    self._db.execute("COMMIT")
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def _lookup(self, columns, key, values):
+        """Yields sidecar rows whose `key` column is in `values`, in batches of LOOKUP_BATCH."""
+        for start in range(0, len(values), LOOKUP_BATCH):
+            batch = values[start:start + LOOKUP_BATCH]
+            yield from self._db.execute(
+                f"SELECT {columns} FROM rows WHERE {key} IN ({','.join('?' * len(batch))})", batch)
+
+    def _fetch(self, rows, include):
+        """Sidecar fields for the given row numbers, in the same order."""
+        found = {row: (chunk_id, document, metadata) for row, chunk_id, document, metadata
+                 in self._lookup("row, id, document, metadata", "row", rows)}
+        rows = [row for row in rows if row in found]
+        result = {"ids": [found[row][0] for row in rows]}
+        if "documents" in include:
+            result["documents"] = [found[row][1] for row in rows]
+        if "metadatas" in include:
+            result["metadatas"] = [json.loads(found[row][2]) for row in rows]
+        if "embeddings" in include:
+            result["embeddings"] = self._dequantize(rows).tolist() if rows else []
+        return rows, result
+
+    def get(self, ids=None, include=("documents", "metadatas")) -> dict:
+        return self._read(lambda: self._get(ids, include))
+
+    def _get(self, ids, include):
+        if ids is None:
+            rows = self._live.tolist()
+        else:
+            by_id = dict(self._lookup("id, row", "id", list(ids)))
+            rows = [by_id[chunk_id] for chunk_id in ids if chunk_id in by_id]
+        if not rows:
+            return {"ids": [], **{key: [] for key in include if key != "distances"}}
+        return self._fetch(rows, include)[1]
+
+    def query(self, query_embeddings, n_results=10, include=("documents", "metadatas", "distances")) -> dict:
+        queries = self._np.asarray(query_embeddings, dtype=self._np.float32)
+        return self._read(lambda: self._query(queries, n_results, include))
+
+    def _query(self, queries, n_results, include):
+        np = self._np
+        results = {key: [] for key in ["ids", *include]}
+        for query in queries:
+            k = min(n_results, len(self._live))
+            if k == 0:
+                for values in results.values():
+                    values.append([])
+                continue
+            scores = np.empty(len(self._vectors), dtype=np.float32)
+            for start in range(0, len(self._vectors), SCORE_BLOCK_ROWS):
+                block = self._vectors[start:start + SCORE_BLOCK_ROWS]
+                scores[start:start + len(block)] = block.astype(np.float32) @ query
+            if self.dtype == "int8":
+                scores *= self._scales
+            scores[~self._live_mask] = -np.inf
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            rows, fetched = self._fetch(top.tolist(), include)
+            if "distances" in include:
+                fetched["distances"] = (1.0 - scores[rows]).tolist()
+            for key, values in results.items():
+                values.append(fetched[key])
+        return results
+
+    def close(self):
+        with self._lock:
+            self._vectors = self._live = self._live_mask = self._scales = None
+            self._generation = None
+            self._db.close()
+
+
+def open_store(db_dir, collection_name, backend=None) -> VectorStore:
+    """The vector store kept under `db_dir`, using `backend` ("chroma" or "flat"; default VECTOR_STORE)."""
+    backend = backend or VECTOR_STORE
+    if backend == "flat":
+        return FlatStore(os.path.join(db_dir, FLAT_DIR_NAME))
+    if backend == "chroma":
+        return ChromaStore(db_dir, collection_name)
+    raise ValueError(f"Unknown vector store '{backend}'; use chroma or flat")
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The backend's packages are imported from its root, as the app does.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
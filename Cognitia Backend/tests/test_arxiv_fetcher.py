@@ -0,0 +1,79 @@
+# tests/test_arxiv_fetcher.py
+
+import os
+import time
+
+import pytest
+
+from benchmarks.fake_arxiv import FakeArxivServer
+from fetchers import arxiv_fetcher
+from utils.ratelimit import TokenBucket
+
+PAPERS = 3
+
+
+@pytest.fixture
+def fake(tmp_path, monkeypatch):
+    with FakeArxivServer(papers=PAPERS, pages=2, words_per_page=100) as server:
+        monkeypatch.setattr(arxiv_fetcher, "ARXIV_API_URL", f"{server.url}/api/query")
+        monkeypatch.setattr(arxiv_fetcher, "ARXIV_PDF_URL", f"{server.url}/pdf")
+        monkeypatch.setattr(arxiv_fetcher, "CACHE_DIR", str(tmp_path / "cache"))
+        monkeypatch.setattr(arxiv_fetcher, "_rate_limiter", TokenBucket(100))
+        yield server
+
+
+def fetch(tmp_path, name="papers"):
+    return arxiv_fetcher.fetch_arxiv_papers_by_topic("qubits", max_results=PAPERS, save_dir=str(tmp_path / name))
+
+
+def pdf_requests(fake):
+    return [(path, byte_range) for path, byte_range in fake.log if path.startswith("/pdf/")]
+
+
+def test_fetches_every_paper(fake, tmp_path):
+    paths = fetch(tmp_path)
+    assert len(paths) == PAPERS
+    expected = sorted(pdf for _, pdf in fake.papers.values())
+    assert sorted(open(path, "rb").read() for path in paths) == expected
+
+
+def test_requests_are_rate_limited(fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(arxiv_fetcher, "_rate_limiter", TokenBucket(10))
+    start = time.monotonic()
+    fetch(tmp_path)
+    # One feed request and one per paper; the first takes the bucket's only token.
+    assert fake.requests == PAPERS + 1
+    assert time.monotonic() - start >= PAPERS / 10 - 0.05
+
+
+def test_cached_papers_are_not_downloaded_again(fake, tmp_path):
+    first = fetch(tmp_path, "first")
+    fake.log.clear()
+    second = fetch(tmp_path, "second")
+    assert pdf_requests(fake) == []
+    assert sorted(open(path, "rb").read() for path in second) == sorted(open(path, "rb").read() for path in first)
+
+
+def test_interrupted_download_resumes_from_part_file(fake, tmp_path):
+    arxiv_id, (_, pdf) = next(iter(fake.papers.items()))
+    os.makedirs(arxiv_fetcher.CACHE_DIR)
+    cached = os.path.join(arxiv_fetcher.CACHE_DIR, f"{arxiv_id}.pdf")
+    half = len(pdf) // 2
+    with open(cached + ".part", "wb") as f:
+        f.write(pdf[:half])
+
+    fetch(tmp_path)
+    assert (f"/pdf/{arxiv_id}.pdf", f"bytes={half}-") in pdf_requests(fake)
+    assert open(cached, "rb").read() == pdf
+    assert not os.path.exists(cached + ".part")
+
+
+def test_complete_part_file_is_kept(fake, tmp_path):
+    arxiv_id, (_, pdf) = next(iter(fake.papers.items()))
+    os.makedirs(arxiv_fetcher.CACHE_DIR)
+    cached = os.path.join(arxiv_fetcher.CACHE_DIR, f"{arxiv_id}.pdf")
+    with open(cached + ".part", "wb") as f:
+        f.write(pdf)
+
+    assert len(fetch(tmp_path)) == PAPERS
+    assert open(cached, "rb").read() == pdf
@@ -0,0 +1,136 @@
+# tests/test_ollama_client.py
+
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ollama_utils import client as client_module
+from ollama_utils.client import OllamaClient, OllamaError
+from ollama_utils.fake_server import FakeOllamaServer, default_response
+from ollama_utils.scheduler import LLMScheduler
+
+
+@pytest.fixture
+def fake():
+    with FakeOllamaServer() as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(client_module, "RETRY_BACKOFF", 0.0)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_generate_returns_completion(fake):
+    client = OllamaClient(host=fake.url)
+    assert client.generate("what is a qubit") == default_response("what is a qubit")
+    assert fake.requests[0]["stream"] is False
+
+
+def test_generate_retries_server_errors(fake):
+    fake.failures = 2
+    client = OllamaClient(host=fake.url, retries=2)
+    assert client.generate("retry me") == default_response("retry me")
+    assert fake.failures == 0
+    assert len(fake.requests) == 1
+
+
+def test_generate_gives_up_after_retries(fake):
+    fake.failures = 3
+    client = OllamaClient(host=fake.url, retries=1)
+    with pytest.raises(OllamaError, match="after 2 attempts"):
+        client.generate("retry me")
+    assert fake.failures == 1
+
+
+def test_generate_times_out(fake):
+    fake.latency = 1.0
+    scheduler = LLMScheduler(max_concurrency=1)
+    client = OllamaClient(host=fake.url, timeout=0.2, scheduler=scheduler)
+    start = time.monotonic()
+    with pytest.raises(OllamaError, match="did not respond"):
+        client.generate("slow")
+    assert time.monotonic() - start < 1.0
+    assert scheduler.stats()["running"] == 0
+
+
+def test_stream_yields_pieces(fake):
+    client = OllamaClient(host=fake.url)
+    assert "".join(client.stream("stream me")).strip() == default_response("stream me")
+
+
+def test_closing_stream_cancels_generation(fake):
+    fake.tokens_per_second = 50
+    scheduler = LLMScheduler(max_concurrency=1)
+    client = OllamaClient(host=fake.url, scheduler=scheduler)
+    pieces = client.stream(" ".join(["word"] * 100))
+    next(pieces)
+    next(pieces)
+    pieces.close()
+    assert scheduler.stats()["running"] == 0
+    assert wait_for(lambda: fake.cancelled == 1)
+
+
+def serve_body(body):
+    """Starts a server that answers every POST with `body`; returns it."""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.mark.parametrize("body", [b"<html>Bad Gateway", b'"oops"', b'{"response": 5, "done": true}'])
+def test_malformed_response_raises_ollama_error(body):
+    server = serve_body(body)
+    try:
+        client = OllamaClient(host=f"http://127.0.0.1:{server.server_address[1]}")
+        with pytest.raises(OllamaError, match="malformed"):
+            client.generate("hello")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_null_response_is_empty():
+    server = serve_body(b'{"response": null, "done": true}')
+    try:
+        client = OllamaClient(host=f"http://127.0.0.1:{server.server_address[1]}")
+        assert client.generate("hello") == ""
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("line", [b"<html>", b'"oops"', b"5", b'{"response": 5}'])
+def test_malformed_stream_line_raises_ollama_error(line):
+    server = serve_body(line + b"\n")
+    try:
+        client = OllamaClient(host=f"http://127.0.0.1:{server.server_address[1]}")
+        with pytest.raises(OllamaError, match="malformed"):
+            list(client.stream("hello"))
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,235 @@
+# utils/metrics.py
+
+import os
+import json
+import time
+import threading
+import contextvars
+
+# In-process counters and latency histograms, rendered in the Prometheus text
+# format by the API's /metrics endpoint. With METRICS_ENABLED=0 every call
+# returns immediately, so instrumentation can stay in hot paths.
+
+ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+LOG_TIMINGS = os.environ.get("METRICS_LOG_TIMINGS", "0") == "1"  # One JSON timing line per API request.
+
+# Upper bounds in seconds, from a vector query up to a long generation.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry = {}
+_collectors = []
+_registry_lock = threading.Lock()
+
+# Per-request {stage: seconds}; set by the API middleware, None elsewhere.
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value=1, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, value) for key, value in self._values.items()]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        names = self.labelnames + ("le",)
+        samples = []
+        with self._lock:
+            for key, (bucket_counts, total, count) in self._values.items():
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    samples.append((f"{self.name}_bucket", names, key + (repr(bound),), bucket_count))
+                samples.append((f"{self.name}_bucket", names, key + ("+Inf",), count))
+                samples.append((f"{self.name}_sum", self.labelnames, key, total))
+                samples.append((f"{self.name}_count", self.labelnames, key, count))
+        return samples
+
+
+class Gauge:
+    """Current value per label combination."""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        if not ENABLED:
+            return
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, self.labelnames, key, value) for key, value in self._values.items()]
+
+
+def _register(cls, name, *args, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        return metric
+
+
+def counter(name, help, labelnames=()) -> Counter:
+    """Returns the counter called `name`, creating it on first use."""
+    return _register(Counter, name, help, labelnames)
+
+
+def gauge(name, help, labelnames=()) -> Gauge:
+    """Returns the gauge called `name`, creating it on first use."""
+    return _register(Gauge, name, help, labelnames)
+
+
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Returns the histogram called `name`, creating it on first use."""
+    return _register(Histogram, name, help, labelnames, buckets)
+
+
+def register_collector(collect):
+    """
+    Adds a callback run at scrape time, for values another component already
+    tracks. `collect()` returns (name, type, help, value) tuples.
+    """
+    with _registry_lock:
+        _collectors.append(collect)
+
+
+STAGE_SECONDS = histogram("cognitia_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+STAGE_ITEMS = counter("cognitia_stage_items_total", "Items processed by each pipeline stage.", ("stage",))
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.stage, time.perf_counter() - self.start)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str):
+    """Context manager timing a block as `stage` in cognitia_stage_seconds and the current request's timings."""
+    return _Span(stage) if ENABLED else _NULL_SPAN
+
+
+def record_stage(stage: str, seconds: float, items: int = 0):
+    """Records time spent in `stage` that was measured elsewhere (e.g. in a worker process)."""
+    if not ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    if items:
+        STAGE_ITEMS.inc(items, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def begin_request():
+    """Starts collecting stage timings for the current request; pass the result to `end_request`."""
+    return _request_timings.set({})
+
+
+def end_request(token, **fields):
+    """Stops collecting and, with METRICS_LOG_TIMINGS=1, prints the request's timings as one JSON line."""
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+    if LOG_TIMINGS and timings is not None:
+        print(json.dumps({"event": "request_timing", **fields,
+                          "stages": {stage: round(seconds, 4) for stage, seconds in timings.items()}}))
+    return timings
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    with _registry_lock:
+        metrics, collectors = list(_registry.values()), list(_collectors)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labelnames, values, value in metric.samples():
+            lines.append(f"{name}{_label_text(labelnames, values)} {value}")
+    for collect in collectors:
+        for name, metric_type, help, value in collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
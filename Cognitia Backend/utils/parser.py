@@ -1,23 +1,65 @@
 # utils/parser.py
 
 import os
-import fitz  # PyMuPDF
-import webvtt
+import json
+import time
+import hashlib
+import multiprocessing
 import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 
+from utils import metrics
+
 RAW_PDF_DIR = "data/raw_papers"
 RAW_YT_DIR = "data/youtube_transcripts"
 OUT_DIR = "data/processed"
 
-os.makedirs(OUT_DIR, exist_ok=True)
+# Parser processes; set PARSER_WORKERS=1 to parse in-process.
+PARSER_WORKERS = int(os.environ.get("PARSER_WORKERS", os.cpu_count() or 1))
+
+# Bumped when a source type's extracted text changes, so existing outputs are
+# parsed again instead of being taken as up to date.
+FORMAT_VERSIONS = {"pdf": 1, "youtube": 2}
+# Processed transcripts carry their cue start times in a sidecar next to them.
+TIMESTAMPS_SUFFIX = ".timestamps.json"
+
+VTT_TIMING = re.compile(r"(?:(\d+):)?(\d{2}):(\d{2})[.,](\d{3})\s+-->")
+VTT_TAG = re.compile(r"<[^>]*>")
+ROLLING_LINES = 3  # Lines a caption may repeat from the cues before it.
+
+def timestamps_path(out_path):
+    return out_path[:-len(".txt")] + TIMESTAMPS_SUFFIX
 
-def _clean_processed_folder():
-    """Clear all previously processed text files."""
-    for file in os.listdir(OUT_DIR):
-        if file.endswith(".txt"):
-            os.remove(os.path.join(OUT_DIR, file))
-    print("🧹 Cleared previously processed documents.")
+def remove_stale_outputs(keep, out_dir=OUT_DIR):
+    """Delete processed text files whose source is gone or has changed."""
+    if not os.path.isdir(out_dir):
+        return
+    removed = 0
+    for file in os.listdir(out_dir):
+        if file.endswith(".txt") and file not in keep:
+            os.remove(os.path.join(out_dir, file))
+            removed += 1
+        elif file.endswith(TIMESTAMPS_SUFFIX) and file[:-len(TIMESTAMPS_SUFFIX)] + ".txt" not in keep:
+            os.remove(os.path.join(out_dir, file))
+    if removed:
+        print(f"🧹 Removed {removed} stale processed documents.")
+
+def file_hash(file_path):
+    """SHA-256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def output_name(original_file, source_type, source_hash):
+    """Processed file name, keyed by the content hash of its source."""
+    basename = os.path.basename(original_file)
+    version = FORMAT_VERSIONS.get(source_type, 1)
+    suffix = f"_v{version}" if version > 1 else ""
+    return f"{source_type}_{basename[:60]}_{source_hash[:16]}{suffix}.txt"
 
 def clean_text(text):
     """Remove extra spaces, newlines, and garbage tokens."""
@@ -25,64 +67,204 @@ def clean_text(text):
     text = re.sub(r"[^\x00-\x7F]+", "", text)  # remove non-ASCII
     return text.strip()
 
-def process_pdf(file_path):
-    """Extract plain text from a PDF using PyMuPDF."""
-    try:
-        doc = fitz.open(file_path)
-        text = ""
+def iter_pdf_pages(file_path):
+    """Yields the cleaned text of each page of a PDF, one page in memory at a time."""
+    import fitz  # PyMuPDF; imported here so importing this module stays cheap.
+
+    with fitz.open(file_path) as doc:
         for page in doc:
-            text += page.get_text()
-        return clean_text(text)
-    except Exception as e:
-        print(f"❌ PDF parse failed: {file_path} | Error: {e}")
-        return ""
+            yield clean_text(page.get_text())
 
-def process_vtt(file_path):
-    """Convert .vtt subtitle file to plain transcript text."""
-    try:
-        captions = webvtt.read(file_path)
-        text = " ".join([caption.text for caption in captions])
-        return clean_text(text)
-    except Exception as e:
-        print(f"❌ VTT parse failed: {file_path} | Error: {e}")
-        return ""
+def iter_vtt_cues(file_path):
+    """Yields (start seconds, text lines) for each cue of a WebVTT file, reading it line by line."""
+    start, lines = None, []
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if start is None:
+                match = VTT_TIMING.match(line.strip())
+                if match:
+                    hours, minutes, seconds, millis = match.groups()
+                    start = int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis) / 1000
+                continue
+            if line:  # A cue ends at an empty line; whitespace-only lines belong to it.
+                lines.append(line)
+            else:
+                yield start, lines
+                start, lines = None, []
+    if start is not None:
+        yield start, lines
 
-def save_clean_text(text, original_file, source_type):
-    """Saves cleaned text with metadata."""
-    basename = os.path.basename(original_file)
+def normalize_captions(cues):
+    """
+    Collapses rolling captions. YouTube auto-captions show each line in two or
+    three consecutive cues, and some captions grow a line word by word; only
+    the text a cue adds is kept. Yields (start seconds, new text) per cue.
+    Each cue is compared with the last ROLLING_LINES lines shown, so the whole
+    pass is linear in the transcript length.
+    """
+    shown = deque(maxlen=ROLLING_LINES)
+    for start, lines in cues:
+        lines = [clean_text(VTT_TAG.sub("", line)) for line in lines]
+        lines = [line for line in lines if line]
+        # The longest run of leading lines that repeats the end of what was shown.
+        overlap = next((k for k in range(min(len(shown), len(lines)), 0, -1)
+                        if list(shown)[-k:] == lines[:k]), 0)
+        new = []
+        for line in lines[overlap:]:
+            if shown and line.startswith(shown[-1] + " "):
+                new.append(line[len(shown[-1]) + 1:])
+                shown[-1] = line
+            else:
+                new.append(line)
+                shown.append(line)
+        if new:
+            yield start, " ".join(new)
+
+def iter_vtt_text(file_path):
+    """Yields (text, start seconds) for each stretch of new speech in a .vtt subtitle file."""
+    for start, text in normalize_captions(iter_vtt_cues(file_path)):
+        yield text, start
+
+# source_type -> (source directory, file extensions, text extractor, separator between extracted parts)
+# PDF pages are kept apart with a form feed so the indexer can tag chunks with page numbers.
+# An extractor yields text parts, or (text, start seconds) pairs for timed sources.
+SOURCES = {
+    "pdf": (RAW_PDF_DIR, (".pdf",), iter_pdf_pages, "\f"),
+    "youtube": (RAW_YT_DIR, (".vtt", ".webvtt"), iter_vtt_text, " "),
+}
+
+def save_clean_text(parts, separator, original_file, source_type, source_hash, out_dir=OUT_DIR):
+    """
+    Streams cleaned text parts into the output file with metadata, so only one
+    part is held in memory. Timed parts also record where each one starts in
+    the body, in a timestamps sidecar. Returns the output path, or None if
+    there was no text.
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    out_name = f"{source_type}_{basename[:60]}_{timestamp}.txt"
-    out_path = os.path.join(OUT_DIR, out_name)
+    out_name = output_name(original_file, source_type, source_hash)
+    out_path = os.path.join(out_dir, out_name)
+    tmp_path = out_path + ".tmp"
+    os.makedirs(out_dir, exist_ok=True)
+
+    has_text = False
+    offsets, seconds = [], []
+    body_length = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(f"[SOURCE]: {original_file}\n")
+            f.write(f"[TYPE]: {source_type}\n")
+            f.write(f"[HASH]: {source_hash}\n")
+            f.write(f"[DATE]: {timestamp}\n\n")
+            for i, part in enumerate(parts):
+                if i:
+                    f.write(separator)
+                    body_length += len(separator)
+                if isinstance(part, tuple):
+                    part, start = part
+                    offsets.append(body_length)
+                    seconds.append(start)
+                f.write(part)
+                body_length += len(part)
+                has_text = has_text or bool(part)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    if not has_text:
+        os.remove(tmp_path)
+        return None
+    if offsets:
+        # Written first, so whoever sees the text also finds its timestamps.
+        with open(timestamps_path(out_path), "w", encoding="utf-8") as f:
+            json.dump({"offsets": offsets, "seconds": seconds}, f)
+    os.replace(tmp_path, out_path)
+    return out_path
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(f"[SOURCE]: {original_file}\n")
-        f.write(f"[TYPE]: {source_type}\n")
-        f.write(f"[DATE]: {timestamp}\n\n")
-        f.write(text)
+def parse_file(path, source_type, out_dir=OUT_DIR):
+    """
+    Parses one source file into `out_dir` unless an output for its current
+    content already exists. Runs inside parser worker processes.
+    Returns a report with the output name, status and time taken.
+    """
+    start = time.perf_counter()
+    report = {"source": path, "type": source_type, "output": None, "status": "parsed", "error": None}
+    try:
+        source_hash = file_hash(path)
+        report["output"] = output_name(path, source_type, source_hash)
+        if os.path.exists(os.path.join(out_dir, report["output"])):
+            report["status"] = "unchanged"
+        else:
+            _, _, extract, separator = SOURCES[source_type]
+            if save_clean_text(extract(path), separator, path, source_type, source_hash, out_dir) is None:
+                report["status"] = "empty"
+    except Exception as e:
+        report["status"] = "failed"
+        report["error"] = f"{type(e).__name__}: {e}"
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+def _list_sources():
+    """Returns (path, source_type) for every raw source file."""
+    sources = []
+    for source_type, (src_dir, extensions, _, _) in SOURCES.items():
+        if not os.path.isdir(src_dir):
+            continue
+        for file in sorted(os.listdir(src_dir)):
+            if file.endswith(extensions):
+                sources.append((os.path.join(src_dir, file), source_type))
+    return sources
 
-    print(f"✅ Saved cleaned {source_type}: {out_path}")
+def _print_report(report):
+    if report["status"] == "failed":
+        print(f"❌ {report['type']} parse failed: {report['source']} | Error: {report['error']}")
+    elif report["status"] == "parsed":
+        print(f"✅ Saved cleaned {report['type']}: {report['output']} ({report['seconds']:.2f}s)")
+    elif report["status"] == "empty":
+        print(f"⚠️ No text extracted: {report['source']} ({report['seconds']:.2f}s)")
 
-def run_parser():
+def run_parser(workers=PARSER_WORKERS):
+    """
+    Parses every new or changed raw source; unchanged ones are skipped.
+    With more than one worker, files are spread over a process pool.
+    Returns the per-file reports.
+    """
     print("\n🧠 Sentient Scholar | Document Processor Started")
-    _clean_processed_folder()
-
-    # Process PDFs
-    for file in os.listdir(RAW_PDF_DIR):
-        if file.endswith(".pdf"):
-            path = os.path.join(RAW_PDF_DIR, file)
-            text = process_pdf(path)
-            if text:
-                save_clean_text(text, path, "pdf")
-
-    # Process YouTube captions
-    for file in os.listdir(RAW_YT_DIR):
-        if file.endswith(".vtt") or file.endswith(".webvtt"):
-            path = os.path.join(RAW_YT_DIR, file)
-            text = process_vtt(path)
-            if text:
-                save_clean_text(text, path, "youtube")
-
-    print("\n🎉 All documents processed successfully!")
+    os.makedirs(OUT_DIR, exist_ok=True)
+    sources = _list_sources()
+    start = time.perf_counter()
+    reports = []
+
+    if workers > 1 and len(sources) > 1:
+        # Spawned rather than forked: the API process runs threads and holds large models.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(sources)), mp_context=context) as pool:
+            futures = {pool.submit(parse_file, path, source_type): (path, source_type)
+                       for path, source_type in sources}
+            for future in as_completed(futures):
+                try:
+                    reports.append(future.result())
+                except Exception as e:
+                    # The worker process itself died, e.g. killed while parsing a pathological file.
+                    path, source_type = futures[future]
+                    reports.append({"source": path, "type": source_type, "output": None, "status": "failed",
+                                    "error": f"{type(e).__name__}: {e}", "seconds": 0.0})
+                _print_report(reports[-1])
+    else:
+        for path, source_type in sources:
+            reports.append(parse_file(path, source_type))
+            _print_report(reports[-1])
+
+    for report in reports:
+        metrics.record_stage("parse", report["seconds"], items=1)
+    remove_stale_outputs({report["output"] for report in reports if report["output"]})
+
+    counts = {status: sum(1 for r in reports if r["status"] == status)
+              for status in ("parsed", "unchanged", "empty", "failed")}
+    print(f"\n🎉 All documents processed successfully! "
+          f"({counts['parsed']} parsed, {counts['unchanged']} unchanged, {counts['empty']} empty, "
+          f"{counts['failed']} failed in {time.perf_counter() - start:.2f}s)")
+    return reports
 
 if __name__ == "__main__":
-    run_parser()
\ No newline at end of file
+    run_parser()
@@ -0,0 +1,44 @@
+# utils/single_flight.py
+
+import asyncio
+
+from utils import metrics
+
+# Request coalescing for the async API: while a computation for a key is in
+# flight, identical requests await it instead of starting their own. Nothing
+# is kept once it finishes; that is what the caches are for.
+
+COALESCED = metrics.counter("cognitia_coalesced_total", "Requests that joined an identical computation in flight.",
+                            ("flight",))
+
+
+class SingleFlight:
+    """
+    One in-flight computation per key. Callers are shielded from each other: a
+    caller that is cancelled (a timeout, a client that went away) stops
+    waiting, but the computation finishes for the others.
+    Use from the event loop only.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights = {}  # key -> asyncio.Task
+
+    def _finished(self, key, task):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # Marks the error retrieved even if every caller gave up.
+
+    async def run(self, key, start):
+        """The result of `start()`, an awaitable, or of the identical computation already in flight."""
+        task = self._flights.get(key)
+        if task is None:
+            task = self._flights[key] = asyncio.ensure_future(start())
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            COALESCED.inc(flight=self.name)
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
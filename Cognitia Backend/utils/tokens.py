@@ -0,0 +1,67 @@
+# utils/tokens.py
+
+import os
+import re
+import sys
+import math
+import threading
+
+# Words and individual punctuation marks. This is close to the WordPiece/BPE
+# token counts of the models we use on plain prose, without having to load a
+# tokenizer, but undercounts rare words, numbers and code; where a hard model
+# limit applies (embedding chunks), measure with the model's tokenizer.
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Prompt budgets are counted with the answer model's own tokenizer (a Hugging
+# Face name or a local path; "" = never load one). If it cannot be loaded, the
+# regex count stands in, padded by REGEX_MARGIN so arXiv text full of numbers
+# and symbols still fits the model's context.
+TOKENIZER = os.environ.get("COGNITIA_TOKENIZER", "mistralai/Mistral-7B-Instruct-v0.2")
+REGEX_MARGIN = 1.3
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def token_spans(text: str) -> list[tuple[int, int]]:
+    """Returns the (start, end) character span of every token in `text`."""
+    return [match.span() for match in TOKEN_PATTERN.finditer(text)]
+
+
+def get_tokenizer():
+    """Returns the answer model's tokenizer, loading it on first use, or None if it is unavailable."""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = False
+                if TOKENIZER:
+                    try:
+                        from transformers import AutoTokenizer
+
+                        _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER)
+                        _tokenizer.model_max_length = sys.maxsize  # Only used to count, so no length warnings.
+                    except Exception as e:
+                        print(f"⚠️ Could not load tokenizer {TOKENIZER}, estimating tokens instead. {e}")
+    return _tokenizer or None
+
+
+def count_tokens(text: str) -> int:
+    """Number of answer-model tokens in `text`; an overestimate when the tokenizer is unavailable."""
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+    return math.ceil(sum(1 for _ in TOKEN_PATTERN.finditer(text)) * REGEX_MARGIN)
+
+
+def prompt_token_spans(text: str) -> list[tuple[int, int]]:
+    """
+    The (start, end) character span of every answer-model token in `text`,
+    or of every regex token when the tokenizer is unavailable (count_tokens
+    then counts each of them as REGEX_MARGIN tokens).
+    """
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return [tuple(span) for span in tokenizer(text, add_special_tokens=False,
+                                                  return_offsets_mapping=True)["offset_mapping"]]
+    return token_spans(text)
@@ -0,0 +1,209 @@
+# utils/topics.py
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+
+# Every prepared topic gets its own namespace under TOPICS_DIR: raw sources,
+# processed text and indexes live side by side, so a topic can be switched to
+# without refetching and evicted by deleting one directory. The registry
+# records which topics exist, which are active for queries, and when each was
+# last used; the least recently used topics are evicted once the namespaces
+# together exceed DISK_BUDGET_BYTES.
+
+TOPICS_DIR = os.environ.get("TOPICS_DIR", "data/topics")
+REGISTRY_PATH = os.path.join(TOPICS_DIR, "registry.json")
+DISK_BUDGET_BYTES = int(os.environ.get("TOPICS_DISK_BUDGET_BYTES", str(2 * 1024 ** 3)))
+TOUCH_INTERVAL = 60  # Seconds; last-used times are written at most this often per topic.
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(topic.lower().split())
+
+
+def topic_slug(topic: str) -> str:
+    """Directory-safe, stable name for a topic: readable prefix plus a hash of the normalized topic."""
+    key = normalize_topic(topic)
+    readable = re.sub(r"[^a-z0-9]+", "-", key).strip("-")[:48] or "topic"
+    return f"{readable}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]}"
+
+
+def topic_dir(slug: str) -> str:
+    return os.path.join(TOPICS_DIR, slug)
+
+
+def topic_paths(slug: str) -> dict:
+    """The per-topic equivalents of the data/ directories."""
+    base = topic_dir(slug)
+    return {
+        "raw_papers": os.path.join(base, "raw_papers"),
+        "youtube_transcripts": os.path.join(base, "youtube_transcripts"),
+        "processed": os.path.join(base, "processed"),
+        "vector_db": os.path.join(base, "vector_db"),
+    }
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass  # Removed while walking.
+    return total
+
+
+class TopicRegistry:
+    """JSON-backed record of prepared topics and the active selection."""
+
+    def __init__(self, path=REGISTRY_PATH, disk_budget=DISK_BUDGET_BYTES):
+        self.path = path
+        self.disk_budget = disk_budget
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {"topics": {}, "active": []}
+        # A prepare that was interrupted by a restart will never finish.
+        for entry in state["topics"].values():
+            if entry["status"] == "preparing":
+                entry["status"] = "failed"
+        return state
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, slug: str):
+        with self._lock:
+            entry = self._state["topics"].get(slug)
+            return dict(entry, slug=slug) if entry else None
+
+    def list_topics(self) -> list[dict]:
+        """Every known topic, most recently used first, with an `active` flag."""
+        with self._lock:
+            active = set(self._state["active"])
+            entries = [dict(entry, slug=slug, active=slug in active) for slug, entry in self._state["topics"].items()]
+        return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+    def resolve(self, name: str):
+        """Returns the slug for a topic given by slug or by name, or None if it is not registered."""
+        with self._lock:
+            if name in self._state["topics"]:
+                return name
+            slug = topic_slug(name)
+            return slug if slug in self._state["topics"] else None
+
+    def begin(self, topic: str) -> str:
+        """Registers `topic` as being prepared and returns its slug."""
+        slug = topic_slug(topic)
+        now = time.time()
+        with self._lock:
+            entry = self._state["topics"].setdefault(slug, {
+                "topic": topic.strip(), "created_at": datetime.now().isoformat(timespec="seconds"),
+                "prepared_at": None, "bytes": 0,
+            })
+            entry["status"] = "preparing"
+            entry["last_used"] = now
+            self._save()
+        return slug
+
+    def finish(self, slug: str, succeeded: bool, near_duplicates=None):
+        """
+        Records the outcome of a prepare, with the index's near-duplicate
+        counts if given; a successful topic becomes the active one.
+        """
+        size = disk_usage(topic_dir(slug))
+        with self._lock:
+            entry = self._state["topics"][slug]
+            entry["bytes"] = size
+            if near_duplicates is not None:
+                entry["near_duplicates"] = near_duplicates
+            if succeeded:
+                entry["status"] = "ready"
+                entry["prepared_at"] = datetime.now().isoformat(timespec="seconds")
+                self._state["active"] = [slug]
+            else:
+                # A failed refresh of a ready topic still leaves a usable index.
+                entry["status"] = "ready" if entry["prepared_at"] else "failed"
+            self._save()
+
+    def active(self) -> list[str]:
+        with self._lock:
+            return list(self._state["active"])
+
+    def set_active(self, slugs: list[str]):
+        with self._lock:
+            unknown = [slug for slug in slugs if self._state["topics"].get(slug, {}).get("status") != "ready"]
+            if unknown:
+                raise KeyError(f"Not a prepared topic: {', '.join(unknown)}")
+            self._state["active"] = list(dict.fromkeys(slugs))
+            now = time.time()
+            for slug in slugs:
+                self._state["topics"][slug]["last_used"] = now
+            self._save()
+
+    def touch(self, slugs: list[str]):
+        """Marks topics as used by a query; the write is skipped if they were touched recently."""
+        now = time.time()
+        with self._lock:
+            stale = [slug for slug in slugs if slug in self._state["topics"]
+                     and now - self._state["topics"][slug]["last_used"] > TOUCH_INTERVAL]
+            for slug in stale:
+                self._state["topics"][slug]["last_used"] = now
+            if stale:
+                self._save()
+
+    def evict(self, keep=()) -> list[str]:
+        """
+        Drops least-recently-used topics until the total size fits the disk
+        budget. Active topics, topics being prepared and `keep` are never
+        evicted. Returns the slugs removed from the registry; the caller
+        releases their open handles and deletes their directories.
+        """
+        with self._lock:
+            topics = self._state["topics"]
+            protected = set(self._state["active"]) | set(keep)
+            total = sum(entry["bytes"] for entry in topics.values())
+            evicted = []
+            for slug in sorted(topics, key=lambda slug: topics[slug]["last_used"]):
+                if total <= self.disk_budget:
+                    break
+                if slug in protected or topics[slug]["status"] == "preparing":
+                    continue
+                total -= topics[slug]["bytes"]
+                del topics[slug]
+                evicted.append(slug)
+            if evicted:
+                self._save()
+        return evicted
+
+
+def remove_topic_files(slug: str):
+    shutil.rmtree(topic_dir(slug), ignore_errors=True)
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry() -> TopicRegistry:
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = TopicRegistry()
+    return _default_registry
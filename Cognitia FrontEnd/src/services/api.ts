@@ -1,4 +1,14 @@
 const API_BASE_URL = 'http://localhost:8000';
+const PREPARE_POLL_INTERVAL_MS = 2000;
+
+// The backend keeps one conversation per session ID; each tab gets its own.
+const SESSION_ID = (() => {
+  const existing = sessionStorage.getItem('cognitia-session-id');
+  if (existing) return existing;
+  const created = crypto.randomUUID();
+  sessionStorage.setItem('cognitia-session-id', created);
+  return created;
+})();
 
 export const apiService = {
   async sendMessage(question: string): Promise<string> {
@@ -7,6 +17,7 @@ export const apiService = {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': SESSION_ID,
         },
         body: JSON.stringify({ question }),
       });
@@ -29,6 +40,7 @@ export const apiService = {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'X-Session-ID': SESSION_ID,
         },
         body: JSON.stringify({ question }),
       });
@@ -59,11 +71,29 @@ export const apiService = {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
-      return data.message || 'Topic prepared successfully';
+      // Preparation runs as a background job; poll it until it finishes.
+      // A topic that was prepared before is switched to at once.
+      const { status, job_id, message } = await response.json();
+      if (status === 'ready') {
+        return message;
+      }
+      while (true) {
+        await new Promise((resolve) => setTimeout(resolve, PREPARE_POLL_INTERVAL_MS));
+        const statusResponse = await fetch(`${API_BASE_URL}/prepare/${job_id}`);
+        if (!statusResponse.ok) {
+          throw new Error(`HTTP error! status: ${statusResponse.status}`);
+        }
+        const job = await statusResponse.json();
+        if (job.status === 'succeeded') {
+          return `Knowledge base for '${job.topic}' is ready.`;
+        }
+        if (job.status === 'failed') {
+          throw new Error(job.error || 'Prepare job failed');
+        }
+      }
     } catch (error) {
       console.error('Prepare API Error:', error);
       throw new Error('Failed to prepare topic.');
     }
   },
-};
\ No newline at end of file
+};